@@ -1,75 +1,822 @@
 from __future__ import division
 from six.moves import range
+from collections import namedtuple, OrderedDict, deque
+import hashlib
+import multiprocessing
+from time import process_time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-from scipy.sparse import coo_matrix
-from scipy.sparse.linalg import splu
+from numpy.lib.stride_tricks import as_strided
+from scipy.sparse import csc_matrix
+from scipy.sparse.linalg import splu, eigsh, LinearOperator
+from scipy.linalg import (cholesky_banded, cho_solve_banded, lu_factor, lu_solve, cho_factor,
+                          cho_solve)
 
 import openmdao.api as om
 
 
+# Sparsity pattern of the assembled stiffness matrix. `scatter` maps every entry of the
+# flattened (num_elements, 4, 4) K_local array to its slot in `data`, and `bc_data` holds
+# the constant entries of the clamped boundary condition.
+CSCPattern = namedtuple('CSCPattern', ['indptr', 'indices', 'scatter', 'bc_data', 'shape'])
+
+# patterns only depend on the mesh size, so they are computed once per num_elements
+_csc_patterns = {}
+
+
+def get_CSC_pattern(num_elements):
+    """
+    Compute (or fetch from the cache) the CSC sparsity pattern of the stiffness matrix.
+
+    Parameters
+    ----------
+    num_elements : int
+        Number of beam elements.
+
+    Returns
+    -------
+    CSCPattern
+        indptr/indices of the CSC matrix plus the scatter map for the K_local entries.
+    """
+    if num_elements in _csc_patterns:
+        return _csc_patterns[num_elements]
+
+    num_nodes = num_elements + 1
+    n_K = 2 * num_nodes + 2
+
+    # element ind couples dofs 2 * ind ... 2 * ind + 3
+    dofs = np.arange(4) + 2 * np.arange(num_elements)[:, np.newaxis]
+    rows = np.repeat(dofs, 4, axis=1).ravel()
+    cols = np.tile(dofs, 4).ravel()
+
+    # this implements the clamped boundary condition on the left side of the beam
+    # using a weak formulation for the BC
+    bc_rows = np.array([2 * num_nodes, 2 * num_nodes + 1, 0, 1])
+    bc_cols = np.array([0, 1, 2 * num_nodes, 2 * num_nodes + 1])
+
+    rows = np.concatenate([rows, bc_rows])
+    cols = np.concatenate([cols, bc_cols])
+
+    # column-major keys sort the entries in CSC order; duplicates get summed by the scatter
+    keys, scatter = np.unique(cols * n_K + rows, return_inverse=True)
+    indices = keys % n_K
+    indptr = np.searchsorted(keys // n_K, np.arange(n_K + 1))
+
+    bc_data = np.zeros(len(keys))
+    bc_data[scatter[-4:]] = 1.0
+
+    pattern = CSCPattern(indptr, indices, scatter[:-4], bc_data, (n_K, n_K))
+    _csc_patterns[num_elements] = pattern
+    return pattern
+
+
+def assemble_CSC_data(K_local, pattern):
+    """
+    Scatter-add the local stiffness matrices into the data array of the CSC matrix.
+
+    Parameters
+    ----------
+    K_local : ndarray
+        Local stiffness matrices, shape (num_elements, 4, 4). May be complex.
+    pattern : CSCPattern
+        Sparsity pattern from get_CSC_pattern.
+
+    Returns
+    -------
+    ndarray
+        data array matching pattern.indices.
+    """
+    K_flat = K_local.ravel()
+    nnz = len(pattern.bc_data)
+
+    data = np.bincount(pattern.scatter, weights=K_flat.real, minlength=nnz)
+    if np.iscomplexobj(K_flat):
+        data = data + 1j * np.bincount(pattern.scatter, weights=K_flat.imag, minlength=nnz)
+
+    return data + pattern.bc_data
+
+
+def assemble_banded_K(K_local):
+    """
+    Assemble the nodal stiffness matrix (without boundary conditions) in upper banded storage.
+
+    The beam stiffness matrix has a half-bandwidth of 3, so entry (i, j) with i <= j is
+    stored in ab[3 + i - j, j], as expected by scipy.linalg.cholesky_banded.
+
+    Parameters
+    ----------
+    K_local : ndarray
+        Local stiffness matrices, shape (num_elements, 4, 4).
+
+    Returns
+    -------
+    ndarray
+        Upper banded matrix, shape (4, 2 * num_nodes).
+    """
+    num_elements = K_local.shape[0]
+    n_dofs = 2 * num_elements + 2
+
+    # element ind puts its (i, j) entry in column 2 * ind + j, so each local entry fills a
+    # strided slice of one band row
+    ab = np.zeros((4, n_dofs), dtype=K_local.dtype)
+    for i, j in zip(*np.triu_indices(4)):
+        ab[3 + i - j, j:j + 2 * num_elements:2] += K_local[:, i, j]
+
+    return ab
+
+
+class ClampedBandedFactor(object):
+    """
+    Banded Cholesky factorization of the stiffness matrix with the clamp applied by elimination.
+
+    The solve method returns the same solution as the Lagrange-multiplier system assembled by
+    assemble_CSC_K: the last two entries are the multipliers, i.e. the reaction forces at the
+    clamp. Since that system is symmetric, the same solve is used in fwd and rev mode.
+    """
+
+    def __init__(self, K_local):
+        # drop the two clamped dofs; the leftover entries coupling them to the first free
+        # dofs are moved out of the band
+        ab = assemble_banded_K(K_local)[:, 2:]
+        ab[1:3, 0] = 0.
+        ab[0:2, 1] = 0.
+
+        # copies, since K_local may be an input vector that is updated in place later
+        self.K_cc = K_local[0, :2, :2].copy()
+        self.K_cf = K_local[0, :2, 2:].copy()
+        self.K_fc = K_local[0, 2:, :2].copy()
+        self.cb = cholesky_banded(ab)
+
+    def solve(self, rhs):
+        """
+        Solve the clamped system for the given right-hand side.
+
+        Parameters
+        ----------
+        rhs : ndarray
+            Right-hand side, shape (2 * num_nodes + 2,) or (2 * num_nodes + 2, n_cases).
+
+        Returns
+        -------
+        ndarray
+            Nodal displacements followed by the clamp reaction forces, same shape as rhs.
+        """
+        n_dofs = len(rhs) - 2
+        x = np.empty_like(rhs)
+
+        # the multiplier rows prescribe the clamped dofs directly
+        x_c = x[:2] = rhs[n_dofs:]
+
+        r_f = rhs[2:n_dofs].copy()
+        r_f[:2] -= self.K_fc.dot(x_c)
+        x_f = x[2:n_dofs] = cho_solve_banded((self.cb, False), r_f)
+
+        x[n_dofs:] = rhs[:2] - self.K_cc.dot(x_c) - self.K_cf.dot(x_f[:2])
+        return x
+
+
+def get_local_stiffness_coeffs(E, L0):
+    """
+    Return the 4x4 Euler-Bernoulli element stiffness matrix for unit moment of inertia.
+
+    Parameters
+    ----------
+    E : float
+        Young's modulus.
+    L0 : float
+        Element length.
+
+    Returns
+    -------
+    ndarray
+        Element stiffness coefficients; K_local for an element is these times its I.
+    """
+    coeffs = np.empty((4, 4))
+    coeffs[0, :] = [12, 6 * L0, -12, 6 * L0]
+    coeffs[1, :] = [6 * L0, 4 * L0 ** 2, -6 * L0, 2 * L0 ** 2]
+    coeffs[2, :] = [-12, -6 * L0, 12, -6 * L0]
+    coeffs[3, :] = [6 * L0, 2 * L0 ** 2, -6 * L0, 4 * L0 ** 2]
+    coeffs *= E / L0 ** 3
+
+    return coeffs
+
+
+def get_local_mass_coeffs(rho, b, L0):
+    """
+    Return the 4x4 consistent Euler-Bernoulli element mass matrix for unit height.
+
+    Parameters
+    ----------
+    rho : float
+        Density.
+    b : float
+        Beam width.
+    L0 : float
+        Element length.
+
+    Returns
+    -------
+    ndarray
+        Element mass coefficients; the mass matrix of an element is these times its h.
+    """
+    coeffs = np.empty((4, 4))
+    coeffs[0, :] = [156, 22 * L0, 54, -13 * L0]
+    coeffs[1, :] = [22 * L0, 4 * L0 ** 2, 13 * L0, -3 * L0 ** 2]
+    coeffs[2, :] = [54, 13 * L0, 156, -22 * L0]
+    coeffs[3, :] = [-13 * L0, -3 * L0 ** 2, -22 * L0, 4 * L0 ** 2]
+    coeffs *= rho * b * L0 / 420.
+
+    return coeffs
+
+
+class LowRankUpdatedFactor(object):
+    """
+    Solver for K + U C U^T that reuses the factorization of K, by the Sherman-Morrison-Woodbury
+    identity.
+
+    U selects the dofs touched by the changed elements and C is the change of K on them. An
+    element block has two rigid-body modes, so C is singular and the capacitance matrix is
+    taken as I + C U^T K^-1 U, which needs no inverse of C. Setting up costs one solve per dof
+    in U; every solve after that costs one solve with K plus a dense solve of size len(dofs).
+    """
+
+    def __init__(self, factor, dofs, C, size):
+        self.factor = factor
+        self.dofs = dofs
+        self.C = C
+
+        unit = np.zeros((size, len(dofs)), dtype=C.dtype)
+        unit[dofs, np.arange(len(dofs))] = 1.
+        self.Z = factor.solve(unit)
+        self.capacitance = lu_factor(np.eye(len(dofs)) + C.dot(self.Z[dofs]))
+
+    def solve(self, rhs):
+        """
+        Solve the updated system for rhs, of shape (size,) or (size, n_cases).
+        """
+        x = self.factor.solve(rhs)
+        return x - self.Z.dot(lu_solve(self.capacitance, self.C.dot(x[self.dofs])))
+
+
+class StiffnessCache(object):
+    """
+    Bounded LRU cache of assembled and LU-factored stiffness matrices.
+
+    Entries are keyed on the contents of K_local, so apply_nonlinear, solve_nonlinear and
+    linearize at the same input state share one assembly and one factorization. Every
+    assembly reuses the CSC sparsity pattern of the mesh; only the data array is refilled.
+
+    With max_update_rank set, the last full factorization is kept as a base. A new K_local is
+    compared with the base block by block, only the CSC entries of the changed elements are
+    patched, and as long as the changed elements touch at most max_update_rank dofs, the
+    base factorization is reused through a LowRankUpdatedFactor instead of refactoring.
+    """
+
+    def __init__(self, num_elements, max_size=4, max_update_rank=None):
+        self.pattern = get_CSC_pattern(num_elements)
+        self.max_size = max_size
+        self.max_update_rank = max_update_rank
+        self.hits = 0
+        self.misses = 0
+        self.factorizations = 0
+        self.updates = 0
+        self._entries = OrderedDict()
+        self._base = None
+
+        # element ind owns dofs 2 * ind ... 2 * ind + 3
+        self.elem_dofs = np.arange(4) + 2 * np.arange(num_elements)[:, np.newaxis]
+
+    def _assemble(self, K_local):
+        base = self._base
+
+        if base is None or base['K_local'].dtype != K_local.dtype:
+            # e.g. a complex-step K_local against a real base, which can not be patched
+            data = assemble_CSC_data(K_local, self.pattern)
+            base = changed = delta = None
+        else:
+            # patch the data of the base with the blocks that differ from it
+            changed = np.flatnonzero(np.any(K_local != base['K_local'], axis=(1, 2)))
+            delta = K_local[changed] - base['K_local'][changed]
+
+            data = base['K'].data.copy()
+            np.add.at(data, self.pattern.scatter.reshape(-1, 16)[changed].ravel(), delta.ravel())
+
+        K = csc_matrix((data, self.pattern.indices, self.pattern.indptr),
+                       shape=self.pattern.shape)
+        return {'K': K, 'base': base, 'changed': changed, 'delta': delta}
+
+    def _get_entry(self, K_local):
+        # dtype is part of the key so complex-step evaluations never alias real ones
+        key = hashlib.sha1(K_local.tobytes()).hexdigest() + K_local.dtype.str
+
+        if key in self._entries:
+            self.hits += 1
+            entry = self._entries.pop(key)
+        else:
+            self.misses += 1
+            if self.max_update_rank is None:
+                data = assemble_CSC_data(K_local, self.pattern)
+                K = csc_matrix((data, self.pattern.indices, self.pattern.indptr),
+                               shape=self.pattern.shape)
+                entry = {'K': K}
+            else:
+                entry = self._assemble(K_local)
+                entry['K_local'] = K_local.copy()
+
+            if len(self._entries) >= self.max_size:
+                self._entries.popitem(last=False)
+
+        self._entries[key] = entry
+        return entry
+
+    def _get_update(self, entry, solver):
+        """
+        Return a solver for entry that reuses the base factorization, or None.
+        """
+        base = entry.get('base')
+        if base is None or base is not self._base or solver not in base:
+            return None
+
+        changed = entry['changed']
+        if len(changed) == 0:
+            return base[solver]
+
+        dofs, positions = np.unique(self.elem_dofs[changed], return_inverse=True)
+        if len(dofs) > self.max_update_rank:
+            return None
+
+        positions = positions.reshape(-1, 4)
+        C = np.zeros((len(dofs), len(dofs)), dtype=entry['delta'].dtype)
+        np.add.at(C, (positions[:, :, np.newaxis], positions[:, np.newaxis, :]), entry['delta'])
+
+        self.updates += 1
+        return LowRankUpdatedFactor(base[solver], dofs, C, self.pattern.shape[0])
+
+    def get_K(self, K_local):
+        """
+        Return the assembled stiffness matrix for K_local.
+        """
+        return self._get_entry(K_local)['K']
+
+    def get_K_lu(self, K_local, solver='splu'):
+        """
+        Return the assembled stiffness matrix for K_local and its factorization.
+
+        With solver='banded' the factorization is a ClampedBandedFactor. The banded Cholesky
+        needs a real SPD matrix, so complex-step evaluations always use splu.
+        """
+        if np.iscomplexobj(K_local):
+            solver = 'splu'
+
+        entry = self._get_entry(K_local)
+        if solver not in entry and self.max_update_rank is not None:
+            update = self._get_update(entry, solver)
+            if update is not None:
+                entry[solver] = update
+
+        if solver not in entry:
+            self.factorizations += 1
+            if solver == 'banded':
+                entry[solver] = ClampedBandedFactor(K_local)
+            else:
+                entry[solver] = splu(entry['K'])
+
+            if self.max_update_rank is not None:
+                # a base never needs its own base, so the chain of old bases can be freed
+                entry['base'] = entry['delta'] = None
+                self._base = entry
+
+        return entry['K'], entry[solver]
+
+    def __repr__(self):
+        return 'StiffnessCache(hits={}, misses={}, factorizations={}, updates={})'.format(
+            self.hits, self.misses, self.factorizations, self.updates)
+
+
+class ReducedBasis(object):
+    """
+    POD basis of past solutions of one stiffness system, for Galerkin-projected solves.
+
+    The last max_snapshots full solutions are kept; the basis is their left singular vectors
+    down to pod_tol of the largest singular value. A projected solve x = V (V^T K V)^-1 V^T rhs
+    costs one sparse product with the basis and a dense solve of its size, instead of a new
+    factorization.
+
+    The error e = K^-1 r of a solution, with residual r = K x - rhs, is estimated by solving for
+    r with the factorization of the last full solve, which stays close to K while the design
+    converges, and measured in the energy norm relative to x: sqrt(|e.r| / |x.rhs|). Element
+    energies (and so the compliance gradients) depend on the curvature of u, so a max-norm or
+    backward error estimate lets through errors that they amplify.
+
+    K is ill-conditioned enough that on fine meshes the full solves themselves are only good to
+    their own error estimate, which is kept from the last full solve. A projected solve is
+    accepted when its estimate is at most the larger of tol and that; otherwise solve returns
+    None and the caller solves the full system and adds it.
+    """
+
+    def __init__(self, max_snapshots, tol, pod_tol=1e-12):
+        self.snapshots = deque(maxlen=max_snapshots)
+        self.tol = tol
+        self.pod_tol = pod_tol
+        self.V = None
+        self.factor = None
+        self.full_error = None
+        self._projected = None
+        self.hits = 0
+        self.misses = 0
+
+    def _estimate_error(self, r, x, rhs):
+        return np.sqrt(abs(np.vdot(self.factor.solve(r), r)) / abs(np.vdot(x, rhs)))
+
+    def add(self, K, x, rhs, factor):
+        """
+        Add the full solutions x of K x = rhs, of shape (size,) or (size, n_cases).
+        """
+        for column in x.reshape(len(x), -1).T:
+            self.snapshots.append(column.copy())
+
+        U, s, Vt = np.linalg.svd(np.column_stack(self.snapshots), full_matrices=False)
+        self.V = U[:, s > self.pod_tol * s[0]]
+        self._projected = None
+
+        self.factor = factor
+        self.full_error = self._estimate_error(K.dot(x) - rhs, x, rhs)
+
+    def solve(self, K, rhs):
+        """
+        Return the projected solution for rhs, of shape (size,) or (size, n_cases), or None.
+        """
+        if self.V is None:
+            self.misses += 1
+            return None
+
+        # the adjoint solves of a linearization reuse the projection of the primal solve
+        if self._projected is None or self._projected[0] is not K:
+            KV = K.dot(self.V)
+            self._projected = (K, KV, self.V.T.dot(KV))
+        KV, K_r = self._projected[1:]
+
+        q = np.linalg.solve(K_r, self.V.T.dot(rhs))
+        x = self.V.dot(q)
+
+        if self._estimate_error(KV.dot(q) - rhs, x, rhs) <= max(self.tol, self.full_error):
+            self.hits += 1
+            return x
+
+        self.misses += 1
+        return None
+
+    def __repr__(self):
+        return 'ReducedBasis(size={}, hits={}, misses={})'.format(
+            0 if self.V is None else self.V.shape[1], self.hits, self.misses)
+
+
+class _Subdomain(object):
+    """
+    One contiguous range of elements of a DomainDecomposedSolver, held by its worker process.
+
+    The nodes shared with the neighboring subdomains are interface nodes, the others are
+    interior; the clamped node of the first subdomain is neither. The interior is solved
+    with the left node clamped (the clamp itself or the left interface node), so the
+    subdomain is condensed onto its interface nodes through the 2x2 flexibility of its right
+    end rather than through K_BB - K_BI K_II^-1 K_IB. That difference of O(1 / L0^3) terms
+    cancels to O(1 / L^3) for a segment of length L, which leaves nothing of the rigid body
+    modes on fine meshes. K_local and rhs are views of the buffers shared with the main
+    process; rhs holds the free dofs (all but the clamped node) of the whole beam.
+    """
+
+    def __init__(self, K_local, rhs, first, last):
+        num_elements = K_local.shape[0]
+        self.K_local = K_local[first:last]
+        self.has_left = first > 0
+        self.has_right = last < num_elements
+
+        # the dofs of the nodes right of the left one; all are interior for the tip subdomain
+        self.size = 2 * (last - first)
+        self.n_I = self.size - (2 if self.has_right else 0)
+        self.rhs = rhs[2 * first:2 * first + self.n_I]
+
+    def factor(self):
+        """
+        Factor the subdomain clamped at its left node and return its Schur complement on
+        the interface dofs, left node first.
+        """
+        K_local = self.K_local
+        n_I = self.n_I
+
+        # the same band surgery as ClampedBandedFactor
+        ab = assemble_banded_K(K_local)[:, 2:]
+        ab[1:3, 0] = 0.
+        ab[0:2, 1] = 0.
+        self.cb = cholesky_banded(ab)
+
+        # rigid body motion of the nodes right of the left one for unit (w, theta) of the
+        # left node; element lengths follow from K_local[:, 0, 1] / K_local[:, 0, 0] = L0 / 2
+        x = np.cumsum(2. * K_local[:, 0, 1] / K_local[:, 0, 0])
+        R = np.zeros((self.size, 2))
+        R[0::2, 0] = 1.
+        R[0::2, 1] = x
+        R[1::2, 1] = 1.
+        self.R_I = R[:n_I]
+
+        if not self.has_right:
+            # a free end transmits no stiffness to the left interface
+            return np.zeros((2, 2) if self.has_left else (0, 0))
+
+        # flexibility of the right end, and the map B of the interface dofs onto its
+        # deflection relative to the left node
+        E_b = np.zeros((self.size, 2))
+        E_b[-2:] = np.eye(2)
+        W = cho_solve_banded((self.cb, False), E_b)
+        self.W_I = W[:n_I]
+        self.F_factor = cho_factor(W[-2:])
+        self.B = np.hstack([-R[-2:], np.eye(2)]) if self.has_left else np.eye(2)
+
+        return self.B.T.dot(cho_solve(self.F_factor, self.B))
+
+    def condense(self, n_cases):
+        """
+        Solve the interior for the first n_cases columns of rhs and return their contribution
+        to the right-hand side of the interface system.
+        """
+        f_I = self.rhs[:, :n_cases]
+        f = np.zeros((self.size, n_cases))
+        f[:self.n_I] = f_I
+        self.y = cho_solve_banded((self.cb, False), f)
+
+        g = []
+        if self.has_left:
+            # the work of the interior loads on the rigid body motion of the left node
+            g.append(self.R_I.T.dot(f_I))
+        if self.has_right:
+            return self.B.T.dot(cho_solve(self.F_factor, self.y[-2:])) + np.vstack(
+                g + [np.zeros((2, n_cases))])
+        return np.vstack(g + [np.zeros((0, n_cases))])
+
+    def expand(self, x_B):
+        """
+        Write the interior solution for the interface solution x_B into rhs.
+        """
+        u_I = self.y[:self.n_I].copy()
+        if self.has_right:
+            # the end force that deflects the right end as prescribed by x_B
+            u_I += self.W_I.dot(cho_solve(self.F_factor, self.B.dot(x_B) - self.y[-2:]))
+        if self.has_left:
+            u_I += self.R_I.dot(x_B[:2])
+
+        self.rhs[:, :x_B.shape[1]] = u_I
+
+
+def _subdomain_worker(conn, K_local_buffer, rhs_buffer, max_cases, first, last):
+    """
+    Serve the (method, args) requests of a DomainDecomposedSolver for one _Subdomain, until
+    None is received. Every reply carries the CPU time spent on it, or None with an exception.
+    """
+    K_local = np.frombuffer(K_local_buffer).reshape(-1, 4, 4)
+    rhs = np.frombuffer(rhs_buffer).reshape(-1, max_cases)
+    subdomain = _Subdomain(K_local, rhs, first, last)
+
+    for method, args in iter(conn.recv, None):
+        pre_time = process_time()
+        try:
+            result = getattr(subdomain, method)(*args)
+        except Exception as err:
+            conn.send((err, None))
+        else:
+            conn.send((result, process_time() - pre_time))
+
+
+class DomainDecomposedSolver(object):
+    """
+    Solver of the clamped stiffness system by non-overlapping domain decomposition.
+
+    The elements are split into num_workers contiguous subdomains. Each is held by a worker
+    process that factors it with a banded Cholesky factorization and condenses it onto the
+    interface nodes between the subdomains, see _Subdomain. This process assembles the
+    resulting Schur complement, a block tridiagonal system of 2 * (num_workers - 1) dofs, and
+    solves it densely; the workers then recover their interior dofs from the interface
+    solution. Since every subdomain is factored on its own, the solution loses less to the
+    num_elements ** 4 condition number than ClampedBandedFactor on fine meshes.
+
+    K_local and the right-hand sides are passed through shared memory, so the only messages
+    are the commands and the small interface blocks. factor and solve follow
+    ClampedBandedFactor, so the solver can stand in for the factorizations of FEM; the
+    workers hold one factorization at a time. worker_time adds up the CPU time of every worker
+    and critical_time that of the slowest worker of every step, which is what the steps take
+    with one core per worker.
+    """
+
+    def __init__(self, num_elements, num_workers, max_cases=1):
+        if num_elements < 2 * num_workers:
+            raise ValueError('Every subdomain needs at least 2 elements, but there are {} '
+                             'elements for {} workers.'.format(num_elements, num_workers))
+
+        self.num_elements = num_elements
+        self.max_cases = max_cases
+        self.worker_time = 0.
+        self.critical_time = 0.
+
+        K_local_buffer = multiprocessing.RawArray('d', 16 * num_elements)
+        rhs_buffer = multiprocessing.RawArray('d', 2 * num_elements * max_cases)
+        self.K_local = np.frombuffer(K_local_buffer).reshape(num_elements, 4, 4)
+        self.rhs = np.frombuffer(rhs_buffer).reshape(2 * num_elements, max_cases)
+
+        bounds = np.linspace(0, num_elements, num_workers + 1).round().astype(int)
+
+        # interface k is the node between subdomains k and k + 1; its dofs are 2 * k and
+        # 2 * k + 1 of the interface system, and the free dofs of rhs start at node 1
+        self.interface_rows = (2 * bounds[1:-1, np.newaxis] - 2 + np.arange(2)).ravel()
+        self.subdomain_dofs = [np.arange(max(2 * k - 2, 0), min(2 * k + 2, 2 * num_workers - 2))
+                               for k in range(num_workers)]
+
+        self._connections = []
+        self._processes = []
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            conn, worker_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_subdomain_worker, args=(worker_conn, K_local_buffer, rhs_buffer,
+                                                max_cases, first, last))
+            process.daemon = True
+            process.start()
+            worker_conn.close()
+            self._connections.append(conn)
+            self._processes.append(process)
+
+    def _run(self, method, args):
+        """
+        Call method on every subdomain with its args, concurrently, and return the results.
+        """
+        for conn, worker_args in zip(self._connections, args):
+            conn.send((method, worker_args))
+
+        results, times = zip(*[conn.recv() for conn in self._connections])
+        for result, duration in zip(results, times):
+            if duration is None:
+                raise result
+
+        self.worker_time += sum(times)
+        self.critical_time += max(times)
+        return results
+
+    def factor(self, K_local):
+        """
+        Factor the stiffness matrix of the (real) local stiffness matrices K_local.
+        """
+        self.K_local[:] = K_local
+
+        size = len(self.interface_rows)
+        S = np.zeros((size, size))
+        for dofs, S_k in zip(self.subdomain_dofs, self._run('factor', [()] * len(
+                self._connections))):
+            S[np.ix_(dofs, dofs)] += S_k
+        self.S_factor = cho_factor(S) if size else None
+
+        self.K_cc = K_local[0, :2, :2].copy()
+        self.K_cf = K_local[0, :2, 2:].copy()
+        self.K_fc = K_local[0, 2:, :2].copy()
+
+    def _solve_free(self, r_f):
+        """
+        Solve for the free dofs, for at most max_cases columns of r_f.
+        """
+        n_cases = r_f.shape[1]
+        self.rhs[:, :n_cases] = r_f
+
+        g = r_f[self.interface_rows]
+        for dofs, g_k in zip(self.subdomain_dofs, self._run('condense', [(n_cases,)] * len(
+                self._connections))):
+            g[dofs] += g_k
+
+        x_S = cho_solve(self.S_factor, g) if len(g) else g
+        self._run('expand', [(x_S[dofs],) for dofs in self.subdomain_dofs])
+
+        x_f = self.rhs[:, :n_cases].copy()
+        x_f[self.interface_rows] = x_S
+        return x_f
+
+    def solve(self, rhs):
+        """
+        Solve the clamped system for the given right-hand side.
+
+        Parameters
+        ----------
+        rhs : ndarray
+            Right-hand side, shape (2 * num_nodes + 2,) or (2 * num_nodes + 2, n_cases).
+
+        Returns
+        -------
+        ndarray
+            Nodal displacements followed by the clamp reaction forces, same shape as rhs.
+        """
+        rhs_2d = rhs.reshape(len(rhs), -1)
+        n_dofs = len(rhs) - 2
+        x = np.empty_like(rhs_2d)
+
+        # the multiplier rows prescribe the clamped dofs directly
+        x_c = x[:2] = rhs_2d[n_dofs:]
+
+        r_f = rhs_2d[2:n_dofs].copy()
+        r_f[:2] -= self.K_fc.dot(x_c)
+        for start in range(0, r_f.shape[1], self.max_cases):
+            cases = slice(start, start + self.max_cases)
+            x[2:n_dofs, cases] = self._solve_free(r_f[:, cases])
+
+        x[n_dofs:] = rhs_2d[:2] - self.K_cc.dot(x_c) - self.K_cf.dot(x[2:4])
+        return x.reshape(rhs.shape)
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        for conn in self._connections:
+            conn.send(None)
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+
 class MomentOfInertiaComp(om.ExplicitComponent):
 
     def initialize(self):
         self.options.declare('num_elements', types=int)
-        self.options.declare('b')
+        self.options.declare('b', desc='beam width, or one width per sample')
+        self.options.declare('num_samples', types=int, default=None, allow_none=True,
+                             desc='if given, I gets a leading sample dimension')
 
     def setup(self):
         num_elements = self.options['num_elements']
+        num_samples = self.options['num_samples']
+        sample_shape = () if num_samples is None else (num_samples,)
+        n_samples = 1 if num_samples is None else num_samples
 
         self.add_input('h', shape=num_elements)
-        self.add_output('I', shape=num_elements)
+        self.add_output('I', shape=sample_shape + (num_elements,))
 
-        rows = np.arange(num_elements)
-        cols = np.arange(num_elements)
+        rows = np.arange(n_samples * num_elements)
+        cols = np.tile(np.arange(num_elements), n_samples)
         self.declare_partials('I', 'h', rows=rows, cols=cols)
 
+    def _get_b(self):
+        """
+        Return b, shaped to broadcast against the sample dimension of I.
+        """
+        num_samples = self.options['num_samples']
+        if num_samples is None:
+            return self.options['b']
+        return np.broadcast_to(self.options['b'], (num_samples,))[:, np.newaxis]
+
     def compute(self, inputs, outputs):
-        b = self.options['b']
+        b = self._get_b()
 
         outputs['I'] = 1./12. * b * inputs['h'] ** 3
 
     def compute_partials(self, inputs, partials):
-        b = self.options['b']
+        b = self._get_b()
 
-        partials['I', 'h'] = 1./4. * b * inputs['h'] ** 2
+        partials['I', 'h'] = (1./4. * b * inputs['h'] ** 2).ravel()
 
 class LocalStiffnessMatrixComp(om.ExplicitComponent):
 
     def initialize(self):
         self.options.declare('num_elements', types=int)
-        self.options.declare('E')
+        self.options.declare('E', desc="Young's modulus, or one modulus per sample")
         self.options.declare('L')
+        self.options.declare('num_samples', types=int, default=None, allow_none=True,
+                             desc='if given, I and K_local get a leading sample dimension')
 
     def setup(self):
         num_elements = self.options['num_elements']
+        num_samples = self.options['num_samples']
         E = self.options['E']
         L = self.options['L']
-
-        self.add_input('I', shape=num_elements)
-        self.add_output('K_local', shape=(num_elements, 4, 4))
-
         L0 = L / num_elements
-        coeffs = np.empty((4, 4))
-        coeffs[0, :] = [12, 6 * L0, -12, 6 * L0]
-        coeffs[1, :] = [6 * L0, 4 * L0 ** 2, -6 * L0, 2 * L0 ** 2]
-        coeffs[2, :] = [-12, -6 * L0, 12, -6 * L0]
-        coeffs[3, :] = [6 * L0, 2 * L0 ** 2, -6 * L0, 4 * L0 ** 2]
-        coeffs *= E / L0 ** 3
-
-        self.mtx = mtx = np.zeros((num_elements, 4, 4, num_elements))
-        for ind in range(num_elements):
-            self.mtx[ind, :, :, ind] = coeffs
 
-        self.declare_partials('K_local', 'I',
-            val=self.mtx.reshape(16 * num_elements, num_elements))
+        if num_samples is None:
+            sample_shape = ()
+            self.coeffs = coeffs = get_local_stiffness_coeffs(E, L0)
+        else:
+            # K_local is linear in E, so every sample scales the same unit-modulus block
+            sample_shape = (num_samples,)
+            self.coeffs = coeffs = np.multiply.outer(np.broadcast_to(E, sample_shape),
+                                                     get_local_stiffness_coeffs(1., L0))
+
+        self.add_input('I', shape=sample_shape + (num_elements,))
+        self.add_output('K_local', shape=sample_shape + (num_elements, 4, 4))
+
+        # each K_local block only depends on the I of its own element, so the partial
+        # has 16 nonzeros per element
+        n_blocks = np.prod(sample_shape, dtype=int) * num_elements
+        rows = np.arange(16 * n_blocks)
+        cols = np.repeat(np.arange(n_blocks), 16)
+        self.declare_partials('K_local', 'I', rows=rows, cols=cols,
+                              val=np.repeat(coeffs.reshape(-1, 16), num_elements, axis=0).ravel())
 
     def compute(self, inputs, outputs):
-        num_elements = self.options['num_elements']
+        coeffs = self.coeffs if self.options['num_samples'] is None else self.coeffs[:, np.newaxis]
 
-        outputs['K_local'] = 0
-        for ind in range(num_elements):
-            outputs['K_local'][ind, :, :] = self.mtx[ind, :, :, ind] * inputs['I'][ind]
+        outputs['K_local'] = coeffs * inputs['I'][..., np.newaxis, np.newaxis]
 
 
 ##########################################
@@ -80,64 +827,247 @@ class FEM(om.ImplicitComponent):
 
     def initialize(self):
         self.options.declare('num_elements', types=int)
-        self.options.declare('force_vector', types=np.ndarray)
+        self.options.declare('force_vector', types=np.ndarray,
+                             desc='nodal loads, shape (2 * num_nodes,) or '
+                                  '(n_cases, 2 * num_nodes) for multiple load cases')
+        self.options.declare('cache_size', types=int, default=4,
+                             desc='number of assembled/factored stiffness matrices to keep')
+        self.options.declare('solver', default='splu', values=['splu', 'banded'],
+                             desc='splu factors the Lagrange-multiplier system; banded applies '
+                                  'the clamp by elimination and uses a banded Cholesky')
+        self.options.declare('max_update_rank', types=int, default=None, allow_none=True,
+                             desc='if given, reuse the last full factorization through a '
+                                  'low-rank update while the elements that changed since then '
+                                  'touch at most this many dofs, see StiffnessCache')
+        self.options.declare('num_samples', types=int, default=None, allow_none=True,
+                             desc='if given, K_local and u get a leading sample dimension and '
+                                  'each sample is assembled, factored and solved on its own')
+        self.options.declare('num_threads', types=int, default=1,
+                             desc='threads that factor and solve the samples concurrently')
+        self.options.declare('K_cache', types=StiffnessCache, default=None, allow_none=True,
+                             desc='StiffnessCache to use instead of a new one, e.g. to share '
+                                  'the factorizations with a ModalComp')
+        self.options.declare('reduced_basis_size', types=int, default=None, allow_none=True,
+                             desc='if given, solve in the POD basis of up to this many past '
+                                  'solutions while it is accurate enough, see ReducedBasis')
+        self.options.declare('reduced_basis_tol', types=float, default=1e-5,
+                             desc='largest estimated relative energy-norm error of a '
+                                  'reduced-basis solve, see ReducedBasis')
 
     def setup(self):
         num_elements = self.options['num_elements']
+        num_samples = self.options['num_samples']
         num_nodes = num_elements + 1
         size = 2 * num_nodes + 2
 
-        self.add_input('K_local', shape=(num_elements, 4, 4))
-        self.add_output('u', shape=size)
+        # with multiple load cases u has one row per case, all solved against the same K
+        force_shape = self.options['force_vector'].shape
+        n_cases = 1 if len(force_shape) == 1 else force_shape[0]
+
+        # with samples every sample has its own K_local, K and load cases; the rows of u are
+        # ordered by sample, then by load case
+        sample_shape = () if num_samples is None else (num_samples,)
+        n_samples = 1 if num_samples is None else num_samples
+        blocks = np.arange(n_samples * n_cases)[:, np.newaxis]
+        row_offsets = size * blocks
+        col_offsets = 16 * num_elements * (blocks // n_cases)
+
+        # one cache per sample, so no two threads ever share one; they all share the CSC
+        # pattern of the mesh
+        if self.options['K_cache'] is not None:
+            if num_samples is not None:
+                raise ValueError('{}: K_cache can not be shared between samples.'.format(
+                    self.msginfo))
+            self.K_caches = [self.options['K_cache']]
+        else:
+            self.K_caches = [StiffnessCache(num_elements, self.options['cache_size'],
+                                            self.options['max_update_rank'])
+                             for i_sample in range(n_samples)]
+        self.K_cache = self.K_caches[0]
+
+        if self.options['reduced_basis_size'] is not None:
+            self.bases = [ReducedBasis(self.options['reduced_basis_size'],
+                                       self.options['reduced_basis_tol'])
+                          for i_sample in range(n_samples)]
+        else:
+            self.bases = None
+
+        # a new setup may change num_threads, so the pool of the last one is shut down
+        self._shutdown_executor()
+        if self.options['num_threads'] > 1:
+            self._executor = ThreadPoolExecutor(self.options['num_threads'])
+
+        self.add_input('K_local', shape=sample_shape + (num_elements, 4, 4))
+        self.add_output('u', shape=sample_shape + force_shape[:-1] + (size,))
 
         cols = np.arange(16*num_elements)
         rows = np.repeat(np.arange(4), 4)
         rows = np.tile(rows, num_elements) + np.repeat(np.arange(num_elements), 16) * 2
 
-        self.declare_partials('u', 'K_local', rows=rows, cols=cols)
-        self.declare_partials('u', 'u')
+        self.declare_partials('u', 'K_local', rows=(rows + row_offsets).ravel(),
+                              cols=(cols + col_offsets).ravel())
+
+        # d(u)/d(u) is K itself, so it is declared with the banded sparsity of the assembled
+        # matrix (including the boundary condition multipliers) and filled from K.data
+        pattern = self.K_cache.pattern
+        rows = pattern.indices
+        cols = np.repeat(np.arange(size), np.diff(pattern.indptr))
+        self.declare_partials('u', 'u', rows=(rows + row_offsets).ravel(),
+                              cols=(cols + row_offsets).ravel())
+
+    def _get_force_vectors(self):
+        """
+        Return the load cases, padded with the boundary condition rows, as columns.
+        """
+        force_vector = np.atleast_2d(self.options['force_vector'])
+        return np.hstack([force_vector, np.zeros((force_vector.shape[0], 2))]).T
+
+    def _shutdown_executor(self):
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown()
+        self._executor = None
+
+    def cleanup(self):
+        """
+        Shut down the thread pool along with the rest of Problem.cleanup.
+        """
+        super(FEM, self).cleanup()
+        self._shutdown_executor()
+
+    def _map_samples(self, func, num_samples):
+        """
+        Return [func(0), ..., func(num_samples - 1)], on the thread pool if there is one.
+        """
+        if self._executor is None:
+            return [func(i_sample) for i_sample in range(num_samples)]
+        return list(self._executor.map(func, range(num_samples)))
+
+    def _factor(self, inputs):
+        """
+        Get the stiffness matrix and factorization of every sample, as self.Ks and self.lus.
+        """
+        K_local = inputs['K_local'].reshape((-1,) + inputs['K_local'].shape[-3:])
+        solver = self.options['solver']
+
+        factors = self._map_samples(
+            lambda i_sample: self.K_caches[i_sample].get_K_lu(K_local[i_sample], solver),
+            len(K_local))
+
+        self.Ks = [K for K, lu in factors]
+        self.lus = [lu for K, lu in factors]
+        self.K, self.lu = factors[0]
 
+    def _solve_reduced(self, i_sample, K_local, rhs, enrich):
+        """
+        Solve one sample in its reduced basis, or fully if the basis is not accurate enough.
+
+        With enrich, a full solution is added to the basis. Complex-step evaluations always
+        solve fully and are never added.
+        """
+        basis = self.bases[i_sample]
+        K_cache = self.K_caches[i_sample]
+
+        real = not (np.iscomplexobj(K_local) or np.iscomplexobj(rhs))
+        if real:
+            x = basis.solve(K_cache.get_K(K_local), rhs)
+            if x is not None:
+                return x
+
+        K, lu = K_cache.get_K_lu(K_local, self.options['solver'])
+        x = lu.solve(rhs)
+        if real and enrich:
+            basis.add(K, x, rhs, lu)
+        return x
 
     def apply_nonlinear(self, inputs, outputs, residuals):
-        force_vector = np.concatenate([self.options['force_vector'], np.zeros(2)])
+        force_vectors = self._get_force_vectors()
+        K_local = inputs['K_local'].reshape((-1,) + inputs['K_local'].shape[-3:])
+        u = outputs['u'].reshape((len(K_local),) + force_vectors.shape[::-1])
 
-        self.K = self.assemble_CSC_K(inputs)
-        residuals['u'] = self.K.dot(outputs['u'])  - force_vector
+        self.Ks = self._map_samples(
+            lambda i_sample: self.K_caches[i_sample].get_K(K_local[i_sample]), len(K_local))
+        self.K = self.Ks[0]
+
+        residuals['u'] = np.stack([(K.dot(u_sample.T) - force_vectors).T
+                                   for K, u_sample in zip(self.Ks, u)]).reshape(
+                                       residuals['u'].shape)
 
     def solve_nonlinear(self, inputs, outputs):
 
         # NOTE: Although this FEM is linear, you still solve it in the `solve_nonlinear` method!
         #       This method is optional, but  useful when you have codes that have their own 
         #       customized nonlinear solvers
-        force_vector = np.concatenate([self.options['force_vector'], np.zeros(2)])
+        force_vectors = self._get_force_vectors()
 
-        self.K = self.assemble_CSC_K(inputs)
-        self.lu = splu(self.K)
+        if self.bases is not None:
+            K_local = inputs['K_local'].reshape((-1,) + inputs['K_local'].shape[-3:])
+            u = self._map_samples(
+                lambda i_sample: self._solve_reduced(i_sample, K_local[i_sample],
+                                                     force_vectors, True).T, len(K_local))
+            outputs['u'] = np.stack(u).reshape(outputs['u'].shape)
+            return
 
-        outputs['u'] = self.lu.solve(force_vector)
+        self._factor(inputs)
+
+        # all load cases of a sample are solved against its factorization in a single call
+        u = self._map_samples(lambda i_sample: self.lus[i_sample].solve(force_vectors).T,
+                              len(self.lus))
+        outputs['u'] = np.stack(u).reshape(outputs['u'].shape)
 
     def linearize(self, inputs, outputs, jacobian):
 
         num_elements = self.options['num_elements']
-
-        self.K = self.assemble_CSC_K(inputs)
-        self.lu = splu(self.K)
+        size = 2 * num_elements + 4
+
+        if self.bases is not None:
+            # the adjoint solves try the reduced bases first, so the factorizations are left
+            # until a solve misses; K_local is copied since the input vector changes in place
+            self._K_local = inputs['K_local'].reshape(
+                (-1,) + inputs['K_local'].shape[-3:]).copy()
+            self.Ks = self._map_samples(
+                lambda i_sample: self.K_caches[i_sample].get_K(self._K_local[i_sample]),
+                len(self._K_local))
+            self.K = self.Ks[0]
+        else:
+            self._factor(inputs)
 
         i_elem = np.tile(np.arange(4), 4)
         i_d = np.tile(i_elem, num_elements) + np.repeat(np.arange(num_elements), 16) * 2
 
-        jacobian['u', 'K_local'] = outputs['u'][i_d]
+        u = outputs['u'].reshape(-1, size)
+        n_cases = len(u) // len(self.Ks)
 
-        jacobian['u', 'u'] = self.K.toarray()
+        jacobian['u', 'K_local'] = u[:, i_d].ravel()
+
+        jacobian['u', 'u'] = np.concatenate([np.tile(K.data, n_cases) for K in self.Ks])
 
     # NOTE: this is an advanced OpenMDAO API method, that lets a component handle its own 
     #       linear solve, if it can. Its optional, but very useful if your code has highly 
     #       specialized linear solvers (like CFD and real FEA codes)
     def solve_linear(self, d_outputs, d_residuals, mode):
+        # K is symmetric, so fwd and rev mode use the same solve
         if mode == 'fwd':
-            d_outputs['u'] = self.lu.solve(d_residuals['u'])
+            d_outputs['u'] = self._solve_cases(d_residuals['u'])
         else:
-            d_residuals['u'] = self.lu.solve(d_outputs['u'])
+            d_residuals['u'] = self._solve_cases(d_outputs['u'])
+
+    def _solve_cases(self, rhs):
+        """
+        Solve all load cases in rhs (one per row) against the current factorizations at once.
+        """
+        if self.bases is not None:
+            rhs_samples = rhs.reshape(len(self.Ks), -1, rhs.shape[-1])
+            x = self._map_samples(
+                lambda i_sample: self._solve_reduced(i_sample, self._K_local[i_sample],
+                                                     rhs_samples[i_sample].T, False).T,
+                len(self.Ks))
+            return np.stack(x).reshape(rhs.shape)
+
+        rhs_samples = rhs.reshape(len(self.lus), -1, rhs.shape[-1])
+
+        x = self._map_samples(
+            lambda i_sample: self.lus[i_sample].solve(rhs_samples[i_sample].T).T, len(self.lus))
+        return np.stack(x).reshape(rhs.shape)
 
     def assemble_CSC_K(self, inputs):
         """
@@ -145,80 +1075,649 @@ class FEM(om.ImplicitComponent):
 
         Returns
         -------
-        ndarray
-            Stiffness matrix as dense ndarray.
+        csc_matrix
+            Stiffness matrix in sparse CSC format.
         """
+        pattern = get_CSC_pattern(self.options['num_elements'])
+        data = assemble_CSC_data(inputs['K_local'], pattern)
+
+        return csc_matrix((data, pattern.indices, pattern.indptr), shape=pattern.shape)
+
+class MatrixFreeFEM(FEM):
+    """
+    Matrix-free variant of FEM.
+
+    K is never assembled: K * u is applied element by element from K_local with vectorized
+    gathers and scatters, and the linear systems are solved with preconditioned conjugate
+    gradients on the clamp-eliminated (SPD) stiffness. The solver and cache_size options of
+    FEM are not used.
+
+    The clamped beam's condition number grows like num_elements ** 4, so the cheap nodal
+    block-Jacobi preconditioner only converges on coarse meshes. The default preconditioner
+    is a banded Cholesky factorization built directly from the element blocks (8 floats per
+    element, no sparse assembly), with CG acting as iterative refinement on top of it.
+    """
+
+    def initialize(self):
+        super(MatrixFreeFEM, self).initialize()
+        self.options.declare('preconditioner', default='banded',
+                             values=['banded', 'block_jacobi'],
+                             desc='preconditioner for the conjugate gradient solves')
+        self.options.declare('cg_rtol', default=1e-12,
+                             desc='tolerance on the normwise backward error of the CG solves')
+        self.options.declare('cg_maxiter', types=int, default=None, allow_none=True,
+                             desc='max conjugate gradient iterations; defaults to 10x the size')
+
+    def setup(self):
         num_elements = self.options['num_elements']
         num_nodes = num_elements + 1
-        num_entry = num_elements * 12 + 4
-        ndim = num_entry + 4
-
-        data = np.zeros((ndim, ), dtype=inputs._data.dtype)
-        cols = np.empty((ndim, ))
-        rows = np.empty((ndim, ))
-
-        # First element.
-        data[:16] = inputs['K_local'][0, :, :].flat
-        cols[:16] = np.tile(np.arange(4), 4)
-        rows[:16] = np.repeat(np.arange(4), 4)
-
-        j = 16
-        for ind in range(1, num_elements):
-            ind1 = 2 * ind
-            K = inputs['K_local'][ind, :, :]
-
-            # NW quadrant gets summed with previous connected element.
-            data[j-6:j-4] += K[0, :2]
-            data[j-2:j] += K[1, :2]
-
-            # NE quadrant
-            data[j:j+4] = K[:2, 2:].flat
-            rows[j:j+4] = np.array([ind1, ind1, ind1 + 1, ind1 + 1])
-            cols[j:j+4] = np.array([ind1 + 2, ind1 + 3, ind1 + 2, ind1 + 3])
-
-            # SE and SW quadrants together
-            data[j+4:j+12] = K[2:, :].flat
-            rows[j+4:j+12] = np.repeat(np.arange(ind1 + 2, ind1 + 4), 4)
-            cols[j+4:j+12] = np.tile(np.arange(ind1, ind1 + 4), 2)
-
-            j += 12
-
-        # this implements the clamped boundary condition on the left side of the beam
-        # using a weak formulation for the BC
-        data[-4:] = 1.0
-        rows[-4] = 2 * num_nodes
-        rows[-3] = 2 * num_nodes + 1
-        rows[-2] = 0.0
-        rows[-1] = 1.0
-        cols[-4] = 0.0
-        cols[-3] = 1.0
-        cols[-2] = 2 * num_nodes
-        cols[-1] = 2 * num_nodes + 1
-
-        n_K = 2 * num_nodes + 2
-        return coo_matrix((data, (rows, cols)), shape=(n_K, n_K)).tocsc()
+        size = 2 * num_nodes + 2
+
+        if self.options['num_samples'] is not None:
+            raise ValueError('{}: num_samples is not supported by MatrixFreeFEM.'.format(
+                self.msginfo))
+        if self.options['reduced_basis_size'] is not None:
+            raise ValueError('{}: reduced_basis_size is not supported by MatrixFreeFEM.'.format(
+                self.msginfo))
+
+        self.add_input('K_local', shape=(num_elements, 4, 4))
+        self.add_output('u', shape=self.options['force_vector'].shape[:-1] + (size,))
+
+    def _element_view(self, u):
+        """
+        Return a read-only (n_cases, num_elements, 4) view of the dofs of each element.
+        """
+        # element ind owns dofs 2 * ind ... 2 * ind + 3, so neighbors overlap by one node
+        u = np.ascontiguousarray(u)
+        return as_strided(u, shape=(u.shape[0], self.options['num_elements'], 4),
+                          strides=(u.strides[0], 2 * u.strides[1], u.strides[1]),
+                          writeable=False)
+
+    def _apply_elements(self, K_local, u):
+        """
+        Multiply the nodal part of u (one load case per row) by the element stiffness blocks.
+        """
+        num_elements = self.options['num_elements']
+        n_cases = u.shape[0]
+
+        # element ind connects nodes ind and ind + 1; working on 2x2 blocks of K_local with
+        # strided views avoids gathering copies of u per element
+        u_nodes = u[:, :2 * num_elements + 2].reshape(n_cases, num_elements + 1, 2)
+        u_0 = u_nodes[:, :-1]
+        u_1 = u_nodes[:, 1:]
+
+        Ku = np.zeros((n_cases, num_elements + 1, 2), dtype=np.result_type(K_local, u))
+        Ku[:, :-1] += np.einsum('eij,cej->cei', K_local[:, :2, :2], u_0)
+        Ku[:, :-1] += np.einsum('eij,cej->cei', K_local[:, :2, 2:], u_1)
+        Ku[:, 1:] += np.einsum('eij,cej->cei', K_local[:, 2:, :2], u_0)
+        Ku[:, 1:] += np.einsum('eij,cej->cei', K_local[:, 2:, 2:], u_1)
+
+        return Ku.reshape(n_cases, -1)
+
+    def _apply_K(self, K_local, u):
+        """
+        Multiply u (one load case per row) by the full K, including the clamp multipliers.
+        """
+        n_dofs = u.shape[1] - 2
+
+        Ku = np.empty_like(u, dtype=np.result_type(K_local, u))
+        Ku[:, :n_dofs] = self._apply_elements(K_local, u)
+        Ku[:, :2] += u[:, n_dofs:]
+        Ku[:, n_dofs:] = u[:, :2]
+
+        return Ku
+
+    def _apply_free(self, K_local, x):
+        """
+        Multiply the free dofs x (one load case per row) by the clamp-eliminated stiffness.
+        """
+        x_full = np.zeros((x.shape[0], x.shape[1] + 2), dtype=x.dtype)
+        x_full[:, 2:] = x
+        return self._apply_elements(K_local, x_full)[:, 2:]
+
+    def _get_preconditioner(self, K_local):
+        """
+        Return a function applying the preconditioner to free-dof residuals (one case per row).
+        """
+        K_local = K_local.real
+
+        if self.options['preconditioner'] == 'banded':
+            cb = ClampedBandedFactor(K_local).cb
+            return lambda r: cho_solve_banded((cb, False), r.T).T
+
+        # nodal 2x2 block-Jacobi for the free nodes 1 ... num_nodes - 1
+        D = K_local[:, 2:, 2:].copy()
+        D[:-1] += K_local[1:, :2, :2]
+        D_inv = np.linalg.inv(D)
+
+        return lambda r: np.einsum('kij,ckj->cki', D_inv,
+                                   r.reshape(r.shape[0], -1, 2)).reshape(r.shape)
+
+    def _solve_clamped(self, K_local, rhs, apply_M, x0=None):
+        """
+        Solve K x = rhs (one load case per row) with the clamp applied by elimination.
+        """
+        n_dofs = rhs.shape[1] - 2
+
+        x = np.zeros_like(rhs, dtype=np.result_type(K_local, rhs))
+
+        # the multiplier rows prescribe the clamped dofs directly
+        x[:, :2] = rhs[:, n_dofs:]
+
+        # move the prescribed dofs to the right-hand side and solve for the free ones
+        r_f = rhs[:, :n_dofs] - self._apply_elements(K_local, x)
+        x[:, 2:n_dofs] = self._pcg(K_local, r_f[:, 2:], apply_M,
+                                   None if x0 is None else x0[:, 2:n_dofs])
+
+        x[:, n_dofs:] = rhs[:, :2] - self._apply_elements(K_local, x)[:, :2]
+        return x
+
+    def _pcg(self, K_local, b, apply_M, x0=None):
+        """
+        Preconditioned conjugate gradients on the free dofs, for all load cases at once.
+        """
+        if np.iscomplexobj(K_local) or np.iscomplexobj(b):
+            # complex step: to first order in the step, the imaginary part solves the real
+            # system with the imaginary part of K moved to the right-hand side
+            x_r = self._pcg(K_local.real, b.real, apply_M, None if x0 is None else x0.real)
+            b_i = b.imag - self._apply_free(K_local, x_r).imag
+            return x_r + 1j * self._pcg(K_local.real, b_i, apply_M)
+
+        rtol = self.options['cg_rtol']
+        maxiter = self.options['cg_maxiter'] or 10 * b.shape[1]
+
+        def safe_div(a, b):
+            return np.where(b == 0, 0., a / np.where(b == 0, 1., b))
+
+        # bound on the infinity norm of the free-dof stiffness, for the backward error estimate
+        row_sums = np.zeros((K_local.shape[0], 4))
+        for j in range(4):
+            row_sums += np.abs(K_local[:, :, j])
+        K_norm = np.max(row_sums[:-1, 2:] + row_sums[1:, :2])
+        K_norm = max(K_norm, np.max(row_sums[-1, 2:]))
+        b_norm = np.max(np.abs(b), axis=1)
+
+        x = np.zeros_like(b) if x0 is None else x0.copy()
+        r = b - self._apply_free(K_local, x)
+        z = apply_M(r)
+        p = z.copy()
+        rz = np.sum(r * z, axis=1)
+
+        for i in range(maxiter):
+            # normwise backward error; a residual relative to b alone is out of reach on
+            # fine meshes, where the conditioning limits even direct solves
+            x_norm = np.max(np.abs(x), axis=1)
+            if np.all(np.max(np.abs(r), axis=1) <= rtol * (K_norm * x_norm + b_norm)):
+                break
+
+            Ap = self._apply_free(K_local, p)
+            alpha = safe_div(rz, np.sum(p * Ap, axis=1))
+            x += alpha[:, np.newaxis] * p
+            r -= alpha[:, np.newaxis] * Ap
+
+            z = apply_M(r)
+            rz_new = np.sum(r * z, axis=1)
+            p = z + safe_div(rz_new, rz)[:, np.newaxis] * p
+            rz = rz_new
+        else:
+            raise om.AnalysisError('{}: conjugate gradients did not converge in {} '
+                                   'iterations'.format(self.pathname, maxiter))
+
+        return x
+
+    def _as_cases(self, u):
+        return u.reshape(-1, u.shape[-1])
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        force_vectors = self._get_force_vectors().T
+        u = self._as_cases(outputs['u'])
+
+        residuals['u'] = (self._apply_K(inputs['K_local'], u)
+                          - force_vectors).reshape(residuals['u'].shape)
+
+    def solve_nonlinear(self, inputs, outputs):
+        force_vectors = self._get_force_vectors().T
+
+        K_local = inputs['K_local']
+        apply_M = self._get_preconditioner(K_local)
+
+        # the previous solution is a good initial guess during an optimization
+        u = self._solve_clamped(K_local, force_vectors, apply_M, self._as_cases(outputs['u']))
+        outputs['u'] = u.reshape(outputs['u'].shape)
+
+    def linearize(self, inputs, outputs, jacobian):
+        # nothing to assemble; solve_linear only needs the element blocks and preconditioner
+        self.K_local = inputs['K_local'].copy()
+        self.apply_M = self._get_preconditioner(self.K_local)
+
+    def apply_linear(self, inputs, outputs, d_inputs, d_outputs, d_residuals, mode):
+        u = self._as_cases(outputs['u'])
+        n_dofs = u.shape[1] - 2
+
+        if mode == 'fwd':
+            if 'u' in d_residuals:
+                d_res = np.zeros_like(u)
+                if 'u' in d_outputs:
+                    d_res += self._apply_K(inputs['K_local'], self._as_cases(d_outputs['u']))
+                if 'K_local' in d_inputs:
+                    d_res[:, :n_dofs] += self._apply_elements(d_inputs['K_local'], u)
+                d_residuals['u'] += d_res.reshape(d_residuals['u'].shape)
+
+        else:
+            if 'u' in d_residuals:
+                d_res = self._as_cases(d_residuals['u'])
+                if 'u' in d_outputs:
+                    # K is symmetric
+                    d_outputs['u'] += self._apply_K(inputs['K_local'],
+                                                    d_res).reshape(d_outputs['u'].shape)
+                if 'K_local' in d_inputs:
+                    d_inputs['K_local'] += np.einsum('cei,cej->eij', self._element_view(d_res),
+                                                     self._element_view(u))
+
+    def solve_linear(self, d_outputs, d_residuals, mode):
+        # K is symmetric, so fwd and rev mode use the same solve
+        if mode == 'fwd':
+            rhs = d_residuals['u']
+            d_outputs['u'] = self._solve_clamped(self.K_local, self._as_cases(rhs),
+                                                 self.apply_M).reshape(rhs.shape)
+        else:
+            rhs = d_outputs['u']
+            d_residuals['u'] = self._solve_clamped(self.K_local, self._as_cases(rhs),
+                                                   self.apply_M).reshape(rhs.shape)
+
+
+class ParallelFEM(FEM):
+    """
+    Variant of FEM that solves with a DomainDecomposedSolver on num_workers local processes.
+
+    The element range is split into num_workers contiguous subdomains whose interior blocks
+    are factored concurrently; only the small interface system is solved in this process. K
+    is still assembled through the StiffnessCache for the residuals and the d(u)/d(u)
+    partials, but the workers hold the only factorization, which is redone when K_local
+    changes. Complex-step evaluations fall back to splu, since the workers are real-valued.
+
+    Every worker needs at least 2 elements. The max_update_rank, num_samples and
+    reduced_basis_size options of FEM are not supported, and solver must stay 'splu', which
+    is what complex-step evaluations use.
+    """
+
+    def initialize(self):
+        super(ParallelFEM, self).initialize()
+        self.options.declare('num_workers', types=int, default=2,
+                             desc='worker processes, i.e. subdomains of the element range')
+
+    def setup(self):
+        for name in ['max_update_rank', 'num_samples', 'reduced_basis_size']:
+            if self.options[name] is not None:
+                raise ValueError('{}: {} is not supported by ParallelFEM.'.format(
+                    self.msginfo, name))
+        if self.options['solver'] != 'splu':
+            raise ValueError("{}: solver='{}' is not supported by ParallelFEM.".format(
+                self.msginfo, self.options['solver']))
+
+        super(ParallelFEM, self).setup()
+
+        # a new setup may change the mesh, so the workers of the last one are stopped
+        self._close_workers()
+
+        force_shape = self.options['force_vector'].shape
+        n_cases = 1 if len(force_shape) == 1 else force_shape[0]
+        self.dd_solver = DomainDecomposedSolver(self.options['num_elements'],
+                                                self.options['num_workers'], n_cases)
+        self._factored_key = None
+
+    def _factor(self, inputs):
+        K_local = inputs['K_local']
+
+        if np.iscomplexobj(K_local):
+            self.K, self.lu = self.K_cache.get_K_lu(K_local, 'splu')
+        else:
+            self.K = self.K_cache.get_K(K_local)
+            key = hashlib.sha1(K_local.tobytes()).hexdigest()
+            if key != self._factored_key:
+                self.dd_solver.factor(K_local)
+                self._factored_key = key
+            self.lu = self.dd_solver
+
+        self.Ks = [self.K]
+        self.lus = [self.lu]
+
+    def _close_workers(self):
+        if getattr(self, 'dd_solver', None) is not None:
+            self.dd_solver.close()
+            self.dd_solver = None
+
+    def cleanup(self):
+        """
+        Stop the worker processes along with the rest of Problem.cleanup.
+        """
+        super(ParallelFEM, self).cleanup()
+        self._close_workers()
+
+
+class ModalComp(om.ExplicitComponent):
+    """
+    Lowest natural frequencies of the clamped beam, as the eigenvalues omega^2 of K phi =
+    omega^2 M phi.
+
+    M is the consistent mass matrix, assembled on the CSC pattern of K with zero mass on the
+    clamp multipliers. The eigenpairs come from shift-invert Lanczos about 0, so the Lanczos
+    operator is K^-1 M and its solves use the stiffness factorization itself: with the
+    K_cache of the FEM (see FEM's K_cache option), the static solve and the modal analysis
+    share one factorization per design. Each solve warm-starts from the last mode shapes.
+
+    With the modes normalized to phi^T M phi = 1, d(omega^2) = phi^T (dK - omega^2 dM) phi,
+    element by element, so the partials take O(n) work once the modes are known.
+    """
+
+    def initialize(self):
+        self.options.declare('num_elements', types=int)
+        self.options.declare('L')
+        self.options.declare('b')
+        self.options.declare('rho', default=1., desc='density')
+        self.options.declare('num_modes', types=int, default=1,
+                             desc='number of lowest eigenvalues to compute')
+        self.options.declare('K_cache', types=StiffnessCache, default=None, allow_none=True,
+                             desc='StiffnessCache of the FEM, to reuse its factorizations')
+        self.options.declare('solver', default='splu', values=['splu', 'banded'],
+                             desc='factorization of K, see FEM; match the FEM to share it')
+        self.options.declare('tol', default=1e-12, desc='relative accuracy of the eigenvalues')
+
+    def setup(self):
+        num_elements = self.options['num_elements']
+        num_modes = self.options['num_modes']
+        L0 = self.options['L'] / num_elements
+
+        self.K_cache = self.options['K_cache']
+        if self.K_cache is None:
+            self.K_cache = StiffnessCache(num_elements)
+        self.pattern = self.K_cache.pattern
+        self.M_coeffs = get_local_mass_coeffs(self.options['rho'], self.options['b'], L0)
+
+        # element ind owns dofs 2 * ind ... 2 * ind + 3
+        self.elem_dofs = np.arange(4) + 2 * np.arange(num_elements)[:, np.newaxis]
+        self._v0 = None
+        self._last = None
+
+        self.add_input('K_local', shape=(num_elements, 4, 4))
+        self.add_input('h', shape=num_elements)
+        self.add_output('eigenvalues', shape=num_modes)
+
+        # every eigenvalue depends on all the elements
+        self.declare_partials('eigenvalues', 'K_local',
+                              rows=np.repeat(np.arange(num_modes), 16 * num_elements),
+                              cols=np.tile(np.arange(16 * num_elements), num_modes))
+        self.declare_partials('eigenvalues', 'h',
+                              rows=np.repeat(np.arange(num_modes), num_elements),
+                              cols=np.tile(np.arange(num_elements), num_modes))
+
+    def assemble_CSC_M(self, h):
+        """
+        Assemble the consistent mass matrix on the CSC pattern of K.
+
+        Returns
+        -------
+        csc_matrix
+            Mass matrix in sparse CSC format, zero on the clamp multipliers.
+        """
+        M_local = self.M_coeffs * h[:, np.newaxis, np.newaxis]
+        data = assemble_CSC_data(M_local, self.pattern) - self.pattern.bc_data
+
+        return csc_matrix((data, self.pattern.indices, self.pattern.indptr),
+                          shape=self.pattern.shape)
+
+    def _solve(self, inputs):
+        """
+        Return the lowest eigenvalues and their M-normalized mode shapes, one per column.
+        """
+        num_modes = self.options['num_modes']
+        h = inputs['h']
+        K, lu = self.K_cache.get_K_lu(inputs['K_local'], self.options['solver'])
+
+        # compute_partials follows compute at the same design
+        last = self._last
+        if last is not None and last[0] is K and np.array_equal(last[1], h):
+            return last[2:]
+
+        M = self.assemble_CSC_M(h)
+
+        # K is factored once per design, so sigma stays 0 instead of tracking omega^2
+        OPinv = LinearOperator(K.shape, matvec=lu.solve, dtype=K.dtype)
+        eigenvalues, phi = eigsh(K, k=num_modes, M=M, sigma=0., which='LM', OPinv=OPinv,
+                                 v0=self._v0, tol=self.options['tol'])
+
+        order = np.argsort(eigenvalues)
+        eigenvalues = eigenvalues[order]
+        phi = phi[:, order]
+        phi /= np.sqrt(np.einsum('ik,ik->k', phi, M.dot(phi)))
+
+        self._v0 = phi.sum(axis=1)
+        self._last = (K, h.copy(), eigenvalues, phi)
+        return eigenvalues, phi
+
+    def compute(self, inputs, outputs):
+        outputs['eigenvalues'] = self._solve(inputs)[0]
+
+    def compute_partials(self, inputs, partials):
+        eigenvalues, phi = self._solve(inputs)
+
+        # (num_modes, num_elements, 4)
+        phi_elem = phi[self.elem_dofs].transpose(2, 0, 1)
+
+        partials['eigenvalues', 'K_local'] = np.einsum('kei,kej->keij', phi_elem,
+                                                       phi_elem).ravel()
+        partials['eigenvalues', 'h'] = (-eigenvalues[:, np.newaxis] * np.einsum(
+            'kei,ij,kej->ke', phi_elem, self.M_coeffs, phi_elem)).ravel()
+
 
 class ComplianceComp(om.ExplicitComponent):
 
     def initialize(self):
         self.options.declare('num_elements', types=int)
-        self.options.declare('force_vector', types=np.ndarray)
+        self.options.declare('force_vector', types=np.ndarray,
+                             desc='nodal loads, shape (2 * num_nodes,) or '
+                                  '(n_cases, 2 * num_nodes) for multiple load cases')
+        self.options.declare('weights', types=np.ndarray, default=None, allow_none=True,
+                             desc='load case weights; if given, compliance is the weighted sum '
+                                  'over the load cases instead of one value per case')
+        self.options.declare('num_samples', types=int, default=None, allow_none=True,
+                             desc='if given, displacements and compliance get a leading '
+                                  'sample dimension')
 
     def setup(self):
         num_elements = self.options['num_elements']
         num_nodes = num_elements + 1
         force_vector = self.options['force_vector']
+        weights = self.options['weights']
+        num_samples = self.options['num_samples']
+        sample_shape = () if num_samples is None else (num_samples,)
+        n_samples = 1 if num_samples is None else num_samples
 
-        self.add_input('displacements', shape=2 * num_nodes)
-        self.add_output('compliance')
+        self.add_input('displacements', shape=sample_shape + force_vector.shape)
+
+        if force_vector.ndim == 1:
+            compliance_shape = ()
+            rows = np.zeros(2 * num_nodes, dtype=int)
+            val = force_vector
+
+        elif weights is None:
+            n_cases = force_vector.shape[0]
+            compliance_shape = (n_cases,)
 
+            # each case only depends on its own displacements
+            rows = np.repeat(np.arange(n_cases), 2 * num_nodes)
+            val = force_vector.ravel()
+
+        else:
+            compliance_shape = ()
+            rows = np.zeros(force_vector.size, dtype=int)
+            val = (weights[:, np.newaxis] * force_vector).ravel()
+
+        self.add_output('compliance', shape=sample_shape + compliance_shape or (1,))
+
+        # every sample only depends on its own displacements, with the same coefficients
+        n_compliances = int(np.prod(compliance_shape, dtype=int))
+        offsets = np.arange(n_samples)[:, np.newaxis]
         self.declare_partials('compliance', 'displacements',
-                              val=force_vector.reshape((1, 2 * num_nodes)))
+                              rows=(rows + n_compliances * offsets).ravel(),
+                              cols=(np.arange(force_vector.size) + force_vector.size
+                                    * offsets).ravel(),
+                              val=np.tile(val, n_samples))
 
     def compute(self, inputs, outputs):
         force_vector = self.options['force_vector']
+        weights = self.options['weights']
+
+        compliance = np.sum(force_vector * inputs['displacements'], axis=-1)
+
+        if weights is not None and force_vector.ndim > 1:
+            compliance = np.dot(compliance, weights)
+
+        outputs['compliance'] = compliance
+
+
+class ComplianceStatsComp(om.ExplicitComponent):
+    """
+    Mean and variance of the compliance over the samples of a robust design.
+    """
+
+    def initialize(self):
+        self.options.declare('num_samples', types=int)
+        self.options.declare('ddof', types=int, default=0,
+                             desc='delta degrees of freedom of the variance, as in np.var')
+
+    def setup(self):
+        num_samples = self.options['num_samples']
+
+        self.add_input('compliance', shape=num_samples)
+        self.add_output('mean')
+        self.add_output('variance')
+
+        self.declare_partials('mean', 'compliance', val=1. / num_samples)
+        self.declare_partials('variance', 'compliance')
+
+    def compute(self, inputs, outputs):
+        compliance = inputs['compliance']
+
+        # np.var takes the modulus of complex deviations, which breaks complex step
+        deviations = compliance - np.mean(compliance)
+        outputs['mean'] = np.mean(compliance)
+        outputs['variance'] = np.dot(deviations, deviations) / (
+            len(compliance) - self.options['ddof'])
+
+    def compute_partials(self, inputs, partials):
+        compliance = inputs['compliance']
+
+        # the deviations sum to zero, so the mean's own derivative drops out
+        partials['variance', 'compliance'] = 2. * (compliance - np.mean(compliance)) / (
+            len(compliance) - self.options['ddof'])
+
+
+class BeamComplianceComp(om.ExplicitComponent):
+    """
+    Fused h -> compliance computation with an analytic adjoint gradient.
+
+    Compliance is self-adjoint: with K u = f, dc/dh = -u^T (dK/dh) u, and since each h only
+    scales its own element block, the gradient is computed element by element in O(n) from the
+    displacements alone. No extra linear solve or K_local-sized Jacobian is needed.
+    """
+
+    def initialize(self):
+        self.options.declare('num_elements', types=int)
+        self.options.declare('E')
+        self.options.declare('L')
+        self.options.declare('b')
+        self.options.declare('force_vector', types=np.ndarray)
+        self.options.declare('cache_size', types=int, default=4,
+                             desc='number of assembled/factored stiffness matrices to keep')
+        self.options.declare('solver', default='splu', values=['splu', 'banded'],
+                             desc='linear solver used for the displacements, see FEM')
+        self.options.declare('max_update_rank', types=int, default=None, allow_none=True,
+                             desc='low-rank factorization reuse threshold, see FEM')
+
+    def setup(self):
+        num_elements = self.options['num_elements']
+        E = self.options['E']
+        L = self.options['L']
+
+        self.coeffs = get_local_stiffness_coeffs(E, L / num_elements)
+        self.K_cache = StiffnessCache(num_elements, self.options['cache_size'],
+                                      self.options['max_update_rank'])
+
+        # element ind owns dofs 2 * ind ... 2 * ind + 3
+        self.elem_dofs = np.arange(4) + 2 * np.arange(num_elements)[:, np.newaxis]
+
+        self.add_input('h', shape=num_elements)
+        self.add_output('compliance')
+
+        self.declare_partials('compliance', 'h')
+
+    def _get_lu(self, h):
+        b = self.options['b']
+
+        K_local = self.coeffs * (1./12. * b * h ** 3)[:, np.newaxis, np.newaxis]
+        return self.K_cache.get_K_lu(K_local, self.options['solver'])[1]
+
+    def _solve(self, h):
+        force_vector = np.concatenate([self.options['force_vector'], np.zeros(2)])
+        return self._get_lu(h).solve(force_vector.astype(h.dtype)), force_vector
+
+    def compute(self, inputs, outputs):
+        u, force_vector = self._solve(inputs['h'])
+
+        outputs['compliance'] = np.dot(force_vector, u)
+
+    def compute_partials(self, inputs, partials):
+        b = self.options['b']
+        h = inputs['h']
+
+        # the factorization is already cached from compute, so this is a single solve
+        u, force_vector = self._solve(h)
+        u_elem = u[self.elem_dofs]
+
+        dI_dh = 1./4. * b * h ** 2
+        partials['compliance', 'h'] = -dI_dh * np.einsum('ei,ij,ej->e', u_elem, self.coeffs,
+                                                         u_elem)
+
+    def compute_hessian_vector_product(self, inputs, p):
+        """
+        Return the Hessian of the compliance wrt h times p.
+
+        Differentiating the gradient once more gives
+        d2c/dh_i dh_j = 2 u^T K_i' K^-1 K_j' u - delta_ij u^T K_i'' u, so a product costs one
+        more solve with the cached factorization of K. OpenMDAO has no second derivatives, so
+        this is for drivers or scripts that call it directly, e.g. Newton-CG.
+
+        Parameters
+        ----------
+        inputs : Vector
+            Unscaled input vector, or any mapping with 'h'.
+        p : ndarray
+            Direction, shape (num_elements,).
+
+        Returns
+        -------
+        ndarray
+            Hessian-vector product, shape (num_elements,).
+        """
+        b = self.options['b']
+        h = inputs['h']
+
+        lu = self._get_lu(h)
+        u, force_vector = self._solve(h)
+        u_elem = u[self.elem_dofs]
+
+        # I is proportional to h ** 3, so K_i' = dI_dh K_unit_i and K_i'' = d2I_dh2 K_unit_i
+        coeffs_u = np.einsum('ij,ej->ei', self.coeffs, u_elem)
+        dK_u = (1./4. * b * h ** 2)[:, np.newaxis] * coeffs_u
+
+        rhs = np.zeros(len(u), dtype=dK_u.dtype)
+        np.add.at(rhs, self.elem_dofs, p[:, np.newaxis] * dK_u)
+        w = lu.solve(rhs)
 
-        outputs['compliance'] = np.dot(force_vector, inputs['displacements'])
+        d2I_dh2 = 1./2. * b * h
+        return 2. * np.einsum('ei,ei->e', dK_u, w[self.elem_dofs]) \
+            - d2I_dh2 * p * np.einsum('ei,ei->e', u_elem, coeffs_u)
 
 
 class VolumeComp(om.ExplicitComponent):
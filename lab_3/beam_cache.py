@@ -0,0 +1,231 @@
+from __future__ import print_function, division
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from time import time
+
+import numpy as np
+
+from beam_profiler import PROFILE_ENV_VAR
+
+# standalone_beam.py reads its settings from environment variables with this prefix; all of
+# them but the profile file can change the results
+ENV_VAR_PREFIX = 'STANDALONE_BEAM_'
+IGNORED_ENV_VARS = [PROFILE_ENV_VAR]
+
+
+class ResultCache(object):
+    """
+    Content-addressed on-disk cache of standalone_beam.py results.
+
+    Entries are keyed on a hash of the full command line, of the standalone_beam.py settings
+    in the environment it runs in and of every input sent to it, and stored as one .npz
+    file per key in cache_dir. Hits bump the file's mtime, so
+    when the directory grows past max_bytes the least recently used entries are evicted
+    first.
+
+    Several processes can share one cache_dir: entries are written to a temporary file and
+    atomically renamed into place, and a file that disappears under a concurrent eviction
+    just counts as a miss. The statistics only cover this process.
+    """
+
+    def __init__(self, cache_dir, max_bytes=100 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # run time of the cached evaluations minus the time spent reading them back
+        self.time_saved = 0.
+        self._lock = threading.Lock()
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        # the directory is only rescanned once this running total passes max_bytes; other
+        # processes' entries are picked up by the rescan
+        self._num_bytes = sum(entry[1] for entry in self._list_entries())
+
+    @property
+    def hit_rate(self):
+        num_calls = self.hits + self.misses
+        return self.hits / num_calls if num_calls else 0.
+
+    def get_key(self, command, inputs, env_vars=None):
+        """
+        Hash the command line, e.g. ['python', 'standalone_beam.py', 'solve', 'input.npz',
+        'output.npz'], the inputs and the STANDALONE_BEAM_ settings of os.environ updated
+        with env_vars. Arrays are hashed by value, so any bit-identical evaluation under the
+        same settings maps to the same entry.
+        """
+        env = dict(os.environ, **(env_vars or {}))
+        settings = sorted((name, value) for name, value in env.items()
+                          if name.startswith(ENV_VAR_PREFIX) and name not in IGNORED_ENV_VARS)
+
+        sha = hashlib.sha1(json.dumps([list(command), settings]).encode())
+        for name in sorted(inputs):
+            value = np.ascontiguousarray(inputs[name], dtype=float)
+            sha.update('{}{}'.format(name, value.shape).encode())
+            sha.update(value.tobytes())
+        return sha.hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def get(self, key):
+        """
+        Return the cached results and the duration of the original run,
+        or (None, None) on a miss.
+        """
+        path = self._get_path(key)
+        try:
+            with np.load(path) as f:
+                data = {}
+                for name in f.files:
+                    value = f[name]
+                    data[name] = value.item() if value.ndim == 0 else value
+            duration = data.pop('_duration')
+            os.utime(path, None)
+        except (IOError, OSError):
+            # missing, or evicted by another process while we were reading it
+            return None, None
+        except (KeyError, ValueError, EOFError, zipfile.BadZipfile):
+            # truncated, corrupt or not written by put; the miss writes a good entry back
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None, None
+
+        return data, duration
+
+    def put(self, key, data, duration):
+        """
+        Store the results of one run; once the cache outgrows max_bytes, the least
+        recently used entries are evicted until it fits again.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, _duration=duration, **data)
+            path = self._get_path(key)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._num_bytes += os.path.getsize(path)
+            if self._num_bytes > self.max_bytes:
+                self._evict()
+
+    def _list_entries(self):
+        """
+        Return (mtime, size, name) of every entry currently in the cache directory.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict(self):
+        entries = self._list_entries()
+
+        total_bytes = sum(entry[1] for entry in entries)
+        for mtime, size, name in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total_bytes -= size
+
+        self._num_bytes = total_bytes
+
+    def evaluate(self, command, inputs, run, env_vars=None):
+        """
+        Return the results of run(), a function that runs command with the given inputs and
+        env_vars, from the cache if the same evaluation has been done before.
+        """
+        key = self.get_key(command, inputs, env_vars)
+
+        pre_time = time()
+        data, duration = self.get(key)
+        if data is not None:
+            with self._lock:
+                self.hits += 1
+                self.time_saved += duration - (time() - pre_time)
+            return data
+
+        pre_time = time()
+        data = run()
+        duration = time() - pre_time
+
+        self.put(key, data, duration)
+        with self._lock:
+            self.misses += 1
+
+        return data
+
+    def evaluate_batch(self, command, inputs_list, run_batch, env_vars=None):
+        """
+        Like evaluate for a list of points; run_batch(inputs_list) is only called for the
+        points that miss, all together, and must return their results in the same order.
+        """
+        keys = [self.get_key(command, inputs, env_vars) for inputs in inputs_list]
+        results = [None] * len(keys)
+
+        pre_time = time()
+        saved = 0.
+        for i_point, key in enumerate(keys):
+            results[i_point], duration = self.get(key)
+            if duration is not None:
+                saved += duration
+        missing = [i_point for i_point, data in enumerate(results) if data is None]
+
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.time_saved += saved - (time() - pre_time)
+
+        if missing:
+            pre_time = time()
+            new_results = run_batch([inputs_list[i_point] for i_point in missing])
+            # the batch's run time is charged evenly to its points
+            duration = (time() - pre_time) / len(missing)
+
+            for i_point, data in zip(missing, new_results):
+                self.put(keys[i_point], data, duration)
+                results[i_point] = data
+
+            with self._lock:
+                self.misses += len(missing)
+
+        return results
+
+    def __repr__(self):
+        return 'ResultCache(hits={}, misses={}, hit_rate={:.2f}, time_saved={:.3f}s)'.format(
+            self.hits, self.misses, self.hit_rate, self.time_saved)
+
+
+# one cache object per (directory, size cap), so components sharing a directory share statistics
+_caches = {}
+
+
+def get_cache(cache_dir, max_bytes):
+    """
+    Return the ResultCache for cache_dir, creating it if needed.
+    """
+    key = (os.path.abspath(cache_dir), max_bytes)
+    if key not in _caches:
+        _caches[key] = ResultCache(cache_dir, max_bytes)
+    return _caches[key]
@@ -0,0 +1,161 @@
+from __future__ import print_function, division
+
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from time import time
+
+
+# when this environment variable is set, standalone_beam.py writes the timestamps of each
+# command's phases, as JSON, to the file it names, relative to the command's directory
+PROFILE_ENV_VAR = 'STANDALONE_BEAM_PROFILE'
+PROFILE_FILE = 'standalone_beam_profile.json'
+
+# the phases of one call in order; the wrapper times write_inputs and read_outputs, the
+# rest come from standalone_beam.py's timestamps
+PHASES = ['write_inputs', 'launch', 'import', 'read_input', 'compute', 'write_output', 'exit',
+          'read_outputs']
+
+
+class ProfiledCall(object):
+    """
+    Timestamps of one call to standalone_beam.py. Use it as a context manager around the
+    call and mark() the end of its 'write_inputs', 'run' and 'read_outputs' steps; on a
+    clean exit the call is recorded by profiler, unless profiler is None.
+    """
+
+    def __init__(self, profiler, command, directory='.'):
+        self.profiler = profiler
+        self.command = command
+        self.directory = directory
+        self.start = None
+        self.marks = {}
+
+    def __enter__(self):
+        self.start = time()
+        return self
+
+    def mark(self, step):
+        self.marks[step] = time()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profiler is not None:
+            if exc_type is None:
+                self.profiler.record(self)
+            else:
+                # don't leave the failed command's timestamps for the next call to pick up
+                self.profiler.read_profile(self.directory)
+
+
+class CallProfiler(object):
+    """
+    Per-phase timings of the calls a component makes to standalone_beam.py.
+
+    Each call is split into the PHASES, from writing the input file, through process
+    launch, the numpy/scipy imports and the command's own read, compute and write, to
+    reading the output file back, and appended to trace_file as one JSON line. The totals
+    per phase are kept for report(); report_profiles prints it for every profiled component
+    of a model, e.g. after run_driver.
+
+    Calls to something other than standalone_beam.py, which leaves no timestamps, are
+    charged to 'compute' as a whole.
+    """
+
+    def __init__(self, trace_file, name=''):
+        self.trace_file = trace_file
+        self.name = name
+        self.num_calls = 0
+        self.totals = OrderedDict((phase, 0.) for phase in PHASES)
+        self._lock = threading.Lock()
+
+        # one trace per setup
+        open(trace_file, 'w').close()
+
+    def read_profile(self, directory):
+        """
+        Return and remove the timestamps standalone_beam.py left in directory, or None.
+        """
+        path = os.path.join(directory, PROFILE_FILE)
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+            os.remove(path)
+        except (IOError, OSError, ValueError):
+            return None
+        return profile
+
+    def get_phases(self, call):
+        """
+        Split a finished ProfiledCall into the duration of each phase.
+        """
+        run_start = call.marks['write_inputs']
+        run_end = call.marks['run']
+        profile = self.read_profile(call.directory)
+
+        phases = OrderedDict((phase, 0.) for phase in PHASES)
+        phases['write_inputs'] = run_start - call.start
+        phases['read_outputs'] = call.marks['read_outputs'] - run_end
+
+        if profile is None:
+            phases['compute'] = run_end - run_start
+            return phases
+
+        # a process started for this call pays for the imports; a worker paid for them once
+        if profile['process_start'] >= run_start:
+            phases['import'] = profile['imports_end'] - profile['process_start']
+        phases['launch'] = profile['command_start'] - run_start - phases['import']
+        phases['read_input'] = profile['read_input'] - profile['command_start']
+        phases['compute'] = profile['compute'] - profile['read_input']
+        phases['write_output'] = profile['write_output'] - profile['compute']
+        phases['exit'] = run_end - profile['write_output']
+
+        return phases
+
+    def record(self, call):
+        phases = self.get_phases(call)
+        line = json.dumps(OrderedDict([
+            ('component', self.name),
+            ('command', call.command),
+            ('start', call.start),
+            ('phases', phases),
+            ('total', call.marks['read_outputs'] - call.start),
+        ]))
+
+        # pool workers record from several threads
+        with self._lock:
+            with open(self.trace_file, 'a') as f:
+                f.write(line + '\n')
+
+            self.num_calls += 1
+            for phase, duration in phases.items():
+                self.totals[phase] += duration
+
+    def report(self, out_stream=sys.stdout):
+        """
+        Print the total time of each phase, largest first.
+        """
+        total = sum(self.totals.values())
+
+        print('{}: {} calls to standalone_beam.py, trace in {}'.format(
+            self.name, self.num_calls, self.trace_file), file=out_stream)
+        print('{:>14s}{:>12s}{:>12s}{:>8s}'.format('phase', 'total sec', 'per call', 'share'),
+              file=out_stream)
+        for phase, duration in sorted(self.totals.items(), key=lambda item: -item[1]):
+            print('{:>14s}{:12.3e}{:12.3e}{:7.1f}%'.format(
+                phase, duration, duration / max(self.num_calls, 1),
+                100. * duration / total if total else 0.), file=out_stream)
+        print('{:>14s}{:12.3e}{:12.3e}'.format('total', total, total / max(self.num_calls, 1)),
+              file=out_stream)
+
+
+def report_profiles(model, out_stream=sys.stdout):
+    """
+    Print the report of every component under model that profiles its calls, i.e. has a
+    trace_file; nothing is printed if none does.
+    """
+    for system in model.system_iter(include_self=True, recurse=True):
+        profiler = getattr(system, 'profiler', None)
+        if profiler is not None:
+            profiler.report(out_stream)
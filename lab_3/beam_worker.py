@@ -0,0 +1,256 @@
+from __future__ import print_function, division
+
+import atexit
+import json
+import os
+import select
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import Popen, PIPE, TimeoutExpired
+
+import numpy as np
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+from openmdao.api import AnalysisError
+
+
+class BeamWorker(object):
+    """
+    Client for a persistent `standalone_beam.py worker` process.
+
+    The worker is started once with the same interpreter and script as the one-shot
+    commands, e.g. ['python', 'standalone_beam.py'], and then runs each command in the
+    already-warm interpreter instead of starting a new process.
+    """
+
+    def __init__(self, prefix, env=None):
+        self.prefix = list(prefix)
+        self.num_calls = 0
+
+        # stderr is inherited, so whatever the commands print still shows up on the console
+        self._process = Popen(self.prefix + ['worker'], stdin=PIPE, stdout=PIPE, env=env,
+                              universal_newlines=True, bufsize=1)
+
+    @property
+    def alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def run(self, argv, timeout=0., cwd=None):
+        """
+        Run one command, e.g. ['solve'], in the worker's interpreter from cwd,
+        which defaults to the current directory.
+
+        Returns
+        -------
+        tuple
+            (return_code, error_msg), with the error output of a failed command;
+            return_code is None if the call timed out, in which case the worker is killed.
+        """
+        request = {'argv': list(argv), 'cwd': os.path.abspath(cwd or os.getcwd())}
+        self._process.stdin.write(json.dumps(request) + '\n')
+        self._process.stdin.flush()
+        self.num_calls += 1
+
+        if timeout:
+            ready, _, _ = select.select([self._process.stdout], [], [], timeout)
+            if not ready:
+                self.close(kill=True)
+                return None, 'Timed out after {} sec.'.format(timeout)
+
+        line = self._process.stdout.readline()
+        if not line:
+            return_code = self._process.wait()
+            self._process = None
+            return return_code, 'standalone_beam worker exited unexpectedly'
+
+        reply = json.loads(line)
+        return reply['return_code'], reply['error_msg']
+
+    def close(self, kill=False):
+        """
+        Stop the worker; closing its stdin lets it finish the loop and exit cleanly.
+        """
+        if self._process is None:
+            return
+
+        if kill:
+            self._process.kill()
+        else:
+            self._process.stdin.close()
+        self._process.wait()
+        self._process = None
+
+
+class WorkerPool(object):
+    """
+    A fixed set of BeamWorkers, each with its own scratch directory, for running
+    independent commands such as finite-difference points concurrently.
+
+    Every worker is a separate process, so the commands really run in parallel; the threads
+    that feed them only wait on the pipes.
+    """
+
+    def __init__(self, prefix, num_workers, env=None):
+        self.prefix = list(prefix)
+        self.env = env
+        self.workers = [BeamWorker(self.prefix, env=env) for i in range(num_workers)]
+        self.scratch_dirs = [tempfile.mkdtemp(prefix='beam_worker_') for i in range(num_workers)]
+
+        self._executor = ThreadPoolExecutor(num_workers)
+        self._free = Queue()
+        for i_worker in range(num_workers):
+            self._free.put(i_worker)
+
+    def map(self, func, items):
+        """
+        Call func(worker, scratch_dir, item) for every item on the next free worker.
+
+        Returns
+        -------
+        list
+            The results in the order of items.
+        """
+        def call(item):
+            i_worker = self._free.get()
+            try:
+                if not self.workers[i_worker].alive:
+                    # e.g. killed after a timeout
+                    self.workers[i_worker] = BeamWorker(self.prefix, env=self.env)
+                return func(self.workers[i_worker], self.scratch_dirs[i_worker], item)
+            finally:
+                self._free.put(i_worker)
+
+        return list(self._executor.map(call, items))
+
+    def map_chunks(self, func, items):
+        """
+        Split items into one contiguous chunk per worker and call func(worker, scratch_dir,
+        chunk) for each, e.g. to run every chunk with a single batch command.
+
+        Returns
+        -------
+        list
+            The concatenated results, which func returns as one list per chunk.
+        """
+        num_chunks = min(len(self.workers), len(items))
+        bounds = np.linspace(0, len(items), num_chunks + 1).astype(int)
+        chunks = [items[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+        return [result for results in self.map(func, chunks) for result in results]
+
+    def close(self):
+        self._executor.shutdown()
+        for worker in self.workers:
+            worker.close()
+        for scratch_dir in self.scratch_dirs:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def _get_env(env_vars):
+    if not env_vars:
+        return None
+    env = os.environ.copy()
+    env.update(env_vars)
+    return env
+
+
+# one worker per (interpreter, script, environment), shared by every component that uses it
+_workers = {}
+_pools = {}
+
+
+def get_worker(prefix, env_vars=None):
+    """
+    Return a running worker for the given command prefix, starting one if needed.
+    """
+    env_vars = env_vars or {}
+    key = (tuple(prefix), tuple(sorted(env_vars.items())))
+
+    worker = _workers.get(key)
+    if worker is None or not worker.alive:
+        worker = _workers[key] = BeamWorker(prefix, env=_get_env(env_vars))
+
+    return worker
+
+
+def get_pool(prefix, num_workers, env_vars=None):
+    """
+    Return a WorkerPool of num_workers workers for the given command prefix,
+    starting one if needed.
+    """
+    env_vars = env_vars or {}
+    key = (tuple(prefix), num_workers, tuple(sorted(env_vars.items())))
+
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = WorkerPool(prefix, num_workers, env=_get_env(env_vars))
+
+    return pool
+
+
+@atexit.register
+def close_workers():
+    """
+    Stop all the workers and pools started by get_worker and get_pool.
+    """
+    for worker in _workers.values():
+        worker.close()
+    _workers.clear()
+
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
+
+
+def _run_process(command, env_vars=None, timeout=0., cwd=None):
+    """
+    Run command in a new process from cwd, like ExternalCodeComp does.
+
+    Returns
+    -------
+    tuple
+        (return_code, error_msg) like BeamWorker.run.
+    """
+    process = Popen(command, env=_get_env(env_vars), cwd=cwd, stderr=PIPE,
+                    universal_newlines=True)
+    try:
+        error_msg = process.communicate(timeout=timeout or None)[1]
+    except TimeoutExpired:
+        process.kill()
+        process.wait()
+        return None, 'Timed out after {} sec.'.format(timeout)
+
+    return process.returncode, error_msg
+
+
+def run_command(comp, command, worker=None, cwd=None):
+    """
+    Run command, of the form [interpreter, script, args...], for an ExternalCodeComp or
+    ExternalCodeImplicitComp from cwd, raising errors the same way its own commands do.
+
+    The command runs on worker if one is given, e.g. a pool worker in its scratch
+    directory, on the shared worker of its interpreter and script if the component's
+    use_worker option is set, and in a new process otherwise. The script must have a
+    `worker` command, like standalone_beam.py, for the first two. The component's
+    env_vars, timeout, allowed_return_codes and fail_hard options apply either way.
+    """
+    options = comp.options
+    if worker is None and options['use_worker']:
+        worker = get_worker(command[:2], options['env_vars'])
+
+    if worker is None:
+        return_code, error_msg = _run_process(command, options['env_vars'], options['timeout'],
+                                              cwd)
+    else:
+        return_code, error_msg = worker.run(command[2:], options['timeout'], cwd=cwd)
+
+    err_class = RuntimeError if options['fail_hard'] else AnalysisError
+    if return_code is None:
+        raise AnalysisError('Timed out after %s sec.' % options['timeout'])
+    elif return_code not in options['allowed_return_codes']:
+        raise err_class('return_code = %d%s' % (return_code, error_msg))
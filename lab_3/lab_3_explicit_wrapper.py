@@ -1,7 +1,15 @@
+import os
+
 import numpy as np
 
 import openmdao.api as om
 
+from beam_cache import get_cache
+from beam_profiler import (PROFILE_ENV_VAR, PROFILE_FILE, CallProfiler, ProfiledCall,
+                           report_profiles)
+from beam_worker import get_pool, run_command
+from standalone_beam import read_data
+
 class FEMBeam(om.ExternalCodeComp): 
 
     def initialize(self):
@@ -9,6 +17,31 @@ class FEMBeam(om.ExternalCodeComp):
         self.options.declare('L')
         self.options.declare('b')
         self.options.declare('num_elements', int)
+        self.options.declare('use_worker', types=bool, default=False,
+                             desc='Serve the commands from a long-lived standalone_beam.py '
+                                  'worker instead of starting a new python process per call')
+        self.options.declare('data_format', default='text', values=['text', 'npz'],
+                             desc='Exchange files with standalone_beam.py as python text or '
+                                  'as binary .npz archives')
+        self.options.declare('fd_workers', types=int, default=0,
+                             desc='Number of worker processes that evaluate the finite '
+                                  'difference points of compute_partials concurrently, each '
+                                  'with one batch call. Only used when the totals are not '
+                                  'approximated; 0 declares no partials and leaves the '
+                                  'derivatives to approx_totals, as in the demo below')
+        self.options.declare('fd_step', default=1e-4,
+                             desc='Absolute step of the concurrent finite differences')
+        self.options.declare('cache_dir', default=None, allow_none=True,
+                             desc='Directory of an on-disk cache of standalone_beam.py results, '
+                                  'which can be shared between runs; None disables caching')
+        self.options.declare('cache_max_mb', default=100.,
+                             desc='Size cap of the result cache in MB; least recently used '
+                                  'entries are evicted first')
+        self.options.declare('trace_file', default=None, allow_none=True,
+                             desc='JSON lines file that gets the per-phase timings of every '
+                                  'call to standalone_beam.py; report_profiles(model) prints '
+                                  'the totals, as after run_driver in the demo. None disables '
+                                  'profiling')
 
     def setup(self): 
         E = self.options['E']
@@ -26,41 +59,146 @@ class FEMBeam(om.ExternalCodeComp):
 
         # providing these is optional; the component will verify that any input
         # files exist before execution and that the output files exist after.
-        self.options['external_input_files'] = ['input.txt']
-        self.options['external_output_files'] = ['output.txt']
-
-        self.options['command'] = ['python', 'standalone_beam.py', 'solve']
-
-    def compute(self, inputs, outputs):
+        ext = '.npz' if self.options['data_format'] == 'npz' else '.txt'
+        self.input_file = 'input' + ext
+        self.output_file = 'output' + ext
+        self.options['external_input_files'] = [self.input_file]
+        self.options['external_output_files'] = [self.output_file]
+
+        self.options['command'] = ['python', 'standalone_beam.py', 'solve',
+                                   self.input_file, self.output_file]
+
+        if self.options['fd_workers'] > 0:
+            self.declare_partials(['compliance', 'volume'], 'h')
+
+        self.result_cache = None
+        if self.options['cache_dir'] is not None:
+            self.result_cache = get_cache(self.options['cache_dir'],
+                                          int(self.options['cache_max_mb'] * 1024 ** 2))
+
+        self.profiler = None
+        if self.options['trace_file'] is not None:
+            self.profiler = CallProfiler(self.options['trace_file'], self.pathname)
+            # makes standalone_beam.py timestamp its side of each call
+            self.options['env_vars'] = dict(self.options['env_vars'],
+                                            **{PROFILE_ENV_VAR: PROFILE_FILE})
+
+    def _write_inputs(self, filename, h):
         E = self.options['E']
         L = self.options['L']
         b = self.options['b']
         num_elements = self.options['num_elements']
 
+        if self.options['data_format'] == 'npz':
+            # binary arrays skip the per-element string conversion in both directions
+            np.savez(filename, num_elements=num_elements, E=E, L=L, b=b, h=h)
+        else:
+            with open(filename, 'w') as f: 
+                data = [
+                    'num_elements = {}'.format(num_elements), 
+                    'E = {}'.format(E), 
+                    'L = {}'.format(L),
+                    'b = {}'.format(b), 
+                    'h = np.array({})'.format(h.tolist())
+                ]
+
+                f.write("\n".join(data))
+
+    def _get_run_inputs(self, h):
+        return {
+            'num_elements': self.options['num_elements'],
+            'E': self.options['E'],
+            'L': self.options['L'],
+            'b': self.options['b'],
+            'h': h,
+        }
+
+    def _cached(self, run, h):
+        """
+        Return run(), or its results from the cache if the command already ran with these
+        inputs and env_vars.
+        """
+        if self.result_cache is None:
+            return run()
+        return self.result_cache.evaluate(self.options['command'], self._get_run_inputs(h), run,
+                                          self.options['env_vars'])
+
+    def compute(self, inputs, outputs):
         h = inputs['h']
 
-        with open('input.txt', 'w') as f: 
-            data = [
-                'num_elements = {}'.format(num_elements), 
-                'E = {}'.format(E), 
-                'L = {}'.format(L),
-                'b = {}'.format(b), 
-                'h = np.array({})'.format(h.tolist())
-            ]
+        def run():
+            with ProfiledCall(self.profiler, 'solve') as call:
+                self._write_inputs(self.input_file, h)
+                call.mark('write_inputs')
 
-            f.write("\n".join(data))
+                if self.options['use_worker']:
+                    # the same command, in the persistent standalone_beam.py process
+                    run_command(self, self.options['command'])
+                else:
+                    # method from base class to execute the code with the given command
+                    super(FEMBeam, self).compute(inputs, outputs)
+                call.mark('run')
 
-        # method from base class to execute the code with the given command
-        super(FEMBeam, self).compute(inputs, outputs)
+                # parses the output and puts the variables into the data dictionary
+                data = read_data(self.output_file)
+                call.mark('read_outputs')
 
-        with open('output.txt', 'r') as f: 
-            data = {}
-            # parses the output and puts the variables into the data dictionary
-            exec(f.read(), {}, data) 
+            return data
+
+        data = self._cached(run, h)
 
         outputs['compliance'] = data['compliance']
         outputs['volume'] = data['volume']
 
+    def _run_chunk(self, worker, scratch_dir, points):
+        """
+        Evaluate a chunk of finite difference points with a single solve-batch call on a
+        pool worker, inside its scratch directory.
+        """
+        command = self.options['command']
+        command = command[:2] + ['solve-batch'] + command[3:]
+
+        with ProfiledCall(self.profiler, 'solve-batch', scratch_dir) as call:
+            self._write_inputs(os.path.join(scratch_dir, self.input_file),
+                               np.array([point['h'] for point in points]))
+            call.mark('write_inputs')
+            run_command(self, command, worker, scratch_dir)
+            call.mark('run')
+            data = read_data(os.path.join(scratch_dir, self.output_file))
+            call.mark('read_outputs')
+
+        return [{'u': u, 'compliance': compliance, 'volume': volume} for u, compliance, volume
+                in zip(np.asarray(data['u']), np.asarray(data['compliance']),
+                       np.asarray(data['volume']))]
+
+    def compute_partials(self, inputs, partials):
+        if self.options['fd_workers'] == 0:
+            # no partials are declared; the model approximates its totals instead
+            return
+
+        step = self.options['fd_step']
+        h = inputs['h']
+
+        # the unperturbed point plus one forward step per element, split into one batch
+        # per worker and run concurrently
+        points = [self._get_run_inputs(h_point) for h_point in
+                  [h] + [h + step * e_i for e_i in np.eye(len(h))]]
+        pool = get_pool(self.options['command'][:2], self.options['fd_workers'],
+                        self.options['env_vars'])
+
+        def run_batch(points):
+            return pool.map_chunks(self._run_chunk, points)
+
+        if self.result_cache is None:
+            results = run_batch(points)
+        else:
+            # solve-batch gives the same results as solve, so the points share its entries
+            results = self.result_cache.evaluate_batch(self.options['command'], points,
+                                                       run_batch, self.options['env_vars'])
+
+        for name in ['compliance', 'volume']:
+            values = np.array([data[name] for data in results])
+            partials[name, 'h'] = (values[1:] - values[0]) / step
 
 
 
@@ -93,5 +231,8 @@ if __name__ == "__main__":
 
     p.run_driver()
 
+    # the per-phase timings, if a trace_file is given
+    report_profiles(p.model)
+
     p.model.list_outputs(print_arrays=True)
 
@@ -1,12 +1,73 @@
+import os
+
 import numpy as np
 
 import openmdao.api as om
 
+from beam_cache import get_cache
+from beam_profiler import (PROFILE_ENV_VAR, PROFILE_FILE, CallProfiler, ProfiledCall,
+                           report_profiles)
+from beam_worker import get_pool, run_command
+from standalone_beam import read_data, get_CSC_pattern
+
 def fmt_data(data): 
     """helper to format array data with lots of sig figs"""     
+    if np.ndim(data) == 2:
+        # stacked designs for the batch commands, one row each
+        return '[{}]'.format(','.join(fmt_data(row) for row in data))
     to_str = ['{:10.16f}'.format(n) for n in data]
     return '[{}]'.format(','.join(to_str))
 
+def write_inputs(filename, **data):
+    """
+    Write the inputs for standalone_beam.py, either as a binary .npz archive or as
+    `name = value` python text with arrays formatted by fmt_data.
+    """
+    if filename.endswith('.npz'):
+        # binary arrays skip the per-element string conversion in both directions
+        np.savez(filename, **data)
+        return
+
+    lines = []
+    for name, value in data.items():
+        if isinstance(value, np.ndarray):
+            lines.append('{} = np.array({})'.format(name, fmt_data(value)))
+        else:
+            lines.append('{} = {}'.format(name, value))
+
+    with open(filename, 'w') as f: 
+        f.write("\n".join(lines))
+
+def color_columns(rows, cols, num_cols):
+    """
+    Greedily group the columns of a sparse Jacobian, given by the (rows, cols) of its
+    nonzeros, so that no two columns of a group share a row. A finite difference step on
+    every column of a group at once then still gives each column's entries separately.
+
+    Returns
+    -------
+    ndarray
+        The group, or color, of each column, numbered from 0.
+    """
+    col_rows = [set() for i_col in range(num_cols)]
+    for row, col in zip(rows, cols):
+        col_rows[col].add(row)
+
+    colors = np.zeros(num_cols, dtype=int)
+    color_rows = []
+    for i_col in range(num_cols):
+        for color, used_rows in enumerate(color_rows):
+            if not used_rows & col_rows[i_col]:
+                break
+        else:
+            color = len(color_rows)
+            color_rows.append(set())
+
+        color_rows[color] |= col_rows[i_col]
+        colors[i_col] = color
+
+    return colors
+
 class FEMBeam(om.ExternalCodeImplicitComp): 
 
     def initialize(self):
@@ -14,6 +75,39 @@ class FEMBeam(om.ExternalCodeImplicitComp):
         self.options.declare('L')
         self.options.declare('b')
         self.options.declare('num_elements', int)
+        self.options.declare('use_worker', types=bool, default=False,
+                             desc='Serve the commands from a long-lived standalone_beam.py '
+                                  'worker instead of starting a new python process per call')
+        self.options.declare('data_format', default='text', values=['text', 'npz'],
+                             desc='Exchange files with standalone_beam.py as python text or '
+                                  'as binary .npz archives')
+        self.options.declare('partials_method', default='fd', values=['fd', 'exact'],
+                             desc="'fd' finite differences the apply command, perturbing "
+                                  "columns that share no residual together; 'exact' gets the "
+                                  "partials from one linearize command per linearization. "
+                                  "Pair either with a DirectSolver, which factors the sparse "
+                                  "K in-process")
+        self.options.declare('command_linearize', [],
+                             desc='command to be executed for linearize')
+        self.options.declare('command_solve_linear', [],
+                             desc='command to be executed for solve_linear')
+        self.options.declare('fd_workers', types=int, default=0,
+                             desc='Number of worker processes that evaluate the finite '
+                                  'difference points of linearize concurrently, each with one '
+                                  'batch call; 0 runs them one by one')
+        self.options.declare('fd_step', default=1e-4,
+                             desc='Absolute step of the finite differences')
+        self.options.declare('cache_dir', default=None, allow_none=True,
+                             desc='Directory of an on-disk cache of standalone_beam.py results, '
+                                  'which can be shared between runs; None disables caching')
+        self.options.declare('cache_max_mb', default=100.,
+                             desc='Size cap of the result cache in MB; least recently used '
+                                  'entries are evicted first')
+        self.options.declare('trace_file', default=None, allow_none=True,
+                             desc='JSON lines file that gets the per-phase timings of every '
+                                  'call to standalone_beam.py; report_profiles(model) prints '
+                                  'the totals, as after run_driver in the demo. None disables '
+                                  'profiling')
 
     def setup(self): 
         E = self.options['E']
@@ -32,26 +126,111 @@ class FEMBeam(om.ExternalCodeImplicitComp):
 
         # providing these is optional; the component will verify that any input
         # files exist before execution and that the output files exist after.
-        self.options['external_input_files'] = ['input.txt']
-        self.options['external_output_files'] = ['output.txt']
-
-        self.options['command_solve'] = ['python', 'standalone_beam.py', 'solve']
-
-        self.options['command_apply'] = ['python', 'standalone_beam.py', 'apply']
+        ext = '.npz' if self.options['data_format'] == 'npz' else '.txt'
+        self.input_file = 'input' + ext
+        self.output_file = 'output' + ext
+        self.options['external_input_files'] = [self.input_file]
+        self.options['external_output_files'] = [self.output_file]
+
+        self.options['command_solve'] = ['python', 'standalone_beam.py', 'solve',
+                                         self.input_file, self.output_file]
+
+        self.options['command_apply'] = ['python', 'standalone_beam.py', 'apply',
+                                         self.input_file, self.output_file]
+
+        self.options['command_linearize'] = ['python', 'standalone_beam.py', 'linearize',
+                                             self.input_file, self.output_file]
+
+        self.options['command_solve_linear'] = ['python', 'standalone_beam.py', 'solve_linear',
+                                                self.input_file, self.output_file]
+
+        # residuals are padded with the two clamp multipliers, which carry no load
+        self.force_vector = np.concatenate([force_vector, np.zeros(2)])
+
+        # element e only couples h[e] to the residuals of dofs 2e ... 2e + 3
+        dofs = np.arange(4) + 2 * np.arange(num_elements)[:, np.newaxis]
+        u_h_rows = dofs.ravel()
+        u_h_cols = np.repeat(np.arange(num_elements), 4)
+
+        # the partial wrt u is K, so it has the CSC pattern linearize writes
+        indptr, indices = get_CSC_pattern(num_elements)[:2]
+        u_u_rows = indices
+        u_u_cols = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+        self.declare_partials('u', 'h', rows=u_h_rows, cols=u_h_cols)
+        self.declare_partials('u', 'u', rows=u_u_rows, cols=u_u_cols)
+
+        # c_residual = compliance - f . u and v_residual = volume - sum(h * b * L0)
+        loaded_dofs = np.nonzero(self.force_vector)[0]
+        self.declare_partials('compliance', 'u', rows=np.zeros(len(loaded_dofs), int),
+                              cols=loaded_dofs, val=-self.force_vector[loaded_dofs])
+        # the volume row touches every h, so finite differencing it would leave no two h
+        # columns to perturb together; it is constant and given exactly instead
+        self.declare_partials('volume', 'h', val=-b * L / num_elements)
+
+        if self.options['partials_method'] == 'fd':
+            # columns of d(u_residuals)/d(h, u) that share no row get the same color and are
+            # perturbed together in linearize, one apply per color whatever the mesh size.
+            # an interior row couples the u columns of three nodes and the h columns of the
+            # two elements between them, so no coloring gets below 8 colors, which the greedy
+            # one reaches; the 3-4 colors of a band only hold for the h columns on their own.
+            # OpenMDAO's declare_coloring can't be used instead, since its partial coloring
+            # fails on the declared rows/cols under a DirectSolver, and with dense
+            # declarations it also colors the volume row, which touches every h
+            self._fd_rows = np.concatenate([u_h_rows, u_u_rows])
+            self._fd_cols = np.concatenate([u_h_cols, num_elements + u_u_cols])
+            self._fd_colors = color_columns(self._fd_rows, self._fd_cols,
+                                            num_elements + len(self.force_vector))
 
-
-        self.declare_partials('u', '*', method='fd', step=1e-4, step_calc='abs')
-
-
-        self.declare_partials('compliance', ['h', 'u'], method='fd', step=1e-4, step_calc='abs')
         # if we look in the wrapper, we can see that this deriv is analytically 1 
         self.declare_partials('compliance', 'compliance', val=1) 
-
-        # note: we know there is no derivative with respect to displacements, so we don't declare it
-        self.declare_partials('volume', 'h', method='fd', step=1e-4, step_calc='abs')
         # if we look in the wrapper, we can see that this deriv is analytically 1 
         self.declare_partials('volume', 'volume', val=1)
 
+        # external runs per command; cache hits aren't counted
+        self.call_counts = dict((name, 0) for name in ['solve', 'apply', 'apply-batch',
+                                                       'linearize', 'solve_linear'])
+
+        self.result_cache = None
+        if self.options['cache_dir'] is not None:
+            self.result_cache = get_cache(self.options['cache_dir'],
+                                          int(self.options['cache_max_mb'] * 1024 ** 2))
+
+        self.profiler = None
+        if self.options['trace_file'] is not None:
+            self.profiler = CallProfiler(self.options['trace_file'], self.pathname)
+            # makes standalone_beam.py timestamp its side of each call
+            self.options['env_vars'] = dict(self.options['env_vars'],
+                                            **{PROFILE_ENV_VAR: PROFILE_FILE})
+
+    def _cached(self, name, run, run_inputs):
+        """
+        Return run(), or its results from the cache if the command_<name> option already ran
+        with run_inputs and env_vars.
+        """
+        if self.result_cache is None:
+            return run()
+        return self.result_cache.evaluate(self.options['command_' + name], run_inputs, run,
+                                          self.options['env_vars'])
+
+    def _run_command(self, name, run_inputs):
+        """
+        Run the command_<name> option on run_inputs and return what it wrote.
+        """
+        def run():
+            self.call_counts[name] += 1
+            with ProfiledCall(self.profiler, name) as call:
+                write_inputs(self.input_file, **run_inputs)
+                call.mark('write_inputs')
+                run_command(self, self.options['command_' + name])
+                call.mark('run')
+                data = read_data(self.output_file)
+                call.mark('read_outputs')
+
+            return data
+
+        return self._cached(name, run, run_inputs)
+
 
     def solve_nonlinear(self, inputs, outputs):
         E = self.options['E']
@@ -61,24 +240,29 @@ class FEMBeam(om.ExternalCodeImplicitComp):
 
         h = inputs['h']
 
-        with open('input.txt', 'w') as f: 
-            data = [
-                'num_elements = {}'.format(num_elements), 
-                'E = {}'.format(E), 
-                'L = {}'.format(L),
-                'b = {}'.format(b), 
-                'h = np.array({})'.format(fmt_data(h))
-            ]
+        run_inputs = dict(num_elements=num_elements, E=E, L=L, b=b, h=h)
+
+        def run():
+            self.call_counts['solve'] += 1
+            with ProfiledCall(self.profiler, 'solve') as call:
+                write_inputs(self.input_file, **run_inputs)
+                call.mark('write_inputs')
 
-            f.write("\n".join(data))
+                if self.options['use_worker']:
+                    # the same command, in the persistent standalone_beam.py process
+                    run_command(self, self.options['command_solve'])
+                else:
+                    # method from base class to execute the code with the given command_apply
+                    super(FEMBeam, self).solve_nonlinear(inputs, outputs)
+                call.mark('run')
 
-        # method from base class to execute the code with the given command_apply
-        super(FEMBeam, self).solve_nonlinear(inputs, outputs)
+                # parses the output and puts the variables into the data dictionary
+                data = read_data(self.output_file)
+                call.mark('read_outputs')
 
-        with open('output.txt', 'r') as f: 
-            data = {}
-            # parses the output and puts the variables into the data dictionary
-            exec(f.read(), {}, data) 
+            return data
+
+        data = self._cached('solve', run, run_inputs)
 
         outputs['u'] = data['u']
         outputs['compliance'] = data['compliance']
@@ -97,33 +281,147 @@ class FEMBeam(om.ExternalCodeImplicitComp):
         compliance = outputs['compliance'][0]
         volume = outputs['volume'][0]
 
-        with open('input.txt', 'w') as f: 
-            data = [
-                'num_elements = {}'.format(num_elements), 
-                'E = {}'.format(E), 
-                'L = {}'.format(L),
-                'b = {}'.format(b), 
-                'h = np.array({})'.format(fmt_data(h)),
-                'u = np.array({})'.format(fmt_data(u)),
-                'compliance = {}'.format(compliance), 
-                'volume = {}'.format(volume),
-            ]
+        run_inputs = dict(num_elements=num_elements, E=E, L=L, b=b, h=h, u=u,
+                          compliance=compliance, volume=volume)
+
+        def run():
+            self.call_counts['apply'] += 1
+            with ProfiledCall(self.profiler, 'apply') as call:
+                write_inputs(self.input_file, **run_inputs)
+                call.mark('write_inputs')
 
-            f.write("\n".join(data))
+                if self.options['use_worker']:
+                    # the same command, in the persistent standalone_beam.py process
+                    run_command(self, self.options['command_apply'])
+                else:
+                    # method from base class to execute the code with the given command_apply
+                    super(FEMBeam, self).apply_nonlinear(inputs, outputs, residuals)
+                call.mark('run')
 
-        # method from base class to execute the code with the given command_apply
+                # parses the output and puts the variables into the data dictionary
+                data = read_data(self.output_file)
+                call.mark('read_outputs')
 
-        super(FEMBeam, self).apply_nonlinear(inputs, outputs, residuals)
+            return data
 
-        with open('output.txt', 'r') as f: 
-            data = {}
-            # parses the output and puts the variables into the data dictionary
-            exec(f.read(), {}, data) 
+        data = self._cached('apply', run, run_inputs)
 
         residuals['u'] = data['u_residuals']
         residuals['compliance'] = data['c_residual']
         residuals['volume'] = data['v_residual']
 
+    def _run_chunk(self, worker, scratch_dir, points):
+        """
+        Evaluate the residuals at a chunk of finite difference points with a single
+        apply-batch call on a pool worker, inside its scratch directory.
+        """
+        command = self.options['command_apply']
+        command = command[:2] + ['apply-batch'] + command[3:]
+
+        stacked = dict(points[0])
+        for name in ['h', 'u', 'compliance', 'volume']:
+            stacked[name] = np.array([point[name] for point in points])
+
+        with ProfiledCall(self.profiler, 'apply-batch', scratch_dir) as call:
+            write_inputs(os.path.join(scratch_dir, self.input_file), **stacked)
+            call.mark('write_inputs')
+            run_command(self, command, worker, scratch_dir)
+            call.mark('run')
+            data = read_data(os.path.join(scratch_dir, self.output_file))
+            call.mark('read_outputs')
+
+        return [{'u_residuals': u_residuals, 'c_residual': c_residual, 'v_residual': v_residual}
+                for u_residuals, c_residual, v_residual
+                in zip(np.asarray(data['u_residuals']), np.asarray(data['c_residual']),
+                       np.asarray(data['v_residual']))]
+
+    def linearize(self, inputs, outputs, partials):
+        if self.options['partials_method'] == 'exact':
+            # h is kept for solve_linear, which has no access to the inputs
+            self._linearized_h = inputs['h'].copy()
+
+            data = self._run_command('linearize', dict(
+                num_elements=self.options['num_elements'], E=self.options['E'],
+                L=self.options['L'], b=self.options['b'], h=inputs['h'], u=outputs['u']))
+
+            partials['u', 'h'] = np.asarray(data['dRu_dh']).ravel()
+            partials['u', 'u'] = data['K_data']
+            return
+
+        step = self.options['fd_step']
+        colors = self._fd_colors
+        h = inputs['h']
+        u = outputs['u']
+        num_h = len(h)
+
+        # the unperturbed point plus one forward step per color, which moves every column
+        # of that color at once
+        x = np.concatenate([h, u])
+        points = [x] + [x + step * (colors == color) for color in range(colors.max() + 1)]
+        points = [dict(num_elements=self.options['num_elements'], E=self.options['E'],
+                       L=self.options['L'], b=self.options['b'], h=point[:num_h],
+                       u=point[num_h:], compliance=outputs['compliance'][0],
+                       volume=outputs['volume'][0]) for point in points]
+
+        if self.options['fd_workers']:
+            # split into one batch per worker and run concurrently
+            pool = get_pool(self.options['command_apply'][:2], self.options['fd_workers'],
+                            self.options['env_vars'])
+
+            def run_batch(points):
+                self.call_counts['apply-batch'] += min(len(pool.workers), len(points))
+                return pool.map_chunks(self._run_chunk, points)
+
+            if self.result_cache is None:
+                results = run_batch(points)
+            else:
+                # apply-batch gives the same results as apply, so the points share its entries
+                results = self.result_cache.evaluate_batch(self.options['command_apply'], points,
+                                                           run_batch, self.options['env_vars'])
+        else:
+            results = [self._run_command('apply', point) for point in points]
+
+        # each nonzero is read off the step of its column's color
+        results = np.array([data['u_residuals'] for data in results])
+        diffs = (results[1:] - results[0]) / step
+        jac_data = diffs[colors[self._fd_cols], self._fd_rows]
+
+        # the u/h entries come first, four per element
+        partials['u', 'h'] = jac_data[:4 * num_h]
+        partials['u', 'u'] = jac_data[4 * num_h:]
+
+    def _solve_K(self, rhs):
+        """
+        Return K^-1 rhs at the last linearized design, from the solve_linear command.
+        """
+        if not rhs.any():
+            return np.zeros_like(rhs)
+
+        data = self._run_command('solve_linear', dict(
+            num_elements=self.options['num_elements'], E=self.options['E'],
+            L=self.options['L'], b=self.options['b'], h=self._linearized_h, rhs=rhs))
+        return data['x']
+
+    def solve_linear(self, d_outputs, d_residuals, mode):
+        if self.options['partials_method'] != 'exact':
+            return
+
+        # the residual Jacobian wrt (u, compliance, volume) is [[K, 0, 0], [-f, 1, 0], [0, 0, 1]],
+        # so K, which is symmetric, is the only block that needs a real solve.
+        # note: block Gauss-Seidel solvers leave u out of their matvecs unless u is itself a
+        # response, since OpenMDAO's relevance can't see couplings between the outputs of one
+        # component; a DirectSolver assembles the partials instead and never calls this
+        if mode == 'fwd':
+            d_outputs['u'] = self._solve_K(d_residuals['u'])
+            d_outputs['compliance'] = d_residuals['compliance'] + \
+                self.force_vector.dot(d_outputs['u'])
+            d_outputs['volume'] = d_residuals['volume']
+        else:
+            d_residuals['compliance'] = d_outputs['compliance']
+            d_residuals['volume'] = d_outputs['volume']
+            d_residuals['u'] = self._solve_K(d_outputs['u'] +
+                                             self.force_vector * d_outputs['compliance'])
+
     
 
 if __name__ == "__main__": 
@@ -157,6 +455,9 @@ if __name__ == "__main__":
 
     p.run_driver()
 
+    # the per-phase timings, if a trace_file is given
+    report_profiles(p.model)
+
     p.model.list_outputs(print_arrays=True)
 
 
@@ -0,0 +1,72 @@
+from __future__ import print_function, division
+
+import subprocess
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+from beam_worker import get_worker
+from standalone_beam import read_data
+
+
+def run(worker, argv):
+    return_code, error_msg = worker.run(argv)
+    if return_code:
+        raise RuntimeError(error_msg)
+
+
+def solve_each_in_subprocess(worker, hs, num_elements):
+    compliance = []
+    for h in hs:
+        np.savez('input.npz', num_elements=num_elements, E=1., L=1., b=0.1, h=h)
+        subprocess.check_call(['python', 'standalone_beam.py', 'solve', 'input.npz', 'output.npz'],
+                              stdout=subprocess.DEVNULL)
+        compliance.append(read_data('output.npz')['compliance'])
+    return np.array(compliance)
+
+
+def solve_each_on_worker(worker, hs, num_elements):
+    compliance = []
+    for h in hs:
+        np.savez('input.npz', num_elements=num_elements, E=1., L=1., b=0.1, h=h)
+        run(worker, ['solve', 'input.npz', 'output.npz'])
+        compliance.append(read_data('output.npz')['compliance'])
+    return np.array(compliance)
+
+
+def solve_batch_on_worker(worker, hs, num_elements):
+    np.savez('input.npz', num_elements=num_elements, E=1., L=1., b=0.1, h=hs)
+    run(worker, ['solve-batch', 'input.npz', 'output.npz'])
+    return read_data('output.npz')['compliance']
+
+
+# e.g. the points of a DOE sweep
+num_designs = 16
+nes = [5, 50, 500, 5000]
+
+methods = OrderedDict()
+methods['subprocess each'] = solve_each_in_subprocess
+methods['worker each'] = solve_each_on_worker
+methods['one solve-batch'] = solve_batch_on_worker
+
+worker = get_worker(['python', 'standalone_beam.py'])
+# the first call pays for starting the worker
+solve_batch_on_worker(worker, np.ones((1, 5)), 5)
+
+timing_data = np.zeros((len(nes), len(methods)))
+for i_ne, ne in enumerate(nes):
+    hs = np.random.RandomState(0).uniform(0.5, 1.5, (num_designs, ne))
+
+    compliances = []
+    for i_method, key in enumerate(methods):
+        pre_time = time()
+        compliances.append(methods[key](worker, hs, ne))
+        timing_data[i_ne, i_method] = time() - pre_time
+
+    for compliance in compliances[1:]:
+        assert np.allclose(compliance, compliances[0], rtol=1e-10)
+
+print('time to solve {} designs'.format(num_designs))
+print('{:>10s}'.format('elements') + ''.join('{:>18s}'.format(key) for key in methods))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne) + ''.join('{:18.3e}'.format(t) for t in timing_data[i_ne]))
@@ -0,0 +1,64 @@
+from __future__ import print_function, division
+
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from beam_profiler import PHASES, report_profiles
+from lab_3_explicit_wrapper import FEMBeam
+
+
+def profile_optimization(use_worker, data_format, num_elements, maxiter):
+    """
+    Run a few iterations of the explicit wrapper's optimization with profiling on;
+    return the component's CallProfiler.
+    """
+    prob = om.Problem(reports=False)
+    dvs = prob.model.add_subsystem('dvs', om.IndepVarComp(), promotes=['*'])
+    dvs.add_output('h', val=np.ones(num_elements))
+    prob.model.add_subsystem('FEM', FEMBeam(E=1, L=1, b=0.1, num_elements=num_elements,
+                                            use_worker=use_worker, data_format=data_format,
+                                            trace_file='trace_{}_{}.jsonl'.format(
+                                                'worker' if use_worker else 'subprocess',
+                                                data_format)),
+                             promotes_inputs=['h'], promotes_outputs=['compliance', 'volume'])
+
+    prob.driver = om.ScipyOptimizeDriver()
+    prob.driver.options['maxiter'] = maxiter
+    prob.driver.options['disp'] = False
+    prob.model.add_design_var('h', lower=0.01, upper=10.0)
+    prob.model.add_objective('compliance')
+    prob.model.add_constraint('volume', equals=0.01)
+    prob.model.approx_totals(method='fd', step=1e-4, step_calc='abs')
+
+    prob.setup()
+    prob.run_driver()
+    report_profiles(prob.model)
+
+    return prob.model.FEM.profiler
+
+
+num_elements = 5
+maxiter = 2
+
+configs = OrderedDict()
+configs['subprocess text'] = (False, 'text')
+configs['subprocess npz'] = (False, 'npz')
+configs['worker text'] = (True, 'text')
+configs['worker npz'] = (True, 'npz')
+
+profilers = OrderedDict()
+for key in configs:
+    profilers[key] = profile_optimization(configs[key][0], configs[key][1], num_elements,
+                                          maxiter)
+    print()
+
+print('mean msec per call to standalone_beam.py, {} elements'.format(num_elements))
+print('{:>14s}'.format('phase') + ''.join('{:>18s}'.format(key) for key in configs))
+for phase in PHASES + ['total']:
+    row = []
+    for profiler in profilers.values():
+        total = profiler.totals[phase] if phase != 'total' else sum(profiler.totals.values())
+        row.append(1e3 * total / profiler.num_calls)
+    print('{:>14s}'.format(phase) + ''.join('{:18.3f}'.format(t) for t in row))
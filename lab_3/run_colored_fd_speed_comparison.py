@@ -0,0 +1,108 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from lab_3_implicit_wrapper import FEMBeam
+
+
+class UncoloredFEMBeam(FEMBeam):
+    """
+    FEMBeam with every column in its own color, i.e. one apply call per column.
+    """
+
+    def setup(self):
+        super(UncoloredFEMBeam, self).setup()
+        self._fd_colors = np.arange(len(self._fd_colors))
+
+
+def check_colored_partials(num_elements):
+    """
+    Check the colored fd partials of FEMBeam against OpenMDAO's own finite differences,
+    which perturb one column at a time, with the same forward step.
+    """
+    prob = om.Problem(reports=False)
+    dvs = prob.model.add_subsystem('dvs', om.IndepVarComp(), promotes=['*'])
+    dvs.add_output('h', val=np.linspace(0.5, 1.5, num_elements))
+    prob.model.add_subsystem('FEM', FEMBeam(E=1., L=1., b=0.1, num_elements=num_elements,
+                                            use_worker=True, data_format='npz'),
+                             promotes=['*'])
+    prob.model.linear_solver = om.DirectSolver()
+
+    prob.setup()
+    prob.run_model()
+
+    fd_step = prob.model.FEM.options['fd_step']
+    data = prob.check_partials(out_stream=None, includes=['FEM'], method='fd', form='forward',
+                               step=fd_step, step_calc='abs')
+
+    # both take the same steps, so they agree to round-off, scaled up by 1 / fd_step
+    for (of, wrt), partial_data in data['FEM'].items():
+        J_colored = partial_data['J_fwd']
+        J_fd = partial_data['J_fd']
+        assert abs(J_colored - J_fd).max() <= 1e-8 * max(abs(J_fd).max(), 1.), (of, wrt)
+
+
+def time_totals(beam_class, num_elements, num_repeats):
+    """
+    Mean wall time and external apply calls of one compute_totals of compliance and
+    volume wrt h.
+    """
+    prob = om.Problem(reports=False)
+    dvs = prob.model.add_subsystem('dvs', om.IndepVarComp(), promotes=['*'])
+    dvs.add_output('h', val=np.linspace(0.5, 1.5, num_elements))
+    prob.model.add_subsystem('FEM', beam_class(E=1., L=1., b=0.1, num_elements=num_elements,
+                                               use_worker=True, data_format='npz'),
+                             promotes=['*'])
+    prob.model.linear_solver = om.DirectSolver()
+
+    prob.setup()
+    prob.run_model()
+
+    call_counts = prob.model.FEM.call_counts
+    num_calls = call_counts['apply']
+
+    pre_time = time()
+    for i_repeat in range(num_repeats):
+        J = prob.compute_totals(['compliance', 'volume'], ['h'])
+
+    return ((time() - pre_time) / num_repeats, (call_counts['apply'] - num_calls) // num_repeats,
+            J['compliance', 'h'])
+
+
+nes = [5, 20, 80, 320]
+num_repeats = 3
+
+methods = OrderedDict()
+methods['uncolored'] = UncoloredFEMBeam
+methods['colored'] = FEMBeam
+
+# the first call starts the worker
+time_totals(FEMBeam, 5, 1)
+
+for ne in nes[:3]:
+    check_colored_partials(ne)
+
+timing_data = np.zeros((len(nes), len(methods)))
+call_data = np.zeros((len(nes), len(methods)), dtype=int)
+for i_ne, ne in enumerate(nes):
+    totals = []
+    for i_method, key in enumerate(methods):
+        timing_data[i_ne, i_method], call_data[i_ne, i_method], J = time_totals(
+            methods[key], ne, num_repeats)
+        totals.append(J)
+
+    # no row sees two perturbed columns of one color, so the steps are the same
+    assert np.allclose(totals[1], totals[0], rtol=1e-8)
+
+print('compute_totals with fd partials: seconds (apply calls)')
+print('{:>10s}'.format('elements') + ''.join('{:>20s}'.format(key) for key in methods)
+      + '{:>10s}'.format('speedup'))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne)
+          + ''.join('{:>20s}'.format('{:.3e} ({})'.format(t, n))
+                    for t, n in zip(timing_data[i_ne], call_data[i_ne]))
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1]))
@@ -0,0 +1,74 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+from beam_worker import get_worker
+from lab_3_implicit_wrapper import write_inputs
+from standalone_beam import beam_model, read_data
+
+
+def run(worker, argv):
+    return_code, error_msg = worker.run(argv)
+    if return_code:
+        raise RuntimeError(error_msg)
+
+
+def round_trip(worker, ext, h, u, num_elements):
+    """
+    One solve plus one residual evaluation through the worker, exchanging files the way
+    the implicit wrapper does; u is sent in both directions. Returns the solved u.
+    """
+    input_file = 'input' + ext
+    output_file = 'output' + ext
+
+    write_inputs(input_file, num_elements=num_elements, E=1., L=1., b=0.1, h=h)
+    run(worker, ['solve', input_file, output_file])
+    u_solved = read_data(output_file)['u']
+
+    write_inputs(input_file, num_elements=num_elements, E=1., L=1., b=0.1, h=h, u=u,
+                 compliance=1., volume=0.01)
+    run(worker, ['apply', input_file, output_file])
+    read_data(output_file)
+
+    return u_solved
+
+
+nes = [10, 100, 1000, 10000, 100000]
+num_repeats = 3
+
+formats = OrderedDict()
+formats['text'] = '.txt'
+formats['npz'] = '.npz'
+
+# the worker takes process startup out of the picture, so only the exchange is compared
+worker = get_worker(['python', 'standalone_beam.py'])
+# the first call pays for starting the worker
+round_trip(worker, '.npz', np.ones(10), np.zeros(24), 10)
+
+timing_data = np.zeros((len(nes), len(formats)))
+rel_error = np.zeros((len(nes), len(formats)))
+
+for i_ne, ne in enumerate(nes):
+    h = np.linspace(0.5, 1.5, ne)
+    u_exact = beam_model(h, 1., 1., 0.1, ne)[0]
+
+    for i_format, key in enumerate(formats):
+        durations = np.zeros(num_repeats)
+        for i_repeat in range(num_repeats):
+            pre_time = time()
+            u = round_trip(worker, formats[key], h, u_exact, ne)
+            durations[i_repeat] = time() - pre_time
+
+        timing_data[i_ne, i_format] = np.mean(durations)
+        rel_error[i_ne, i_format] = abs(u - u_exact).max() / abs(u_exact).max()
+
+print('solve + apply time')
+print('{:>10s}'.format('elements') + ''.join('{:>12s}'.format(key) for key in formats)
+      + '{:>10s}'.format('speedup')
+      + ''.join('{:>16s}'.format(key + ' u error') for key in formats))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne) + ''.join('{:12.3e}'.format(t) for t in timing_data[i_ne])
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1])
+          + ''.join('{:16.1e}'.format(err) for err in rel_error[i_ne]))
@@ -0,0 +1,119 @@
+from __future__ import print_function, division
+
+import os
+from contextlib import redirect_stdout
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from beam_worker import get_worker
+from lab_3_implicit_wrapper import FEMBeam
+
+
+def time_totals(partials_method, num_elements, num_repeats):
+    """
+    Mean wall time and number of external calls of one compute_totals of compliance and
+    volume wrt h.
+    """
+    prob = om.Problem(reports=False)
+    dvs = prob.model.add_subsystem('dvs', om.IndepVarComp(), promotes=['*'])
+    dvs.add_output('h', val=np.linspace(0.5, 1.5, num_elements))
+    prob.model.add_subsystem('FEM', FEMBeam(E=1., L=1., b=0.1, num_elements=num_elements,
+                                            use_worker=True, data_format='npz',
+                                            partials_method=partials_method),
+                             promotes=['*'])
+    prob.model.linear_solver = om.DirectSolver()
+
+    prob.setup()
+    prob.run_model()
+
+    worker = get_worker(['python', 'standalone_beam.py'])
+    num_calls = worker.num_calls
+
+    pre_time = time()
+    for i_repeat in range(num_repeats):
+        J = prob.compute_totals(['compliance', 'volume'], ['h'])
+
+    return ((time() - pre_time) / num_repeats, (worker.num_calls - num_calls) // num_repeats,
+            J['compliance', 'h'])
+
+
+def time_lab_demo(**options):
+    """
+    Wall time and final compliance of the lab 3 demo optimization with the given
+    FEMBeam options.
+    """
+    num_elements = 5
+
+    prob = om.Problem(reports=False)
+    dvs = prob.model.add_subsystem('dvs', om.IndepVarComp(), promotes=['*'])
+    dvs.add_output('h', val=np.ones(num_elements))
+    prob.model.add_subsystem('FEM', FEMBeam(E=1, L=1, b=0.1, num_elements=num_elements,
+                                            **options),
+                             promotes_inputs=['h'], promotes_outputs=['compliance', 'volume'])
+
+    prob.driver = om.ScipyOptimizeDriver(tol=1e-4)
+    prob.model.add_design_var('h', lower=0.01, upper=10.0)
+    prob.model.add_objective('compliance')
+    prob.model.add_constraint('volume', equals=0.01)
+    prob.model.linear_solver = om.DirectSolver()
+
+    prob.setup()
+
+    pre_time = time()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        prob.run_driver()
+
+    return time() - pre_time, prob['compliance'][0]
+
+
+nes = [5, 20, 80, 320]
+num_repeats = 3
+
+methods = OrderedDict()
+methods['fd'] = 'fd'
+methods['exact'] = 'exact'
+
+# the first call starts the worker
+time_totals('exact', 5, 1)
+
+timing_data = np.zeros((len(nes), len(methods)))
+call_data = np.zeros((len(nes), len(methods)), dtype=int)
+rel_diff = np.zeros(len(nes))
+for i_ne, ne in enumerate(nes):
+    totals = []
+    for i_method, key in enumerate(methods):
+        timing_data[i_ne, i_method], call_data[i_ne, i_method], J = time_totals(
+            methods[key], ne, num_repeats)
+        totals.append(J)
+
+    # the fd partials of the badly conditioned stiffness matrix carry the step's truncation
+    # error into the solve, and that error grows with the mesh; the exact totals match the
+    # analytic derivatives of lab_2's BeamGroup
+    rel_diff[i_ne] = abs(totals[1] - totals[0]).max() / abs(totals[1]).max()
+
+print('compute_totals with a DirectSolver: seconds (external calls)')
+print('{:>10s}'.format('elements') + ''.join('{:>20s}'.format(key) for key in methods)
+      + '{:>10s}'.format('speedup') + '{:>12s}'.format('rel diff'))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne)
+          + ''.join('{:>20s}'.format('{:.3e} ({})'.format(t, n))
+                    for t, n in zip(timing_data[i_ne], call_data[i_ne]))
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1])
+          + '{:12.1e}'.format(rel_diff[i_ne]))
+
+# the lab's demo runs every call as a new python process with fd partials; a worker and the
+# exact partials leave the optimum as it is
+demos = OrderedDict()
+demos['lab defaults'] = {}
+demos['worker'] = {'use_worker': True}
+demos['worker, exact'] = {'use_worker': True, 'partials_method': 'exact'}
+
+print()
+print('lab 3 demo run_driver')
+print('{:>16s}{:>12s}{:>14s}'.format('options', 'seconds', 'compliance'))
+for key in demos:
+    duration, compliance = time_lab_demo(**demos[key])
+    print('{:>16s}{:12.3f}{:14.6f}'.format(key, duration, compliance))
@@ -0,0 +1,44 @@
+from __future__ import print_function, division
+
+import os
+from contextlib import redirect_stdout
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+from standalone_beam import run_opt
+
+
+nes = [5, 20, 80]
+
+methods = OrderedDict()
+methods['scipy fd'] = False
+methods['adjoint'] = True
+
+timing_data = np.zeros((len(nes), len(methods)))
+solve_data = np.zeros((len(nes), len(methods)), dtype=int)
+iteration_data = np.zeros((len(nes), len(methods)), dtype=int)
+objective_data = np.zeros((len(nes), len(methods)))
+for i_ne, ne in enumerate(nes):
+    for i_method, key in enumerate(methods):
+        pre_time = time()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            result = run_opt(ne, methods[key])
+        timing_data[i_ne, i_method] = time() - pre_time
+        solve_data[i_ne, i_method] = result.num_solves
+        iteration_data[i_ne, i_method] = result.nit
+        objective_data[i_ne, i_method] = result.fun
+
+# on finer meshes the finite differenced compliance gradient is too noisy for SLSQP to
+# converge, so the optimal compliance is printed too
+print('standalone_beam.py opt: seconds (iterations, beam_model solves)')
+print('{:>10s}'.format('elements') + ''.join('{:>24s}'.format(key) for key in methods)
+      + '{:>10s}'.format('speedup'))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne)
+          + ''.join('{:>24s}'.format('{:.3e} ({}, {})'.format(t, nit, n)) for t, nit, n
+                    in zip(timing_data[i_ne], iteration_data[i_ne], solve_data[i_ne]))
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1]))
+print('optimal compliance')
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne) + ''.join('{:24.6e}'.format(c) for c in objective_data[i_ne]))
@@ -0,0 +1,51 @@
+from __future__ import print_function, division
+
+import os
+from contextlib import redirect_stdout
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+from standalone_beam import run_opt
+
+
+nes = [5, 20, 80, 320]
+
+methods = OrderedDict()
+methods['SLSQP'] = 'SLSQP'
+methods['trust-region Newton-CG'] = 'trust-ncg'
+
+timing_data = np.zeros((len(nes), len(methods)))
+solve_data = np.zeros((len(nes), len(methods)), dtype=int)
+hessp_data = np.zeros((len(nes), len(methods)), dtype=int)
+iteration_data = np.zeros((len(nes), len(methods)), dtype=int)
+objective_data = np.zeros((len(nes), len(methods)))
+success_data = np.zeros((len(nes), len(methods)), dtype=bool)
+for i_ne, ne in enumerate(nes):
+    for i_method, key in enumerate(methods):
+        pre_time = time()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            result = run_opt(ne, True, methods[key])
+        timing_data[i_ne, i_method] = time() - pre_time
+        solve_data[i_ne, i_method] = result.num_solves
+        hessp_data[i_ne, i_method] = result.num_hessps
+        iteration_data[i_ne, i_method] = result.nit
+        objective_data[i_ne, i_method] = result.fun
+        success_data[i_ne, i_method] = result.success
+
+# both use the adjoint gradient; a Hessian-vector product is one more solve with the
+# factorization of its design, so they are not counted as beam_model solves
+print('standalone_beam.py opt: seconds (iterations, beam_model solves, Hessian-vector products)')
+print('{:>10s}'.format('elements') + ''.join('{:>32s}'.format(key) for key in methods)
+      + '{:>10s}'.format('speedup'))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne)
+          + ''.join('{:>32s}'.format('{:.3e} ({}, {}, {})'.format(t, nit, n, n_h))
+                    for t, nit, n, n_h in zip(timing_data[i_ne], iteration_data[i_ne],
+                                              solve_data[i_ne], hessp_data[i_ne]))
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1]))
+print('optimal compliance')
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne) + ''.join('{:>32s}'.format('{:.6e}{}'.format(
+        c, '' if success else ' (failed)')) for c, success
+        in zip(objective_data[i_ne], success_data[i_ne])))
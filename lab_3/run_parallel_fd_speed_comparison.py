@@ -0,0 +1,74 @@
+from __future__ import print_function, division
+
+import os
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+import lab_3_explicit_wrapper
+import lab_3_implicit_wrapper
+
+
+def time_totals(wrapper, fd_workers, num_elements, num_repeats):
+    """
+    Mean wall time in seconds of one compute_totals of compliance and volume wrt h.
+    """
+    prob = om.Problem(reports=False)
+    dvs = prob.model.add_subsystem('dvs', om.IndepVarComp(), promotes=['*'])
+    dvs.add_output('h', val=np.linspace(0.5, 1.5, num_elements))
+    prob.model.add_subsystem('FEM', wrapper.FEMBeam(E=1., L=1., b=0.1, num_elements=num_elements,
+                                                    use_worker=True, data_format='npz',
+                                                    fd_workers=fd_workers),
+                             promotes=['*'])
+
+    if wrapper is lab_3_implicit_wrapper:
+        prob.model.linear_solver = om.DirectSolver()
+    elif not fd_workers:
+        prob.model.approx_totals(method='fd', step=1e-4, step_calc='abs')
+
+    prob.setup()
+    prob.run_model()
+    # the first gradient starts the workers, which is a one-time cost
+    prob.compute_totals(['compliance', 'volume'], ['h'])
+
+    pre_time = time()
+    for i_repeat in range(num_repeats):
+        J = prob.compute_totals(['compliance', 'volume'], ['h'])
+
+    return (time() - pre_time) / num_repeats, J['compliance', 'h']
+
+
+num_elements = 20
+num_repeats = 3
+
+wrappers = OrderedDict()
+wrappers['explicit'] = lab_3_explicit_wrapper
+wrappers['implicit'] = lab_3_implicit_wrapper
+
+# 0 is the serial finite difference on a single worker: OpenMDAO's own for the explicit
+# wrapper, the colored one in linearize for the implicit wrapper
+workers = [0, 2, 4, 8]
+
+timing_data = np.zeros((len(wrappers), len(workers)))
+rel_diff = np.zeros(len(wrappers))
+for i_wrapper, key in enumerate(wrappers):
+    totals = []
+    for i_workers, fd_workers in enumerate(workers):
+        timing_data[i_wrapper, i_workers], J = time_totals(wrappers[key], fd_workers,
+                                                           num_elements, num_repeats)
+        totals.append(J)
+
+    # both paths take the same steps, but the implicit wrapper feeds FD partials of the badly
+    # conditioned stiffness matrix to the linear solve, which amplifies the FD noise
+    rel_diff[i_wrapper] = max(abs(J - totals[0]).max() for J in totals) / abs(totals[0]).max()
+
+print('compute_totals time, {} elements, {} cpus'.format(num_elements, os.cpu_count()))
+print('{:>10s}'.format('wrapper') + '{:>12s}'.format('serial')
+      + ''.join('{:>12s}'.format('{} workers'.format(n)) for n in workers[1:])
+      + '{:>10s}'.format('speedup') + '{:>12s}'.format('rel diff'))
+for i_wrapper, key in enumerate(wrappers):
+    print('{:>10s}'.format(key) + ''.join('{:12.3e}'.format(t) for t in timing_data[i_wrapper])
+          + '{:10.1f}'.format(timing_data[i_wrapper, 0] / timing_data[i_wrapper].min())
+          + '{:12.1e}'.format(rel_diff[i_wrapper]))
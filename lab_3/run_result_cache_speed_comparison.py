@@ -0,0 +1,75 @@
+from __future__ import print_function, division
+
+import shutil
+import tempfile
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+import lab_3_explicit_wrapper
+import lab_3_implicit_wrapper
+
+
+def run_optimization(wrapper, cache_dir):
+    """
+    Run the wrapper's optimization; return the wall time and the component's result cache.
+    """
+    num_elements = 5
+
+    prob = om.Problem(reports=False)
+    dvs = prob.model.add_subsystem('dvs', om.IndepVarComp(), promotes=['*'])
+    dvs.add_output('h', val=np.ones(num_elements))
+    prob.model.add_subsystem('FEM', wrapper.FEMBeam(E=1, L=1, b=0.1, num_elements=num_elements,
+                                                    use_worker=True, data_format='npz',
+                                                    cache_dir=cache_dir),
+                             promotes_inputs=['h'], promotes_outputs=['compliance', 'volume'])
+
+    prob.driver = om.ScipyOptimizeDriver()
+    prob.driver.options['tol'] = 1e-4
+    prob.driver.options['disp'] = False
+    prob.model.add_design_var('h', lower=0.01, upper=10.0)
+    prob.model.add_objective('compliance')
+    prob.model.add_constraint('volume', equals=0.01)
+
+    if wrapper is lab_3_explicit_wrapper:
+        prob.model.approx_totals(method='fd', step=1e-4, step_calc='abs')
+    else:
+        prob.model.linear_solver = om.DirectSolver()
+
+    prob.setup()
+
+    pre_time = time()
+    prob.run_driver()
+    return time() - pre_time, prob.model.FEM.result_cache
+
+
+wrappers = OrderedDict()
+wrappers['explicit'] = lab_3_explicit_wrapper
+wrappers['implicit'] = lab_3_implicit_wrapper
+
+print('{:>10s}{:>14s}{:>10s}{:>8s}{:>8s}{:>10s}{:>12s}'.format(
+    'wrapper', 'cache', 'sec', 'hits', 'misses', 'hit rate', 'saved sec'))
+
+for key in wrappers:
+    cache_dir = tempfile.mkdtemp(prefix='beam_cache_')
+
+    # the first run only starts the worker, so its startup isn't charged to any mode
+    run_optimization(wrappers[key], None)
+
+    duration, _ = run_optimization(wrappers[key], None)
+    print('{:>10s}{:>14s}{:10.3f}'.format(key, 'none', duration))
+
+    # a fresh cache only catches repeats within the run; the second run of the same
+    # optimization, e.g. a restart, is served entirely from disk
+    for mode in ['cold', 'warm']:
+        duration, cache = run_optimization(wrappers[key], cache_dir)
+        print('{:>10s}{:>14s}{:10.3f}{:8d}{:8d}{:10.2f}{:12.3f}'.format(
+            key, mode, duration, cache.hits, cache.misses, cache.hit_rate, cache.time_saved))
+
+        # statistics are per cache object; start the warm run from zero
+        cache.hits = cache.misses = 0
+        cache.time_saved = 0.
+
+    shutil.rmtree(cache_dir)
@@ -0,0 +1,66 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+import lab_3_explicit_wrapper
+import lab_3_implicit_wrapper
+
+
+def time_calls(wrapper, method, use_worker, num_calls):
+    """
+    Mean wall time in seconds of one call of the given FEMBeam method, e.g. compute.
+    """
+    num_elements = 5
+
+    prob = om.Problem(reports=False)
+    dvs = prob.model.add_subsystem('dvs', om.IndepVarComp(), promotes=['*'])
+    dvs.add_output('h', val=np.ones(num_elements))
+    prob.model.add_subsystem('FEM', wrapper.FEMBeam(E=1, L=1, b=0.1, num_elements=num_elements,
+                                                    use_worker=use_worker),
+                             promotes=['*'])
+    prob.setup()
+    # the first run starts the worker, which is a one-time cost
+    prob.run_model()
+
+    comp = prob.model.FEM
+    inputs, outputs, residuals = comp._inputs, comp._outputs, comp._residuals
+    args = {
+        'compute': (inputs, outputs),
+        'solve_nonlinear': (inputs, outputs),
+        'apply_nonlinear': (inputs, outputs, residuals),
+    }[method]
+
+    pre_time = time()
+    for i_call in range(num_calls):
+        getattr(comp, method)(*args)
+
+    return (time() - pre_time) / num_calls
+
+
+num_calls = 10
+
+calls = OrderedDict()
+calls['explicit compute'] = (lab_3_explicit_wrapper, 'compute')
+calls['implicit solve'] = (lab_3_implicit_wrapper, 'solve_nonlinear')
+calls['implicit apply'] = (lab_3_implicit_wrapper, 'apply_nonlinear')
+
+methods = OrderedDict()
+methods['subprocess'] = False
+methods['worker'] = True
+
+timing_data = np.zeros((len(calls), len(methods)))
+for i_call, key in enumerate(calls):
+    for i_method, use_worker in enumerate(methods.values()):
+        timing_data[i_call, i_method] = time_calls(calls[key][0], calls[key][1], use_worker,
+                                                   num_calls)
+
+print('ms per call')
+print('{:>18s}'.format('call') + ''.join('{:>14s}'.format(key) for key in methods)
+      + '{:>10s}'.format('speedup'))
+for i_call, key in enumerate(calls):
+    print('{:>18s}'.format(key) + ''.join('{:14.2f}'.format(1e3 * t) for t in timing_data[i_call])
+          + '{:10.1f}'.format(timing_data[i_call, 0] / timing_data[i_call, 1]))
@@ -1,74 +1,116 @@
 from __future__ import print_function, division, absolute_import
 
+import hashlib
+import os
+import sys
+from collections import OrderedDict
+from time import time
+
+# bracket the numpy/scipy imports for the per-phase profile, see run_command
+_process_start = time()
+
 import numpy as np
-from scipy.sparse import coo_matrix
+from scipy.sparse import csc_matrix
 from scipy.sparse.linalg import splu
+from scipy.linalg import cholesky_banded, cho_solve_banded
 from scipy.optimize import minimize, Bounds
 
+_imports_end = time()
+
+# end times of the running command's phases while it is being profiled
+_marks = None
+
 def fmt_data(data): 
     """helper to format array data with lots of sig figs"""     
+    if np.ndim(data) == 2:
+        # stacked designs from the batch commands, one row each
+        return '[{}]'.format(','.join(fmt_data(row) for row in data))
     to_str = ['{:10.16f}'.format(n) for n in data]
     return '[{}]'.format(','.join(to_str))
 
 
 
+# CSC sparsity patterns only depend on the mesh size, so they are computed once
+# per num_elements and reused for every assembly
+_csc_patterns = {}
+
+
+def get_CSC_pattern(num_elements):
+    """
+    Compute the CSC sparsity pattern of the stiffness matrix.
+
+    Returns
+    -------
+    tuple
+        (indptr, indices, scatter, bc_data, n_K) where scatter maps every entry
+        of the flattened K_local array to its slot in the CSC data array.
+    """
+    if num_elements in _csc_patterns:
+        return _csc_patterns[num_elements]
+
+    num_nodes = num_elements + 1
+    n_K = 2 * num_nodes + 2
+
+    # element ind couples dofs 2 * ind ... 2 * ind + 3
+    dofs = np.arange(4) + 2 * np.arange(num_elements)[:, np.newaxis]
+    rows = np.repeat(dofs, 4, axis=1).ravel()
+    cols = np.tile(dofs, 4).ravel()
+
+    # clamped boundary condition on the left side of the beam (weak formulation)
+    rows = np.concatenate([rows, [2 * num_nodes, 2 * num_nodes + 1, 0, 1]])
+    cols = np.concatenate([cols, [0, 1, 2 * num_nodes, 2 * num_nodes + 1]])
+
+    # column-major keys sort the entries in CSC order; duplicates get summed by the scatter
+    keys, scatter = np.unique(cols * n_K + rows, return_inverse=True)
+    indices = keys % n_K
+    indptr = np.searchsorted(keys // n_K, np.arange(n_K + 1))
+
+    bc_data = np.zeros(len(keys))
+    bc_data[scatter[-4:]] = 1.0
+
+    pattern = (indptr, indices, scatter[:-4], bc_data, n_K)
+    _csc_patterns[num_elements] = pattern
+    return pattern
+
+
 def assemble_CSC_K(K_local, num_elements):
     """
     Assemble the stiffness matrix in sparse CSC format.
     This takes in the local stiffness matrices and assembles a full
     stiffness matrix of all the elements.
 
+    Returns
+    -------
+    csc_matrix
+        Stiffness matrix in sparse CSC format.
+    """
+    indptr, indices, scatter, bc_data, n_K = get_CSC_pattern(num_elements)
+
+    # a single vectorized scatter-add sums the overlapping element entries
+    data = np.bincount(scatter, weights=K_local.ravel(), minlength=len(bc_data)) + bc_data
+
+    return csc_matrix((data, indices, indptr), shape=(n_K, n_K))
+
+
+def assemble_CSC_data_batch(K_local, num_elements):
+    """
+    Assemble the CSC data arrays of a stack of designs, with K_local of shape
+    (num_designs, num_elements, 4, 4), in one scatter-add over the mesh's sparsity pattern.
+
     Returns
     -------
     ndarray
-        Stiffness matrix as dense ndarray.
+        (num_designs, nnz) data arrays that share the indices and indptr of get_CSC_pattern.
     """
-    num_nodes = num_elements + 1
-    num_entry = num_elements * 12 + 4
-    ndim = num_entry + 4
-
-    data = np.zeros((ndim, ))
-    cols = np.empty((ndim, ))
-    rows = np.empty((ndim, ))
-
-    # First element.
-    data[:16] = K_local[0, :, :].flat
-    cols[:16] = np.tile(np.arange(4), 4)
-    rows[:16] = np.repeat(np.arange(4), 4)
-
-    j = 16
-    for ind in range(1, num_elements):
-        ind1 = 2 * ind
-        K = K_local[ind, :, :]
-
-        # NW quadrant gets summed with previous connected element.
-        data[j-6:j-4] += K[0, :2]
-        data[j-2:j] += K[1, :2]
-
-        # NE quadrant
-        data[j:j+4] = K[:2, 2:].flat
-        rows[j:j+4] = np.array([ind1, ind1, ind1 + 1, ind1 + 1])
-        cols[j:j+4] = np.array([ind1 + 2, ind1 + 3, ind1 + 2, ind1 + 3])
-
-        # SE and SW quadrants together
-        data[j+4:j+12] = K[2:, :].flat
-        rows[j+4:j+12] = np.repeat(np.arange(ind1 + 2, ind1 + 4), 4)
-        cols[j+4:j+12] = np.tile(np.arange(ind1, ind1 + 4), 2)
-
-        j += 12
-
-    data[-4:] = 1.0
-    rows[-4] = 2 * num_nodes
-    rows[-3] = 2 * num_nodes + 1
-    rows[-2] = 0.0
-    rows[-1] = 1.0
-    cols[-4] = 0.0
-    cols[-3] = 1.0
-    cols[-2] = 2 * num_nodes
-    cols[-1] = 2 * num_nodes + 1
+    indptr, indices, scatter, bc_data, n_K = get_CSC_pattern(num_elements)
+    num_designs = K_local.shape[0]
+    nnz = len(bc_data)
 
-    n_K = 2 * num_nodes + 2
-    return coo_matrix((data, (rows, cols)), shape=(n_K, n_K)).tocsc()
+    # offsetting the scatter by design keeps the designs apart in one flat bincount
+    slots = scatter + nnz * np.arange(num_designs)[:, np.newaxis]
+    data = np.bincount(slots.ravel(), weights=K_local.ravel(), minlength=num_designs * nnz)
+
+    return data.reshape(num_designs, nnz) + bc_data
 
 
 def assemble_K_local(h, E, L, b, num_elements): 
@@ -84,22 +126,96 @@ def assemble_K_local(h, E, L, b, num_elements):
     coeffs[3, :] = [6 * L0, 2 * L0 ** 2, -6 * L0, 4 * L0 ** 2]
     coeffs *= E / L0 ** 3
 
-    mtx = np.zeros((num_elements, 4, 4, num_elements))
-    for ind in range(num_elements):
-        mtx[ind, :, :, ind] = coeffs
-
-    K_local = np.zeros((num_elements, 4, 4))
-    for ind in range(num_elements):
-        K_local[ind, :, :] = mtx[ind, :, :, ind] * I[ind]
+    # h may also be a stack of designs, one per row
+    K_local = coeffs * I[..., np.newaxis, np.newaxis]
 
     return K_local
 
-def beam_model(h, E, L, b, num_elements):
+def solve_clamped_banded(K_local, force_vector):
+    """
+    Solve the clamped beam with the boundary condition applied by elimination,
+    using a banded Cholesky factorization of the free-dof stiffness matrix.
+
+    Returns the same vector as solving the Lagrange-multiplier system from
+    assemble_CSC_K: nodal displacements followed by the clamp reaction forces.
+    """
+    num_elements = K_local.shape[0]
+    n_dofs = 2 * num_elements + 2
+
+    # upper banded storage (half-bandwidth 3): entry (i, j) goes to ab[3 + i - j, j]
+    i_loc, j_loc = np.triu_indices(4)
+    rows = 3 + i_loc - j_loc
+    cols = j_loc + 2 * np.arange(num_elements)[:, np.newaxis]
+    ab = np.bincount((rows * n_dofs + cols).ravel(), weights=K_local[:, i_loc, j_loc].ravel(),
+                     minlength=4 * n_dofs).reshape(4, n_dofs)
+
+    # eliminate the two clamped dofs, which are fixed at zero
+    ab = ab[:, 2:]
+    ab[1:3, 0] = 0.
+    ab[0:2, 1] = 0.
+
+    u = np.zeros(n_dofs + 2)
+    u[2:n_dofs] = cho_solve_banded((cholesky_banded(ab), False), force_vector[2:n_dofs])
+    u[n_dofs:] = force_vector[:2] - K_local[0, :2, 2:].dot(u[2:4])
+
+    return u
+
+# the last full factorization of each beam, by (E, L, b, num_elements), for low-rank updates
+_update_bases = {}
+
+
+def solve_low_rank_updated(K_local, force_vector, key, max_update_rank):
+    """
+    Solve the stiffness system of K_local, reusing the last full splu factorization of the
+    same beam when the elements that changed since then touch at most max_update_rank dofs.
+
+    The change is K_base + U C U^T, with U selecting the touched dofs and C the change of K
+    on them, and is solved with the Sherman-Morrison-Woodbury identity in the form
+    (I + C U^T K_base^-1 U), since an element's C has rigid-body modes and no inverse. Past
+    the threshold, K is assembled and factored and becomes the new base.
+    """
+    num_elements = K_local.shape[0]
+    base = _update_bases.get(key)
+
+    if base is not None:
+        changed = np.flatnonzero(np.any(K_local != base['K_local'], axis=(1, 2)))
+        dofs, positions = np.unique(np.arange(4) + 2 * changed[:, np.newaxis],
+                                    return_inverse=True)
+
+        if len(dofs) <= max_update_rank:
+            u = base['lu'].solve(force_vector)
+            if len(dofs) == 0:
+                return u
+
+            positions = positions.reshape(-1, 4)
+            C = np.zeros((len(dofs), len(dofs)))
+            np.add.at(C, (positions[:, :, np.newaxis], positions[:, np.newaxis, :]),
+                      K_local[changed] - base['K_local'][changed])
+
+            unit = np.zeros((len(force_vector), len(dofs)))
+            unit[dofs, np.arange(len(dofs))] = 1.
+            Z = base['lu'].solve(unit)
+
+            return u - Z.dot(np.linalg.solve(np.eye(len(dofs)) + C.dot(Z[dofs]), C.dot(u[dofs])))
+
+    lu = splu(assemble_CSC_K(K_local, num_elements))
+    _update_bases[key] = {'K_local': K_local.copy(), 'lu': lu}
+
+    return lu.solve(force_vector)
+
+
+def beam_model(h, E, L, b, num_elements, solver='splu', max_update_rank=None):
     """
     This is the main function that evaluates the performance of a beam model.
 
     It takes in data for the beam, applies a load, computes the
     displacements, and returns the compliance of the structure.
+
+    solver='banded' applies the clamp by elimination and solves with a
+    banded Cholesky in O(n) instead of factoring the full system with splu.
+
+    With max_update_rank, the splu solver reuses the factorization of the previous call
+    for the same beam when only a few elements changed, see solve_low_rank_updated.
     """
     num_nodes = num_elements + 1
 
@@ -112,11 +228,46 @@ def beam_model(h, E, L, b, num_elements):
     force_vector = np.concatenate([force_vector, np.zeros(2)])
 
     K_local = assemble_K_local(h, E, L, b, num_elements)
-    K = assemble_CSC_K(K_local, num_elements)
-    lu = splu(K)
 
-    displacements = lu.solve(force_vector)
+    if solver == 'banded':
+        displacements = solve_clamped_banded(K_local, force_vector)
+    elif max_update_rank is not None:
+        displacements = solve_low_rank_updated(K_local, force_vector, (E, L, b, num_elements),
+                                               max_update_rank)
+    else:
+        K = assemble_CSC_K(K_local, num_elements)
+        lu = splu(K)
+
+        displacements = lu.solve(force_vector)
+
+
+    return displacements, force_vector
+
+def beam_model_batch(h, E, L, b, num_elements, solver='splu'):
+    """
+    Same as beam_model for a stack of designs, one per row of h.
+
+    All the stiffness matrices are assembled at once on the shared sparsity pattern;
+    only the factorizations are done one design at a time.
+    """
+    num_nodes = num_elements + 1
+
+    force_vector = np.zeros(2 * num_nodes + 2)
+    force_vector[2 * num_nodes - 2] = -1.
+
+    K_local = assemble_K_local(h, E, L, b, num_elements)
+    displacements = np.empty((K_local.shape[0], len(force_vector)))
 
+    if solver == 'banded':
+        for i_design, K_local_design in enumerate(K_local):
+            displacements[i_design] = solve_clamped_banded(K_local_design, force_vector)
+    else:
+        indptr, indices, scatter, bc_data, n_K = get_CSC_pattern(num_elements)
+        data = assemble_CSC_data_batch(K_local, num_elements)
+
+        for i_design in range(len(data)):
+            K = csc_matrix((data[i_design], indices, indptr), shape=(n_K, n_K))
+            displacements[i_design] = splu(K).solve(force_vector)
 
     return displacements, force_vector
 
@@ -142,9 +293,81 @@ def beam_FEM_residuals(h, E, L, b, num_elements, u):
     return u_residuals, force_vector
 
 
+def beam_FEM_residuals_batch(h, E, L, b, num_elements, u):
+    """
+    Same as beam_FEM_residuals for a stack of designs and states, one per row of h and u.
+    """
+    num_nodes = num_elements + 1
+
+    force_vector = np.zeros(2 * num_nodes + 2)
+    force_vector[2 * num_nodes - 2] = -1.
+
+    K_local = assemble_K_local(h, E, L, b, num_elements)
+    indptr, indices, scatter, bc_data, n_K = get_CSC_pattern(num_elements)
+    data = assemble_CSC_data_batch(K_local, num_elements)
+
+    # K.dot(u) for every design at once: CSC entry k adds data[k] * u[column of k]
+    # to row indices[k]
+    cols = np.repeat(np.arange(n_K), np.diff(indptr))
+    rows = indices + n_K * np.arange(len(u))[:, np.newaxis]
+    Ku = np.bincount(rows.ravel(), weights=(data * u[:, cols]).ravel(), minlength=u.size)
+
+    u_residuals = Ku.reshape(u.shape) - force_vector
+    return u_residuals, force_vector
+
+
+def beam_FEM_partials(h, E, L, b, num_elements, u):
+    """
+    Exact partials of the displacement residuals K(h) u - f.
+
+    Returns
+    -------
+    csc_matrix
+        K, the partial wrt u, on the sparsity pattern of get_CSC_pattern.
+    ndarray
+        (num_elements, 4) partial wrt h: element e only touches the residuals of
+        dofs 2e ... 2e + 3, through d(K_local_e)/dh_e . u_e.
+    """
+    K_local = assemble_K_local(h, E, L, b, num_elements)
+    K = assemble_CSC_K(K_local, num_elements)
+
+    # K_local is proportional to h ** 3
+    dK_local_dh = 3. * (h ** 2)[:, np.newaxis, np.newaxis] * \
+        assemble_K_local(np.ones(num_elements), E, L, b, num_elements)
+
+    dofs = np.arange(4) + 2 * np.arange(num_elements)[:, np.newaxis]
+    dRu_dh = np.einsum('eij,ej->ei', dK_local_dh, u[dofs])
+
+    return K, dRu_dh
+
+
+# factorizations kept by a long-lived worker, so repeated solve_linear calls at the same
+# design, e.g. one per response in rev mode, only factor K once
+_factorizations = OrderedDict()
+
+
+def get_factorization(h, E, L, b, num_elements, max_size=4):
+    """
+    Return the splu factorization of the stiffness matrix for h, from the cache if possible.
+    """
+    key = hashlib.sha1(np.ascontiguousarray(h, dtype=float).tobytes()
+                       + repr((E, L, b, num_elements)).encode()).hexdigest()
+
+    if key in _factorizations:
+        lu = _factorizations.pop(key)
+    else:
+        K = assemble_CSC_K(assemble_K_local(h, E, L, b, num_elements), num_elements)
+        lu = splu(K)
+        if len(_factorizations) >= max_size:
+            _factorizations.popitem(last=False)
+
+    _factorizations[key] = lu
+    return lu
+
+
 def compliance_function(force_vector, displacements):
-    # Compute and return the compliance of the beam
-    compliance = np.dot(force_vector, displacements)
+    # Compute and return the compliance of the beam, or of every row of stacked displacements
+    compliance = np.dot(displacements, force_vector)
     return compliance
 
 
@@ -155,111 +378,525 @@ def volume_function(h, L, b, num_elements):
     """
 
     L0 = L / num_elements
-    return np.sum(h * b * L0)
+    return np.sum(h * b * L0, axis=-1)
 
 
+def compliance_gradient(h, E, L, b, num_elements, u):
+    """
+    Adjoint gradient of the compliance f . u wrt h, given the displacements u at h.
 
-if __name__ == "__main__": 
+    K is symmetric and f doesn't depend on h, so the adjoint vector is u itself and
+    dc/dh = -u^T dK/dh u, in which each h only sees its own element's dofs.
+    """
+    # K_local is proportional to h ** 3
+    dK_local_dh = 3. * (h ** 2)[:, np.newaxis, np.newaxis] * \
+        assemble_K_local(np.ones(num_elements), E, L, b, num_elements)
 
-    import sys
+    u_local = u[np.arange(4) + 2 * np.arange(num_elements)[:, np.newaxis]]
+    return -np.einsum('ei,eij,ej->e', u_local, dK_local_dh, u_local)
 
-    if len(sys.argv) == 1: 
-        sys.argv.append('solve')
 
-    if sys.argv[1] == "solve": 
+def compliance_hessian_vector_product(h, E, L, b, num_elements, u, p, lu):
+    """
+    Product of the Hessian of the compliance wrt h with p, given the displacements u at h
+    and the factorization lu of K at h.
+
+    Differentiating dc/dh_i = -u^T K_i' u once more gives
+    d2c/dh_i dh_j = 2 u^T K_i' K^-1 K_j' u - delta_ij u^T K_i'' u, so the product only
+    needs one more solve, for w = K^-1 sum_j p_j K_j' u, with the same factorization.
+    """
+    elem_dofs = np.arange(4) + 2 * np.arange(num_elements)[:, np.newaxis]
+    K_unit = assemble_K_local(np.ones(num_elements), E, L, b, num_elements)
+    u_local = u[elem_dofs]
+
+    # K_local is proportional to h ** 3, so K_i' = 3 h_i ** 2 K_unit_i and K_i'' = 6 h_i K_unit_i
+    K_unit_u = np.einsum('eij,ej->ei', K_unit, u_local)
+    dK_u = 3. * (h ** 2)[:, np.newaxis] * K_unit_u
+
+    rhs = np.zeros(len(u))
+    np.add.at(rhs, elem_dofs, p[:, np.newaxis] * dK_u)
+    w = lu.solve(rhs)
+
+    return 2. * np.einsum('ei,ei->e', dK_u, w[elem_dofs]) \
+        - 6. * h * p * np.einsum('ei,ei->e', u_local, K_unit_u)
 
-        ################################################
-        # simple run script that reads inputs from 
-        # input.txt and writes to output.txt
-        ################################################
 
-        import os
-        import numpy as np
+def volume_gradient(h, L, b, num_elements):
+    """
+    Gradient of the volume wrt h, which is constant.
+    """
+    return np.full(num_elements, b * L / num_elements)
 
-        from standalone_beam import volume_function, beam_model
 
-        # this will pull all the inputs into the global namespace
-        with open('input.txt', 'r') as f: 
-            inp = f.read()
-            exec(inp)
-            # h, E, L, b, num_elements are now assigned
 
-        print('solve call', h)
+def read_data(filename):
+    """
+    Read a data file, either a binary .npz archive or a text file of
+    `name = value` python statements.
 
+    Returns
+    -------
+    dict
+        The variables keyed by name; 0-d arrays from .npz files come back as python scalars.
+    """
+    data = {}
+    if filename.endswith('.npz'):
+        with np.load(filename) as f:
+            for key in f.files:
+                value = f[key]
+                data[key] = value.item() if value.ndim == 0 else value
+    else:
+        with open(filename, 'r') as f:
+            exec(f.read(), {'np': np}, data)
+    return data
+
+
+def run_solve(input_file='input.txt', output_file='output.txt'):
+    """
+    Read h, E, L, b, num_elements from input_file and write u, compliance, volume
+    to output_file. Files ending in .npz are binary, anything else is text.
+    """
+    inp = read_data(input_file)
+    h, E, L, b, num_elements = [inp[key] for key in ('h', 'E', 'L', 'b', 'num_elements')]
+
+    _mark('read_input')
+
+    print('solve call', h)
 
-        u, force_vector = beam_model(h, E, L, b, num_elements)
-        compliance = compliance_function(force_vector, u)
-        volume = volume_function(h, L, b, num_elements)
+    u, force_vector = beam_model(h, E, L, b, num_elements,
+                                 max_update_rank=get_max_update_rank())
+    compliance = compliance_function(force_vector, u)
+    volume = volume_function(h, L, b, num_elements)
 
-        with open('output.txt', 'w') as f: 
+    _mark('compute')
+
+    if output_file.endswith('.npz'):
+        np.savez(output_file, u=u, compliance=compliance, volume=volume)
+    else:
+        with open(output_file, 'w') as f:
             f.write('u = {}\n'.format(fmt_data(u)))
             f.write('compliance = {}\n'.format(compliance))
             f.write('volume = {}'.format(volume))
 
-    elif sys.argv[1] == "apply": 
 
-        # this will pull all the inputs into the global namespace
-        with open('input.txt', 'r') as f: 
-            inp = f.read()
-            exec(inp)
-            # h, E, L, b, num_elements, and u, c, v are now assigned
+def run_apply(input_file='input.txt', output_file='output.txt'):
+    """
+    Read h, E, L, b, num_elements and the states u, compliance, volume from
+    input_file and write their residuals to output_file.
+    """
+    inp = read_data(input_file)
+    h, E, L, b, num_elements = [inp[key] for key in ('h', 'E', 'L', 'b', 'num_elements')]
+    u, compliance, volume = inp['u'], inp['compliance'], inp['volume']
 
-        print('apply call', h, u, compliance, volume)
+    _mark('read_input')
 
-        u_residuals, force_vector = beam_FEM_residuals(h, E, L, b, num_elements, u)
-        c_residual = compliance - compliance_function(force_vector, u)
-        v_residual = volume - volume_function(h, L, b, num_elements)
+    print('apply call', h, u, compliance, volume)
 
-        with open('output.txt', 'w') as f: 
+    u_residuals, force_vector = beam_FEM_residuals(h, E, L, b, num_elements, u)
+    c_residual = compliance - compliance_function(force_vector, u)
+    v_residual = volume - volume_function(h, L, b, num_elements)
+
+    _mark('compute')
+
+    if output_file.endswith('.npz'):
+        np.savez(output_file, u_residuals=u_residuals, c_residual=c_residual,
+                 v_residual=v_residual)
+    else:
+        with open(output_file, 'w') as f:
             f.write('u_residuals = {}\n'.format(u_residuals.tolist()))
             f.write('c_residual = {}\n'.format(c_residual))
             f.write('v_residual = {}\n'.format(v_residual))
 
 
-    if sys.argv[1] == "opt": 
-        ##############################################
-        #run an optimization using FD and scipy 
-        ##############################################
+def run_solve_batch(input_file='input.txt', output_file='output.txt'):
+    """
+    Like run_solve, for a stack of designs read as the rows of h, all solved in this process.
+    u is written as one row per design, compliance and volume as one entry per design.
+    """
+    inp = read_data(input_file)
+    E, L, b, num_elements = [inp[key] for key in ('E', 'L', 'b', 'num_elements')]
+    h = np.atleast_2d(inp['h'])
 
-        def compliance_objective(h, E, L, b, num_elements): 
-            """
-            Wraps the FEM in a function that matches what scipy expects
-            """
+    _mark('read_input')
 
-            u, force_vector  = beam_model(h, E, L, b, num_elements)
-            return compliance_function(force_vector, u)
+    print('solve-batch call', h.shape[0], 'designs')
 
+    u, force_vector = beam_model_batch(h, E, L, b, num_elements)
+    compliance = compliance_function(force_vector, u)
+    volume = volume_function(h, L, b, num_elements)
 
-        def volume_constraint(h, L, b, num_elements, req_volume):
-            """
-            Computes the actual optimization constraint required by scipy. 
-            This won't be used by the OpenMDAO wrapper.
-            """
-            vol = volume_function(h, L, b, num_elements)
+    _mark('compute')
+
+    if output_file.endswith('.npz'):
+        np.savez(output_file, u=u, compliance=compliance, volume=volume)
+    else:
+        with open(output_file, 'w') as f:
+            f.write('u = {}\n'.format(fmt_data(u)))
+            f.write('compliance = {}\n'.format(fmt_data(compliance)))
+            f.write('volume = {}'.format(fmt_data(volume)))
+
+
+def run_apply_batch(input_file='input.txt', output_file='output.txt'):
+    """
+    Like run_apply, for a stack of designs and states read as the rows of h and u and the
+    entries of compliance and volume.
+    """
+    inp = read_data(input_file)
+    E, L, b, num_elements = [inp[key] for key in ('E', 'L', 'b', 'num_elements')]
+    h = np.atleast_2d(inp['h'])
+    u = np.atleast_2d(inp['u'])
+    compliance = np.atleast_1d(inp['compliance'])
+    volume = np.atleast_1d(inp['volume'])
+
+    _mark('read_input')
+
+    print('apply-batch call', h.shape[0], 'designs')
+
+    u_residuals, force_vector = beam_FEM_residuals_batch(h, E, L, b, num_elements, u)
+    c_residual = compliance - compliance_function(force_vector, u)
+    v_residual = volume - volume_function(h, L, b, num_elements)
+
+    _mark('compute')
+
+    if output_file.endswith('.npz'):
+        np.savez(output_file, u_residuals=u_residuals, c_residual=c_residual,
+                 v_residual=v_residual)
+    else:
+        with open(output_file, 'w') as f:
+            f.write('u_residuals = {}\n'.format(fmt_data(u_residuals)))
+            f.write('c_residual = {}\n'.format(fmt_data(c_residual)))
+            f.write('v_residual = {}\n'.format(fmt_data(v_residual)))
+
+
+def run_linearize(input_file='input.txt', output_file='output.txt'):
+    """
+    Read h, E, L, b, num_elements and u from input_file and write the partials of the
+    displacement residuals: K as CSC arrays (K_data, K_indices, K_indptr) and dRu_dh, the
+    4 nonzeros per element of the partial wrt h.
+    """
+    inp = read_data(input_file)
+    h, E, L, b, num_elements = [inp[key] for key in ('h', 'E', 'L', 'b', 'num_elements')]
+    u = np.asarray(inp['u'])
+
+    _mark('read_input')
+
+    print('linearize call', h)
 
-            volume_diff = req_volume - volume_function(h, L, b, num_elements)
+    K, dRu_dh = beam_FEM_partials(h, E, L, b, num_elements, u)
 
-            return volume_diff
+    _mark('compute')
 
-        num_elements = 5
-        E = 1.
-        L = 1.
-        b = 0.1
-        volume = 0.01
-        h = np.ones((num_elements)) * 1.0
+    if output_file.endswith('.npz'):
+        np.savez(output_file, K_data=K.data, K_indices=K.indices, K_indptr=K.indptr,
+                 dRu_dh=dRu_dh)
+    else:
+        with open(output_file, 'w') as f:
+            f.write('K_data = {}\n'.format(fmt_data(K.data)))
+            f.write('K_indices = {}\n'.format(K.indices.tolist()))
+            f.write('K_indptr = {}\n'.format(K.indptr.tolist()))
+            f.write('dRu_dh = {}\n'.format(fmt_data(dRu_dh)))
 
+
+def run_solve_linear(input_file='input.txt', output_file='output.txt'):
+    """
+    Read h, E, L, b, num_elements and rhs from input_file and write x = K^-1 rhs.
+    K is symmetric, so the same solve serves fwd and rev mode; rhs may hold one
+    right-hand side per row.
+    """
+    inp = read_data(input_file)
+    h, E, L, b, num_elements = [inp[key] for key in ('h', 'E', 'L', 'b', 'num_elements')]
+    rhs = np.asarray(inp['rhs'])
+
+    _mark('read_input')
+
+    print('solve_linear call', h)
+
+    lu = get_factorization(h, E, L, b, num_elements)
+    x = lu.solve(rhs.T).T
+
+    _mark('compute')
+
+    if output_file.endswith('.npz'):
+        np.savez(output_file, x=x)
+    else:
+        with open(output_file, 'w') as f:
+            f.write('x = {}\n'.format(fmt_data(x)))
+
+
+def run_opt(num_elements=5, use_gradients=True, method='SLSQP'):
+    """
+    Run an optimization using scipy's SLSQP, or trust-region Newton-CG.
+
+    With use_gradients, the objective and its adjoint gradient share one model evaluation
+    per design, and the constraint gets its constant Jacobian, so an iteration costs one
+    factorization. Otherwise scipy finite differences both, at n + 1 solves per gradient.
+
+    method='trust-ncg' also uses compliance Hessian-vector products, one solve each with the
+    design's factorization. trust-ncg is unconstrained, so it optimizes s in
+    h = h_min + (n * h_mean - n * h_min) * softmax(s), which meets the volume constraint and
+    the lower bound on h by construction; the upper bound is far from active at this volume.
+
+    Returns
+    -------
+    OptimizeResult
+        scipy's result, plus num_solves, the number of beam_model evaluations, and
+        num_hessps, the number of Hessian-vector products.
+    """
+    num_elements = int(num_elements)
+    if isinstance(use_gradients, str):
+        use_gradients = use_gradients.lower() not in ('0', 'false', 'no')
+    if method not in ('SLSQP', 'trust-ncg'):
+        raise ValueError("Unknown method {!r}, expected 'SLSQP' or 'trust-ncg'".format(method))
+    if method == 'trust-ncg' and not use_gradients:
+        raise ValueError('trust-ncg needs use_gradients')
+
+    num_solves = [0]
+    num_hessps = [0]
+    # the latest design and its compliance and displacements; the optimizers ask for the
+    # objective and its derivatives at the same points
+    last = {'h': None}
+
+    def evaluate(h, E, L, b, num_elements):
+        """
+        Return the compliance and displacements at h, solving only for a new design.
+        """
+        if last['h'] is None or not np.array_equal(h, last['h']):
+            if method == 'trust-ncg':
+                # the Hessian-vector products at h reuse its factorization
+                lu = get_factorization(h, E, L, b, num_elements)
+                force_vector = np.zeros(2 * num_elements + 4)
+                force_vector[-4] = -1.
+                u = lu.solve(force_vector)
+            else:
+                u, force_vector = beam_model(h, E, L, b, num_elements,
+                                             max_update_rank=get_max_update_rank())
+                lu = None
+            num_solves[0] += 1
+            last.update(h=h.copy(), u=u, lu=lu, compliance=compliance_function(force_vector, u))
+        return last['compliance'], last['u']
+
+    def compliance_objective(h, E, L, b, num_elements): 
+        """
+        Wraps the FEM in a function that matches what scipy expects
+        """
+        return evaluate(h, E, L, b, num_elements)[0]
+
+    def compliance_objective_gradient(h, E, L, b, num_elements):
+        """
+        Adjoint gradient of the objective, from the displacements of the same evaluation.
+        """
+        u = evaluate(h, E, L, b, num_elements)[1]
+        return compliance_gradient(h, E, L, b, num_elements, u)
+
+    def compliance_objective_hessp(h, p, E, L, b, num_elements):
+        """
+        Hessian of the objective times p, with the factorization of the same evaluation.
+        """
+        u = evaluate(h, E, L, b, num_elements)[1]
+        num_hessps[0] += 1
+        return compliance_hessian_vector_product(h, E, L, b, num_elements, u, p, last['lu'])
+
+
+    def volume_constraint(h, L, b, num_elements, req_volume):
+        """
+        Computes the actual optimization constraint required by scipy. 
+        This won't be used by the OpenMDAO wrapper.
+        """
+        volume_diff = req_volume - volume_function(h, L, b, num_elements)
+
+        return volume_diff
+
+    def volume_constraint_jacobian(h, L, b, num_elements, req_volume):
+        return -volume_gradient(h, L, b, num_elements)
+
+    E = 1.
+    L = 1.
+    b = 0.1
+    volume = 0.01
+    h = np.ones((num_elements)) * 1.0
+    h_min = 0.01
+
+    if method == 'trust-ncg':
+        h_range = volume / (b * L / num_elements) - num_elements * h_min
+
+        def get_h(s):
+            """
+            Return the heights of s and the softmax of s.
+            """
+            sigma = np.exp(s - np.max(s))
+            sigma /= np.sum(sigma)
+            return h_min + h_range * sigma, sigma
+
+        def softmax_product(sigma, x):
+            # the Jacobian of softmax, diag(sigma) - sigma sigma^T, is symmetric
+            return sigma * (x - np.dot(sigma, x))
+
+        def objective(s):
+            return compliance_objective(get_h(s)[0], E, L, b, num_elements)
+
+        def objective_gradient(s):
+            h, sigma = get_h(s)
+            return h_range * softmax_product(
+                sigma, compliance_objective_gradient(h, E, L, b, num_elements))
+
+        def objective_hessp(s, p):
+            # chain rule: J^T H J p, plus the gradient times the second derivatives of softmax
+            h, sigma = get_h(s)
+            g = compliance_objective_gradient(h, E, L, b, num_elements)
+            Hp = compliance_objective_hessp(h, h_range * softmax_product(sigma, p),
+                                            E, L, b, num_elements)
+            q = p - np.dot(sigma, p)
+            return h_range * (softmax_product(sigma, Hp)
+                              + sigma * q * (g - np.dot(sigma, g)) - sigma * np.dot(sigma, g * q))
+
+        # s = 0 is the uniform design at the required volume; the gradient wrt s scales with
+        # the compliance, so the tolerance is relative to the starting compliance
+        s = np.zeros(num_elements)
+        result = minimize(objective, s, method='trust-ncg',
+                          jac=objective_gradient, hessp=objective_hessp,
+                          options={'gtol': 1e-6 * objective(s), 'maxiter': 500})
+        result.x = get_h(result.x)[0]
+    else:
         constraint_dict = {
             'type' : 'eq',
             'fun' : volume_constraint,
             'args' : (L, b, num_elements, volume),
         }
+        if use_gradients:
+            constraint_dict['jac'] = volume_constraint_jacobian
 
-        bounds = Bounds(0.01, 10.)
+        bounds = Bounds(h_min, 10.)
         result = minimize(compliance_objective, h, tol=1e-9, bounds=bounds, 
                           args=(E, L, b, num_elements), 
+                          jac=compliance_objective_gradient if use_gradients else None,
                           constraints=constraint_dict, 
                           options={'maxiter' : 500})
+    result.num_solves = num_solves[0]
+    result.num_hessps = num_hessps[0]
+
+    print('Optimal element height distribution:')
+    print(repr(result.x))
+    print(result.fun)
+    print('{} iterations, {} model evaluations, {} Hessian-vector products'.format(
+        result.nit, result.num_solves, result.num_hessps))
+
+    return result
+
+
+def get_max_update_rank():
+    """
+    Return the low-rank update threshold of beam_model, from the
+    STANDALONE_BEAM_MAX_UPDATE_RANK environment variable, or None to always refactor.
+    """
+    max_update_rank = os.environ.get('STANDALONE_BEAM_MAX_UPDATE_RANK')
+    return int(max_update_rank) if max_update_rank else None
+
+
+def _mark(phase):
+    """
+    Note the end of a phase of the running command, e.g. 'read_input', when profiling.
+    """
+    if _marks is not None:
+        _marks[phase] = time()
+
+
+def run_command(argv):
+    """
+    Run one command line, e.g. ['solve'] or ['apply', 'input.txt', 'output.txt'].
+
+    If the STANDALONE_BEAM_PROFILE environment variable names a file, the command's phase
+    timestamps are written to it as JSON: the process start, the end of the imports, the
+    command start and the ends of its read_input, compute and write_output phases.
+
+    If STANDALONE_BEAM_MAX_UPDATE_RANK is set, solve and opt reuse the previous
+    factorization through low-rank updates, which pays off in a worker, where the previous
+    call's factorization is still around.
+    """
+    global _marks
+
+    if argv[0] not in COMMANDS:
+        raise ValueError('Unknown command {!r}, expected one of {}'.format(
+            argv[0], sorted(COMMANDS)))
+
+    profile_file = os.environ.get('STANDALONE_BEAM_PROFILE')
+    if not profile_file:
+        COMMANDS[argv[0]](*argv[1:])
+        return
+
+    import json
+
+    _marks = OrderedDict([('process_start', _process_start), ('imports_end', _imports_end),
+                          ('command_start', time())])
+    try:
+        COMMANDS[argv[0]](*argv[1:])
+        _marks['write_output'] = time()
+
+        with open(profile_file, 'w') as f:
+            json.dump(_marks, f)
+    finally:
+        _marks = None
+
+
+def run_worker():
+    """
+    Serve commands from one long-lived process, so the interpreter and the numpy/scipy
+    imports are paid for once instead of on every call.
+
+    Each request is a JSON line {"argv": [...], "cwd": ...} read from stdin, where argv is
+    what would follow `standalone_beam.py` on the command line. Each reply is a JSON line
+    {"return_code": ..., "error_msg": ...} on stdout, mirroring the exit status of a
+    one-shot run. Anything the commands print goes to stderr so it can't break the protocol.
+    The worker exits when stdin is closed.
+    """
+    import json
+    import os
+    import traceback
+    from contextlib import redirect_stdout
+
+    replies = sys.stdout
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        return_code = 0
+        error_msg = ''
+
+        try:
+            os.chdir(request['cwd'])
+            with redirect_stdout(sys.stderr):
+                run_command(request['argv'])
+        except SystemExit as err:
+            return_code = err.code if isinstance(err.code, int) else 1
+        except Exception:
+            return_code = 1
+            error_msg = traceback.format_exc()
+            sys.stderr.write(error_msg)
+
+        sys.stderr.flush()
+        replies.write(json.dumps({'return_code': return_code, 'error_msg': error_msg}) + '\n')
+        replies.flush()
+
+
+COMMANDS = {
+    'solve': run_solve,
+    'apply': run_apply,
+    'solve-batch': run_solve_batch,
+    'apply-batch': run_apply_batch,
+    'linearize': run_linearize,
+    'solve_linear': run_solve_linear,
+    'opt': run_opt,
+}
+
+
+if __name__ == "__main__": 
+
+    # usage: python standalone_beam.py
+    #            [solve|apply|solve-batch|apply-batch|linearize|solve_linear
+    #             [input_file [output_file]]
+    #             | opt [num_elements [use_gradients [SLSQP|trust-ncg]]] | worker]
+    if len(sys.argv) == 1: 
+        sys.argv.append('solve')
 
-        print('Optimal element height distribution:')
-        print(repr(result.x))
-        print(result.fun)
\ No newline at end of file
+    if sys.argv[1] == 'worker':
+        run_worker()
+    else:
+        run_command(sys.argv[1:])
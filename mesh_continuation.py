@@ -0,0 +1,102 @@
+from __future__ import print_function, division
+
+import sys
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from lab_2_solution import BeamGroup
+
+
+def interpolate_h(h, num_elements):
+    """
+    Interpolate element heights onto a finer mesh of the same beam.
+
+    The heights are linear between element centers and flat past the first and last
+    centers, then scaled so the beam keeps its volume.
+
+    Parameters
+    ----------
+    h : ndarray
+        Heights of the coarse elements.
+    num_elements : int
+        Number of elements of the new mesh.
+
+    Returns
+    -------
+    ndarray
+        Heights of the new elements.
+    """
+    x_old = (np.arange(len(h)) + 0.5) / len(h)
+    x_new = (np.arange(num_elements) + 0.5) / num_elements
+
+    h_new = np.interp(x_new, x_old, h)
+    return h_new * (np.mean(h) / np.mean(h_new))
+
+
+def run_mesh_continuation(levels, get_driver, group_class=BeamGroup, h0=1.,
+                          out_stream=sys.stdout, **group_options):
+    """
+    Optimize a beam on a sequence of meshes, starting each from the previous optimum.
+
+    Parameters
+    ----------
+    levels : list of int
+        num_elements of each level, coarse to fine.
+    get_driver : callable
+        Returns a new driver for each level's Problem.
+    group_class : Group class
+        Model of the beam; it is built with num_elements plus group_options.
+    h0 : float or ndarray
+        Starting heights of the first level.
+    out_stream : file-like or None
+        Where to print the per-level report; None for no report.
+    **group_options : dict
+        Remaining options of group_class, e.g. E, L, b and volume.
+
+    Returns
+    -------
+    Problem
+        The Problem of the finest level, at its optimum.
+    list of OrderedDict
+        num_elements, iterations (total derivative evaluations), model_evals, time,
+        compliance and success of each level.
+    """
+    level_data = []
+    h = None
+    for num_elements in levels:
+        prob = om.Problem(model=group_class(num_elements=num_elements, **group_options),
+                          reports=False)
+        prob.driver = get_driver()
+        prob.setup()
+        prob['inputs_comp.h'] = h0 if h is None else interpolate_h(h, num_elements)
+
+        pre_time = time()
+        result = prob.run_driver()
+        duration = time() - pre_time
+
+        h = prob['inputs_comp.h'].copy()
+        level_data.append(OrderedDict([
+            ('num_elements', num_elements),
+            ('iterations', result.deriv_evals),
+            ('model_evals', result.model_evals),
+            ('time', duration),
+            ('compliance', prob['compliance_comp.compliance'][0]),
+            ('success', result.success),
+        ]))
+
+    if out_stream is not None:
+        print('{:>10s}{:>12s}{:>12s}{:>12s}{:>16s}'.format(
+            'elements', 'iterations', 'model evals', 'seconds', 'compliance'), file=out_stream)
+        for data in level_data:
+            print('{:10d}{:12d}{:12d}{:12.3e}{:16.6e}{}'.format(
+                data['num_elements'], data['iterations'], data['model_evals'], data['time'],
+                data['compliance'], '' if data['success'] else ' failed'), file=out_stream)
+        print('{:>10s}{:12d}{:12d}{:12.3e}'.format(
+            'total', sum(data['iterations'] for data in level_data),
+            sum(data['model_evals'] for data in level_data),
+            sum(data['time'] for data in level_data)), file=out_stream)
+
+    return prob, level_data
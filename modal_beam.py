@@ -0,0 +1,84 @@
+from __future__ import print_function, division
+
+import numpy as np
+
+import openmdao.api as om
+
+from beam_comps import (MomentOfInertiaComp, LocalStiffnessMatrixComp, FEM, ModalComp,
+                        ComplianceComp, VolumeComp, StiffnessCache)
+from lab_2_solution import BeamGroup
+
+
+class FrequencyBeamGroup(BeamGroup):
+    """
+    BeamGroup with a lower bound on the first natural frequency.
+
+    By default the FEM and the ModalComp share one StiffnessCache, so the static solve and the
+    shift-invert Lanczos iterations use the same factorization of K at every design. The
+    options are BeamGroup's plus the modal ones; setup builds the group itself, since
+    BeamGroup adds the compliance objective unscaled.
+    """
+
+    def initialize(self):
+        super(FrequencyBeamGroup, self).initialize()
+        self.options.declare('rho', default=1.)
+        self.options.declare('min_frequency', desc='lower bound on the first natural '
+                                                   'frequency, in rad/s')
+        self.options.declare('num_modes', types=int, default=1,
+                             desc='number of lowest eigenvalues to compute')
+        self.options.declare('share_factorization', types=bool, default=True,
+                             desc='if False, the ModalComp factors K on its own')
+
+    def setup(self):
+        E = self.options['E']
+        L = self.options['L']
+        b = self.options['b']
+        volume = self.options['volume']
+        num_elements = self.options['num_elements']
+        num_nodes = num_elements + 1
+
+        force_vector = np.zeros(2 * num_nodes)
+        force_vector[-2] = -1.
+
+        K_cache = StiffnessCache(num_elements)
+
+        inputs_comp = om.IndepVarComp()
+        inputs_comp.add_output('h', shape=num_elements)
+        self.add_subsystem('inputs_comp', inputs_comp)
+
+        comp = MomentOfInertiaComp(num_elements=num_elements, b=b)
+        self.add_subsystem('I_comp', comp)
+
+        comp = LocalStiffnessMatrixComp(num_elements=num_elements, E=E, L=L)
+        self.add_subsystem('local_stiffness_matrix_comp', comp)
+
+        comp = FEM(num_elements=num_elements, force_vector=force_vector, K_cache=K_cache)
+        self.add_subsystem('FEM', comp)
+
+        comp = ModalComp(num_elements=num_elements, L=L, b=b, rho=self.options['rho'],
+                         num_modes=self.options['num_modes'],
+                         K_cache=K_cache if self.options['share_factorization'] else None)
+        self.add_subsystem('modal_comp', comp)
+
+        comp = ComplianceComp(num_elements=num_elements, force_vector=force_vector)
+        self.add_subsystem('compliance_comp', comp)
+
+        comp = VolumeComp(num_elements=num_elements, b=b, L=L)
+        self.add_subsystem('volume_comp', comp)
+
+        self.connect('inputs_comp.h', 'I_comp.h')
+        self.connect('I_comp.I', 'local_stiffness_matrix_comp.I')
+        self.connect('local_stiffness_matrix_comp.K_local', 'FEM.K_local')
+        self.connect('local_stiffness_matrix_comp.K_local', 'modal_comp.K_local')
+        self.connect('inputs_comp.h', 'modal_comp.h')
+        self.connect('inputs_comp.h', 'volume_comp.h')
+        self.connect('FEM.u', 'compliance_comp.displacements',
+                     src_indices=np.arange(2 * num_nodes))
+
+        self.add_design_var('inputs_comp.h', lower=1e-2, upper=10.)
+        # scaled so SLSQP sees the compliance and the eigenvalue at similar magnitudes
+        self.add_objective('compliance_comp.compliance', ref=1e4)
+        self.add_constraint('volume_comp.volume', equals=volume)
+        self.add_constraint('modal_comp.eigenvalues', indices=[0],
+                            lower=self.options['min_frequency'] ** 2,
+                            ref=self.options['min_frequency'] ** 2)
@@ -0,0 +1,220 @@
+from __future__ import print_function, division
+
+import numpy as np
+
+from openmdao.core.driver import Driver, RecordingDebugging
+
+
+class OptimalityCriteriaDriver(Driver):
+    """
+    Optimality-criteria driver for minimum compliance problems with one resource constraint.
+
+    Minimizes an objective that decreases in every design variable (compliance) subject to
+    one constraint that increases in every design variable (volume), like lab_2's BeamGroup.
+    Each iteration takes one model run and one compute_totals, then applies the fixed-point
+    update of the KKT conditions
+
+        x_new = x * (-dc/dx / (lam * dg/dx)) ** damping
+
+    clipped to the move limit and the design variable bounds, with the multiplier lam found by
+    bisection so that the linearized constraint is met. The update is elementwise, so an
+    iteration costs O(n) on top of the model, where SLSQP's dense quasi-Newton update costs
+    O(n^2) memory and O(n^3) work.
+
+    For a stiffness that scales with x ** p, as h ** 3 does for the beam, a damping of
+    1 / (p + 1) is the exact update of a statically determinate structure, so the default
+    0.25 converges in a few iterations on the cantilever. The usual 0.5 overshoots the
+    fixed point of an h ** 3 stiffness by exactly its own error and oscillates there.
+    """
+
+    def __init__(self, **kwargs):
+        super(OptimalityCriteriaDriver, self).__init__(**kwargs)
+
+        self.supports['optimization'] = True
+        self.supports['inequality_constraints'] = True
+        self.supports['equality_constraints'] = True
+        self.supports['gradients'] = True
+        self.supports['integer_design_vars'] = False
+        self.supports['distributed_design_vars'] = False
+
+        self.fail = False
+
+    def _declare_options(self):
+        self.options.declare('maxiter', types=int, default=200, lower=0,
+                             desc='maximum number of iterations')
+        self.options.declare('tol', default=1e-4, lower=0.,
+                             desc='stop when no design variable changes by more than this '
+                                  'fraction of its value; the gradients of a fine mesh are '
+                                  'too noisy for much less')
+        self.options.declare('move', default=0.5, lower=0.,
+                             desc='largest change of a design variable in one iteration, '
+                                  'as a fraction of its value')
+        self.options.declare('damping', default=0.25, lower=0., upper=1.,
+                             desc='exponent of the optimality criteria update, 1 / (p + 1) for '
+                                  'a stiffness that scales with x ** p')
+        self.options.declare('bisection_tol', default=1e-12, lower=0.,
+                             desc='relative tolerance of the multiplier bisection')
+        self.options.declare('disp', types=bool, default=True,
+                             desc='print the result of the optimization')
+
+    def _setup_driver(self, problem):
+        super(OptimalityCriteriaDriver, self)._setup_driver(problem)
+
+        if len(self._objs) != 1 or len(self._cons) != 1:
+            raise RuntimeError('{}: needs exactly one objective and one constraint.'.format(
+                self.msginfo))
+
+        meta = list(self._cons.values())[0]
+        if meta['size'] != 1:
+            raise RuntimeError('{}: constraint must be a scalar.'.format(self.msginfo))
+        if meta['equals'] is None and meta['upper'] is None:
+            raise RuntimeError('{}: constraint needs an equals or upper bound.'.format(
+                self.msginfo))
+
+    def _run_model(self):
+        model = self._problem().model
+
+        with RecordingDebugging(self._get_name(), self.iter_count, self):
+            with model._relevance.nonlinear_active('iter'):
+                self._run_solve_nonlinear()
+            self.iter_count += 1
+
+    def _get_bounds(self):
+        """
+        Stack the lower and upper bounds of all design variables.
+
+        Returns
+        -------
+        ndarray
+            Lower bounds.
+        ndarray
+            Upper bounds.
+        """
+        lower = []
+        upper = []
+        for meta in self._designvars.values():
+            size = meta['size']
+            lower.append(np.broadcast_to(-np.inf if meta['lower'] is None else meta['lower'],
+                                         size))
+            upper.append(np.broadcast_to(np.inf if meta['upper'] is None else meta['upper'],
+                                         size))
+        return np.concatenate(lower), np.concatenate(upper)
+
+    def _update(self, x, dc, g, dg, g_target, lower, upper):
+        """
+        One optimality criteria step.
+
+        Parameters
+        ----------
+        x : ndarray
+            Current design.
+        dc : ndarray
+            Gradient of the objective.
+        g : float
+            Current constraint value.
+        dg : ndarray
+            Gradient of the constraint.
+        g_target : float
+            Constraint value to meet.
+        lower : ndarray
+            Lower bounds of x.
+        upper : ndarray
+            Upper bounds of x.
+
+        Returns
+        -------
+        ndarray
+            Next design.
+        """
+        move = self.options['move']
+        damping = self.options['damping']
+
+        x_min = np.maximum(lower, x * (1. - move))
+        x_max = np.minimum(upper, x * (1. + move))
+
+        # only design variables that lower the objective are worth the resource
+        ratio = np.maximum(-dc, 0.) / dg
+
+        def step(lam):
+            return np.clip(x * (ratio / lam) ** damping, x_min, x_max)
+
+        def excess(x_new):
+            # the constraint is linearized about x; for volume it is exact
+            return g + np.dot(dg, x_new - x) - g_target
+
+        # the constraint decreases monotonically in lam, so bracket the root and bisect in
+        # log space; the multiplier can be anywhere over many orders of magnitude
+        lam_low = lam_high = max(np.median(ratio[ratio > 0.]), 1e-300) if np.any(ratio) else 1.
+        while excess(step(lam_low)) < 0. and lam_low > 1e-300:
+            lam_low /= 10.
+        while excess(step(lam_high)) > 0. and lam_high < 1e300:
+            lam_high *= 10.
+
+        while lam_high - lam_low > self.options['bisection_tol'] * lam_high:
+            lam = np.sqrt(lam_low) * np.sqrt(lam_high)
+            if excess(step(lam)) > 0.:
+                lam_low = lam
+            else:
+                lam_high = lam
+
+        return step(np.sqrt(lam_low) * np.sqrt(lam_high))
+
+    def run(self):
+        """
+        Optimize the problem with optimality criteria updates.
+
+        Returns
+        -------
+        bool
+            Failure flag; True if failed to converge, False is successful.
+        """
+        self.result.reset()
+        self.iter_count = 0
+        self._total_jac = None
+        self.fail = True
+
+        self._check_for_missing_objective()
+        self._check_for_invalid_desvar_values()
+
+        obj_name = list(self._objs)[0]
+        con_name = list(self._cons)[0]
+        meta = self._cons[con_name]
+        dv_names = list(self._designvars)
+        lower, upper = self._get_bounds()
+
+        # more material always lowers the compliance, so an upper bound is always active
+        g_target = meta['equals'] if meta['equals'] is not None else meta['upper']
+
+        self._run_model()
+
+        iteration = -1
+        for iteration in range(self.options['maxiter']):
+            dv_vals = self.get_design_var_values()
+            x = np.concatenate([dv_vals[name] for name in dv_names])
+
+            g = self.get_constraint_values()[con_name][0]
+            J = self._compute_totals(of=[obj_name, con_name], wrt=dv_names)
+            dc = np.concatenate([J[obj_name, name].ravel() for name in dv_names])
+            dg = np.concatenate([J[con_name, name].ravel() for name in dv_names])
+
+            x_new = self._update(x, dc, g, dg, g_target, lower, upper)
+
+            # the design variable vector is in the same order as dv_names
+            self._vectors['design_var'].set_data(x_new, driver_scaling=True)
+            self._set_design_vars(driver_scaling=True)
+            self._run_model()
+
+            if np.max(np.abs(x_new - x) / np.abs(x)) < self.options['tol']:
+                self.fail = False
+                break
+
+        if self.options['disp']:
+            print('Optimization {} ({})'.format(
+                'failed' if self.fail else 'terminated successfully',
+                'maximum iterations reached' if self.fail else 'design converged'))
+            print('            Current function value: {}'.format(
+                self.get_objective_values()[obj_name][0]))
+            print('            Iterations: {}'.format(iteration + 1))
+            print('            Function evaluations: {}'.format(self.iter_count))
+
+        return self.fail
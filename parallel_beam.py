@@ -0,0 +1,88 @@
+from __future__ import print_function, division
+
+import numpy as np
+
+import openmdao.api as om
+
+from beam_comps import (MomentOfInertiaComp, LocalStiffnessMatrixComp, ParallelFEM,
+                        ComplianceComp, VolumeComp)
+from lab_2_solution import BeamGroup
+
+
+class ParallelBeamGroup(BeamGroup):
+    """
+    BeamGroup with a ParallelFEM in place of the FEM, factoring and solving the stiffness
+    system on num_workers local processes. The options are BeamGroup's plus num_workers;
+    setup builds the group itself, since the FEM component has another class.
+    """
+
+    def initialize(self):
+        super(ParallelBeamGroup, self).initialize()
+        self.options.declare('num_workers', types=int, default=2,
+                             desc='worker processes of the ParallelFEM')
+
+    def setup(self):
+        E = self.options['E']
+        L = self.options['L']
+        b = self.options['b']
+        volume = self.options['volume']
+        num_elements = self.options['num_elements']
+        num_nodes = num_elements + 1
+
+        force_vector = np.zeros(2 * num_nodes)
+        force_vector[-2] = -1.
+
+        inputs_comp = om.IndepVarComp()
+        inputs_comp.add_output('h', shape=num_elements)
+        self.add_subsystem('inputs_comp', inputs_comp)
+
+        comp = MomentOfInertiaComp(num_elements=num_elements, b=b)
+        self.add_subsystem('I_comp', comp)
+
+        comp = LocalStiffnessMatrixComp(num_elements=num_elements, E=E, L=L)
+        self.add_subsystem('local_stiffness_matrix_comp', comp)
+
+        comp = ParallelFEM(num_elements=num_elements, force_vector=force_vector,
+                           num_workers=self.options['num_workers'])
+        self.add_subsystem('FEM', comp)
+
+        comp = ComplianceComp(num_elements=num_elements, force_vector=force_vector)
+        self.add_subsystem('compliance_comp', comp)
+
+        comp = VolumeComp(num_elements=num_elements, b=b, L=L)
+        self.add_subsystem('volume_comp', comp)
+
+        self.connect('inputs_comp.h', 'I_comp.h')
+        self.connect('I_comp.I', 'local_stiffness_matrix_comp.I')
+        self.connect('local_stiffness_matrix_comp.K_local', 'FEM.K_local')
+        self.connect('inputs_comp.h', 'volume_comp.h')
+        self.connect('FEM.u', 'compliance_comp.displacements',
+                     src_indices=np.arange(2 * num_nodes))
+
+        self.add_design_var('inputs_comp.h', lower=1e-2, upper=10.)
+        self.add_objective('compliance_comp.compliance')
+        self.add_constraint('volume_comp.volume', equals=volume)
+
+
+if __name__ == "__main__":
+
+    import time
+
+    num_elements = 50
+
+    prob = om.Problem(model=ParallelBeamGroup(E=1., L=1., b=0.1, volume=0.01,
+                                              num_elements=num_elements, num_workers=4))
+
+    prob.driver = om.ScipyOptimizeDriver()
+    prob.driver.options['optimizer'] = 'SLSQP'
+    prob.driver.options['tol'] = 1e-9
+    prob.driver.options['disp'] = True
+
+    prob.setup()
+
+    start_time = time.time()
+    prob.run_driver()
+    print('opt time', time.time() - start_time)
+    print(prob['inputs_comp.h'])
+
+    prob.cleanup()
@@ -0,0 +1,79 @@
+from __future__ import print_function, division
+
+import numpy as np
+
+import openmdao.api as om
+
+from beam_comps import (MomentOfInertiaComp, LocalStiffnessMatrixComp, FEM, ComplianceComp,
+                        ComplianceStatsComp, VolumeComp)
+from lab_2_solution import BeamGroup
+
+
+class RobustBeamGroup(BeamGroup):
+    """
+    BeamGroup with E and b sampled: one model evaluates the compliance of every sample and
+    reports its mean and variance. E and b may hold one value per sample.
+
+    The samples run through the sample dimension of the components rather than one
+    Problem each; FEM factors and solves them one by one, on num_threads threads. The
+    volume constraint uses the mean width. The options are BeamGroup's, but setup builds the
+    group itself, since the sample dimension changes every component, the displacement
+    connection and the objective.
+    """
+
+    def initialize(self):
+        super(RobustBeamGroup, self).initialize()
+        self.options.declare('num_samples', int)
+        self.options.declare('num_threads', types=int, default=1,
+                             desc='threads that factor and solve the samples concurrently')
+
+    def setup(self):
+        E = self.options['E']
+        L = self.options['L']
+        b = self.options['b']
+        volume = self.options['volume']
+        num_elements = self.options['num_elements']
+        num_samples = self.options['num_samples']
+        num_nodes = num_elements + 1
+
+        force_vector = np.zeros(2 * num_nodes)
+        force_vector[-2] = -1.
+
+        inputs_comp = om.IndepVarComp()
+        inputs_comp.add_output('h', shape=num_elements)
+        self.add_subsystem('inputs_comp', inputs_comp)
+
+        comp = MomentOfInertiaComp(num_elements=num_elements, b=b, num_samples=num_samples)
+        self.add_subsystem('I_comp', comp)
+
+        comp = LocalStiffnessMatrixComp(num_elements=num_elements, E=E, L=L,
+                                        num_samples=num_samples)
+        self.add_subsystem('local_stiffness_matrix_comp', comp)
+
+        comp = FEM(num_elements=num_elements, force_vector=force_vector,
+                   num_samples=num_samples, num_threads=self.options['num_threads'])
+        self.add_subsystem('FEM', comp)
+
+        comp = ComplianceComp(num_elements=num_elements, force_vector=force_vector,
+                              num_samples=num_samples)
+        self.add_subsystem('compliance_comp', comp)
+
+        comp = ComplianceStatsComp(num_samples=num_samples)
+        self.add_subsystem('stats_comp', comp)
+
+        comp = VolumeComp(num_elements=num_elements, b=np.mean(b), L=L)
+        self.add_subsystem('volume_comp', comp)
+
+        self.connect('inputs_comp.h', 'I_comp.h')
+        self.connect('I_comp.I', 'local_stiffness_matrix_comp.I')
+        self.connect('local_stiffness_matrix_comp.K_local', 'FEM.K_local')
+        self.connect('inputs_comp.h', 'volume_comp.h')
+
+        # drop the clamp multipliers of every sample
+        self.connect('FEM.u', 'compliance_comp.displacements',
+                     src_indices=om.slicer[:, :2 * num_nodes])
+        self.connect('compliance_comp.compliance', 'stats_comp.compliance')
+
+        self.add_design_var('inputs_comp.h', lower=1e-2, upper=10.)
+        self.add_objective('stats_comp.mean')
+        self.add_constraint('volume_comp.volume', equals=volume)
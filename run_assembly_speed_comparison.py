@@ -0,0 +1,89 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+from scipy.sparse import coo_matrix, csc_matrix
+
+from beam_comps import get_CSC_pattern, assemble_CSC_data
+
+
+def loop_assemble_CSC_K(K_local, num_elements):
+    """
+    Reference element-by-element assembly, as the beam FEM used to do it.
+    """
+    num_nodes = num_elements + 1
+    ndim = num_elements * 12 + 8
+
+    data = np.zeros((ndim, ))
+    cols = np.empty((ndim, ))
+    rows = np.empty((ndim, ))
+
+    data[:16] = K_local[0, :, :].flat
+    cols[:16] = np.tile(np.arange(4), 4)
+    rows[:16] = np.repeat(np.arange(4), 4)
+
+    j = 16
+    for ind in range(1, num_elements):
+        ind1 = 2 * ind
+        K = K_local[ind, :, :]
+
+        data[j-6:j-4] += K[0, :2]
+        data[j-2:j] += K[1, :2]
+
+        data[j:j+4] = K[:2, 2:].flat
+        rows[j:j+4] = np.array([ind1, ind1, ind1 + 1, ind1 + 1])
+        cols[j:j+4] = np.array([ind1 + 2, ind1 + 3, ind1 + 2, ind1 + 3])
+
+        data[j+4:j+12] = K[2:, :].flat
+        rows[j+4:j+12] = np.repeat(np.arange(ind1 + 2, ind1 + 4), 4)
+        cols[j+4:j+12] = np.tile(np.arange(ind1, ind1 + 4), 2)
+
+        j += 12
+
+    data[-4:] = 1.0
+    rows[-4:] = [2 * num_nodes, 2 * num_nodes + 1, 0, 1]
+    cols[-4:] = [0, 1, 2 * num_nodes, 2 * num_nodes + 1]
+
+    n_K = 2 * num_nodes + 2
+    return coo_matrix((data, (rows, cols)), shape=(n_K, n_K)).tocsc()
+
+
+def pattern_assemble_CSC_K(K_local, num_elements):
+    pattern = get_CSC_pattern(num_elements)
+    data = assemble_CSC_data(K_local, pattern)
+    return csc_matrix((data, pattern.indices, pattern.indptr), shape=pattern.shape)
+
+
+nes = [10**i for i in range(1, 7)]
+num_repeats = 5
+
+methods = OrderedDict()
+methods['Loop + COO'] = loop_assemble_CSC_K
+methods['Cached pattern'] = pattern_assemble_CSC_K
+
+timing_data = np.zeros((len(nes), len(methods)))
+
+for i_ne, ne in enumerate(nes):
+    K_local = np.random.rand(ne, 4, 4)
+
+    # the pattern is built once per mesh size, outside of the timed loop
+    get_CSC_pattern(ne)
+
+    for i_method, key in enumerate(methods):
+        durations = np.zeros(num_repeats)
+        for i_repeat in range(num_repeats):
+            pre_time = time()
+            K = methods[key](K_local, ne)
+            durations[i_repeat] = time() - pre_time
+
+        timing_data[i_ne, i_method] = np.mean(durations)
+
+    K_ref = loop_assemble_CSC_K(K_local, ne)
+    assert abs(K_ref - pattern_assemble_CSC_K(K_local, ne)).max() < 1e-12
+
+print('{:>10s}'.format('elements') + ''.join('{:>16s}'.format(key) for key in methods)
+      + '{:>10s}'.format('speedup'))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne) + ''.join('{:16.3e}'.format(t) for t in timing_data[i_ne])
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1]))
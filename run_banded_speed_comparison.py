@@ -0,0 +1,73 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+from scipy.sparse import csc_matrix
+from scipy.sparse.linalg import splu
+
+from beam_comps import get_CSC_pattern, assemble_CSC_data, ClampedBandedFactor
+
+
+def splu_factor(K_local):
+    pattern = get_CSC_pattern(K_local.shape[0])
+    data = assemble_CSC_data(K_local, pattern)
+    K = csc_matrix((data, pattern.indices, pattern.indptr), shape=pattern.shape)
+    return splu(K)
+
+
+nes = [10**i for i in range(1, 6)]
+num_repeats = 5
+# number of solves against one factorization, e.g. solve_nonlinear plus fwd/rev solve_linear
+num_solves = 3
+
+methods = OrderedDict()
+methods['splu'] = splu_factor
+methods['Banded Cholesky'] = ClampedBandedFactor
+
+timing_data = np.zeros((len(nes), len(methods)))
+rel_diff = np.zeros(len(nes))
+
+for i_ne, ne in enumerate(nes):
+    E = 1.
+    L0 = 1. / ne
+    I = 1. / 12. * 0.1 * np.linspace(0.5, 1.5, ne) ** 3
+
+    coeffs = np.empty((4, 4))
+    coeffs[0, :] = [12, 6 * L0, -12, 6 * L0]
+    coeffs[1, :] = [6 * L0, 4 * L0 ** 2, -6 * L0, 2 * L0 ** 2]
+    coeffs[2, :] = [-12, -6 * L0, 12, -6 * L0]
+    coeffs[3, :] = [6 * L0, 2 * L0 ** 2, -6 * L0, 4 * L0 ** 2]
+    coeffs *= E / L0 ** 3
+    K_local = coeffs * I[:, np.newaxis, np.newaxis]
+
+    rhs = np.zeros(2 * ne + 4)
+    rhs[2 * ne] = -1.
+
+    # warm up the cached CSC pattern so only the factor and solves are timed
+    get_CSC_pattern(ne)
+
+    solutions = []
+    for i_method, key in enumerate(methods):
+        durations = np.zeros(num_repeats)
+        for i_repeat in range(num_repeats):
+            pre_time = time()
+            lu = methods[key](K_local)
+            for i_solve in range(num_solves):
+                u = lu.solve(rhs)
+            durations[i_repeat] = time() - pre_time
+
+        timing_data[i_ne, i_method] = np.mean(durations)
+        solutions.append(u)
+
+    # the clamped beam's condition number grows like num_elements ** 4, so both solvers
+    # lose accuracy on very fine meshes; this column shows how far apart they are
+    rel_diff[i_ne] = abs(solutions[0] - solutions[1]).max() / abs(solutions[0]).max()
+
+print('factor + {} solves'.format(num_solves))
+print('{:>10s}'.format('elements') + ''.join('{:>18s}'.format(key) for key in methods)
+      + '{:>10s}'.format('speedup') + '{:>12s}'.format('rel diff'))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne) + ''.join('{:18.3e}'.format(t) for t in timing_data[i_ne])
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1])
+          + '{:12.1e}'.format(rel_diff[i_ne]))
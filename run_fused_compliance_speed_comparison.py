@@ -0,0 +1,93 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from beam_comps import BeamComplianceComp, VolumeComp
+from lab_2_solution import BeamGroup
+
+
+class FusedBeamGroup(om.Group):
+    """
+    Same optimization problem as BeamGroup, with the I -> K_local -> FEM -> compliance chain
+    replaced by the fused BeamComplianceComp.
+    """
+
+    def initialize(self):
+        self.options.declare('E')
+        self.options.declare('L')
+        self.options.declare('b')
+        self.options.declare('volume')
+        self.options.declare('num_elements', int)
+
+    def setup(self):
+        E = self.options['E']
+        L = self.options['L']
+        b = self.options['b']
+        volume = self.options['volume']
+        num_elements = self.options['num_elements']
+        num_nodes = num_elements + 1
+
+        force_vector = np.zeros(2 * num_nodes)
+        force_vector[-2] = -1.
+
+        inputs_comp = om.IndepVarComp()
+        inputs_comp.add_output('h', shape=num_elements)
+        self.add_subsystem('inputs_comp', inputs_comp)
+
+        comp = BeamComplianceComp(num_elements=num_elements, E=E, L=L, b=b,
+                                  force_vector=force_vector)
+        self.add_subsystem('compliance_comp', comp)
+
+        comp = VolumeComp(num_elements=num_elements, b=b, L=L)
+        self.add_subsystem('volume_comp', comp)
+
+        self.connect('inputs_comp.h', 'compliance_comp.h')
+        self.connect('inputs_comp.h', 'volume_comp.h')
+
+        self.add_design_var('inputs_comp.h', lower=1e-2, upper=10.)
+        self.add_objective('compliance_comp.compliance')
+        self.add_constraint('volume_comp.volume', equals=volume)
+
+
+nes = [10, 100, 1000, 10000, 100000]
+num_repeats = 5
+
+groups = OrderedDict()
+groups['BeamGroup'] = BeamGroup
+groups['Fused adjoint'] = FusedBeamGroup
+
+timing_data = np.zeros((len(nes), len(groups)))
+
+for i_ne, ne in enumerate(nes):
+    totals = []
+    for i_group, key in enumerate(groups):
+        prob = om.Problem(model=groups[key](E=1., L=1., b=0.1, volume=0.01, num_elements=ne),
+                          reports=False)
+        prob.setup()
+        prob['inputs_comp.h'] = np.linspace(0.5, 1.5, ne)
+
+        durations = np.zeros(num_repeats)
+        for i_repeat in range(num_repeats):
+            prob.run_model()
+
+            pre_time = time()
+            J = prob.compute_totals()
+            durations[i_repeat] = time() - pre_time
+
+        timing_data[i_ne, i_group] = np.mean(durations)
+        totals.append(J['compliance_comp.compliance', 'inputs_comp.h'])
+
+    if ne <= 100:
+        # the beam is too badly conditioned to compare the two methods on finer meshes
+        assert abs(totals[0] - totals[1]).max() < 1e-6 * abs(totals[0]).max()
+
+print('compute_totals time')
+print('{:>10s}'.format('elements') + ''.join('{:>16s}'.format(key) for key in groups)
+      + '{:>10s}'.format('speedup'))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne) + ''.join('{:16.3e}'.format(t) for t in timing_data[i_ne])
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1]))
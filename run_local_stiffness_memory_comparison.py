@@ -0,0 +1,96 @@
+from __future__ import print_function, division
+
+import tracemalloc
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from beam_comps import LocalStiffnessMatrixComp
+
+
+class DenseLocalStiffnessMatrixComp(LocalStiffnessMatrixComp):
+    """
+    Reference version that stores the (num_elements, 4, 4, num_elements) coefficient
+    tensor and declares the K_local/I partial as a dense matrix, as the beam used to do.
+    """
+
+    def setup(self):
+        num_elements = self.options['num_elements']
+        E = self.options['E']
+        L = self.options['L']
+
+        self.add_input('I', shape=num_elements)
+        self.add_output('K_local', shape=(num_elements, 4, 4))
+
+        L0 = L / num_elements
+        coeffs = np.empty((4, 4))
+        coeffs[0, :] = [12, 6 * L0, -12, 6 * L0]
+        coeffs[1, :] = [6 * L0, 4 * L0 ** 2, -6 * L0, 2 * L0 ** 2]
+        coeffs[2, :] = [-12, -6 * L0, 12, -6 * L0]
+        coeffs[3, :] = [6 * L0, 2 * L0 ** 2, -6 * L0, 4 * L0 ** 2]
+        coeffs *= E / L0 ** 3
+
+        self.mtx = np.zeros((num_elements, 4, 4, num_elements))
+        for ind in range(num_elements):
+            self.mtx[ind, :, :, ind] = coeffs
+
+        self.declare_partials('K_local', 'I',
+            val=self.mtx.reshape(16 * num_elements, num_elements))
+
+    def compute(self, inputs, outputs):
+        num_elements = self.options['num_elements']
+
+        outputs['K_local'] = 0
+        for ind in range(num_elements):
+            outputs['K_local'][ind, :, :] = self.mtx[ind, :, :, ind] * inputs['I'][ind]
+
+
+def peak_memory(comp_class, num_elements):
+    """
+    Peak memory in MB for setting up, running and linearizing a single stiffness component.
+    """
+    tracemalloc.start()
+
+    prob = om.Problem(reports=False)
+    ivc = prob.model.add_subsystem('ivc', om.IndepVarComp(), promotes=['*'])
+    ivc.add_output('I', val=np.ones(num_elements))
+    prob.model.add_subsystem('comp', comp_class(num_elements=num_elements, E=1., L=1.),
+                             promotes=['*'])
+
+    prob.setup()
+    prob.run_model()
+    prob.model.run_linearize()
+
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak / 1024. ** 2
+
+
+nes = [100, 200, 400, 800, 1600, 3200, 12800, 51200]
+max_dense_elements = 1600
+
+methods = OrderedDict()
+methods['Dense tensor'] = DenseLocalStiffnessMatrixComp
+methods['Sparse block'] = LocalStiffnessMatrixComp
+
+# fixed OpenMDAO overhead, subtracted so the per-element column shows the scaling.
+# The first call is a warm-up that pays for one-time import and caching allocations.
+peak_memory(LocalStiffnessMatrixComp, 1)
+base_mem = peak_memory(LocalStiffnessMatrixComp, 1)
+
+print('{:>10s}'.format('elements') + ''.join('{:>16s}'.format(key + ' MB') for key in methods)
+      + '{:>16s}'.format('sparse B/elem'))
+
+for ne in nes:
+    row = '{:10d}'.format(ne)
+    for key in methods:
+        if key == 'Dense tensor' and ne > max_dense_elements:
+            row += '{:>16s}'.format('-')
+            continue
+        mem = peak_memory(methods[key], ne)
+        row += '{:16.2f}'.format(mem)
+
+    # the sparse footprint per element stays constant, i.e. it scales linearly
+    print(row + '{:16.0f}'.format((mem - base_mem) * 1024. ** 2 / ne))
@@ -0,0 +1,109 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from beam_comps import (MomentOfInertiaComp, LocalStiffnessMatrixComp, FEM, ComplianceComp,
+                        BeamComplianceComp)
+
+
+def get_approx_totals(num_elements, max_update_rank, method='fd'):
+    """
+    Wall time of an approximated (method 'fd' or 'cs') compute_totals of compliance wrt h,
+    the gradient and the FEM's StiffnessCache.
+    """
+    num_nodes = num_elements + 1
+    force_vector = np.zeros(2 * num_nodes)
+    force_vector[-2] = -1.
+
+    prob = om.Problem(reports=False)
+    model = prob.model
+    model.add_subsystem('I_comp', MomentOfInertiaComp(num_elements=num_elements, b=0.1),
+                        promotes=['*'])
+    model.add_subsystem('local_stiffness_matrix_comp',
+                        LocalStiffnessMatrixComp(num_elements=num_elements, E=1., L=1.),
+                        promotes=['*'])
+    model.add_subsystem('FEM', FEM(num_elements=num_elements, force_vector=force_vector,
+                                   max_update_rank=max_update_rank), promotes=['*'])
+    model.add_subsystem('compliance_comp', ComplianceComp(num_elements=num_elements,
+                                                          force_vector=force_vector),
+                        promotes_outputs=['*'])
+    model.connect('u', 'compliance_comp.displacements', src_indices=np.arange(2 * num_nodes))
+
+    model.add_design_var('h')
+    model.add_objective('compliance')
+    if method == 'fd':
+        model.approx_totals(method='fd', step=1e-6)
+    else:
+        model.approx_totals(method='cs')
+
+    prob.setup()
+    prob['h'] = np.linspace(0.5, 1.5, num_elements)
+    prob.run_model()
+
+    pre_time = time()
+    J = prob.compute_totals()
+    duration = time() - pre_time
+
+    return duration, J['compliance', 'h'][0], model.FEM.K_cache
+
+
+def get_exact_totals(num_elements):
+    force_vector = np.zeros(2 * num_elements + 2)
+    force_vector[-2] = -1.
+
+    prob = om.Problem(reports=False)
+    prob.model.add_subsystem('comp', BeamComplianceComp(num_elements=num_elements, E=1., L=1.,
+                                                        b=0.1, force_vector=force_vector),
+                             promotes=['*'])
+    prob.model.add_design_var('h')
+    prob.model.add_objective('compliance')
+
+    prob.setup()
+    prob['h'] = np.linspace(0.5, 1.5, num_elements)
+    prob.run_model()
+
+    return prob.compute_totals()['compliance', 'h'][0]
+
+
+nes = [100, 1000, 4000]
+
+methods = OrderedDict()
+methods['refactor'] = None
+# one perturbed element touches 4 dofs
+methods['low-rank update'] = 4
+
+timing_data = np.zeros((len(nes), len(methods)))
+error_data = np.zeros((len(nes), len(methods)))
+factorization_data = np.zeros((len(nes), len(methods)), dtype=int)
+for i_ne, ne in enumerate(nes):
+    exact = get_exact_totals(ne)
+    for i_method, key in enumerate(methods):
+        timing_data[i_ne, i_method], J, K_cache = get_approx_totals(ne, methods[key])
+        error_data[i_ne, i_method] = abs(J - exact).max() / abs(exact).max()
+        factorization_data[i_ne, i_method] = K_cache.factorizations
+
+# splu of the banded K is already O(n), so an update's five solves only save the constant of
+# the factorization; but the perturbed solves share the base factorization's round-off, so
+# their differences are far more accurate than those of independent factorizations
+print('fd compute_totals of FEM: seconds (factorizations, rel error vs adjoint)')
+print('{:>10s}'.format('elements') + ''.join('{:>32s}'.format(key) for key in methods)
+      + '{:>10s}'.format('speedup'))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne)
+          + ''.join('{:>32s}'.format('{:.3e} ({}, {:.1e})'.format(t, n, e)) for t, n, e
+                    in zip(timing_data[i_ne], factorization_data[i_ne], error_data[i_ne]))
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1]))
+
+# complex-step K_local never patches the real base factorization; the first perturbation is
+# factored in full and becomes the base of the others
+print()
+print('cs compute_totals with low-rank updates: seconds (factorizations, rel error vs adjoint)')
+for ne in nes:
+    exact = get_exact_totals(ne)
+    duration, J, K_cache = get_approx_totals(ne, methods['low-rank update'], method='cs')
+    print('{:10d}{:>32s}'.format(ne, '{:.3e} ({}, {:.1e})'.format(
+        duration, K_cache.factorizations, abs(J - exact).max() / abs(exact).max())))
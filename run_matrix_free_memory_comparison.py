@@ -0,0 +1,63 @@
+from __future__ import print_function, division
+
+import tracemalloc
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from beam_comps import FEM, MatrixFreeFEM, get_local_stiffness_coeffs
+
+
+def run_fem(fem_class, num_elements):
+    """
+    Solve and linearize a single FEM component; return (peak MB, seconds) of that work.
+    """
+    num_nodes = num_elements + 1
+    force_vector = np.zeros(2 * num_nodes)
+    force_vector[-2] = -1.
+
+    I = 1. / 12. * 0.1 * np.linspace(0.5, 1.5, num_elements) ** 3
+    K_local = get_local_stiffness_coeffs(1., 1. / num_elements) * I[:, np.newaxis, np.newaxis]
+
+    prob = om.Problem(reports=False)
+    ivc = prob.model.add_subsystem('ivc', om.IndepVarComp(), promotes=['*'])
+    ivc.add_output('K_local', val=K_local)
+    prob.model.add_subsystem('FEM', fem_class(num_elements=num_elements,
+                                              force_vector=force_vector), promotes=['*'])
+    prob.setup()
+    prob.final_setup()
+
+    # only the solve and the linearization are measured; OpenMDAO's own vectors, including
+    # K_local itself, are allocated during setup
+    tracemalloc.start()
+    pre_time = time()
+
+    prob.run_model()
+    prob.model.run_linearize()
+
+    duration = time() - pre_time
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak / 1024. ** 2, duration
+
+
+nes = [1000, 10000, 100000]
+
+methods = OrderedDict()
+methods['FEM (splu)'] = FEM
+methods['Matrix-free'] = MatrixFreeFEM
+
+print('{:>10s}'.format('elements') + ''.join('{:>16s}{:>10s}'.format(key + ' MB', 'sec')
+                                             for key in methods)
+      + '{:>20s}'.format('matrix-free B/elem'))
+
+for ne in nes:
+    row = '{:10d}'.format(ne)
+    for key in methods:
+        mem, duration = run_fem(methods[key], ne)
+        row += '{:16.2f}{:10.3f}'.format(mem, duration)
+
+    print(row + '{:20.0f}'.format(mem * 1024. ** 2 / ne))
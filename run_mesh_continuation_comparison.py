@@ -0,0 +1,40 @@
+from __future__ import print_function, division
+
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from mesh_continuation import run_mesh_continuation
+
+
+def get_slsqp_driver():
+    driver = om.ScipyOptimizeDriver()
+    driver.options['optimizer'] = 'SLSQP'
+    driver.options['tol'] = 1e-9
+    driver.options['maxiter'] = 1000
+    driver.options['disp'] = False
+    return driver
+
+
+num_elements = 160
+
+schedules = OrderedDict()
+schedules['direct'] = [num_elements]
+schedules['continuation'] = [10, 20, 40, 80, num_elements]
+
+level_data = OrderedDict()
+for key in schedules:
+    print(key)
+    prob, level_data[key] = run_mesh_continuation(schedules[key], get_slsqp_driver, h0=1.,
+                                                  E=1., L=1., b=0.1, volume=0.01)
+    print()
+
+total_time = OrderedDict((key, sum(level['time'] for level in level_data[key]))
+                         for key in schedules)
+compliance = [level_data[key][-1]['compliance'] for key in schedules]
+
+print('{} elements from h = 1: total seconds'.format(num_elements))
+print(''.join('{:>16s}'.format(key) for key in schedules) + '{:>10s}'.format('speedup'))
+print(''.join('{:16.3e}'.format(t) for t in total_time.values())
+      + '{:10.1f}'.format(total_time['direct'] / total_time['continuation']))
+print('compliance ' + ' '.join('{:.6e}'.format(c) for c in compliance))
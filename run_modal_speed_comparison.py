@@ -0,0 +1,65 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from lab_2_solution import BeamGroup
+from modal_beam import FrequencyBeamGroup
+
+
+def time_iteration(num_elements, group, num_repeats):
+    """
+    Mean wall time of run_model plus compute_totals of the objective and constraints at a
+    new design, with the model's Problem.
+    """
+    prob = om.Problem(model=group, reports=False)
+    prob.setup()
+
+    durations = []
+    for i_repeat in range(num_repeats):
+        # a new design every time, so nothing comes from the caches of the last one
+        prob['inputs_comp.h'] = np.linspace(1.5, 0.5, num_elements) * (0.1 + 0.001 * i_repeat)
+
+        pre_time = time()
+        prob.run_model()
+        prob.compute_totals()
+        durations.append(time() - pre_time)
+
+    return np.mean(durations), prob
+
+
+nes = [1000, 10000, 100000]
+num_repeats = 5
+
+methods = OrderedDict()
+methods['static only'] = lambda ne: BeamGroup(E=1., L=1., b=0.1, volume=0.01, num_elements=ne)
+methods['modal, own factorization'] = lambda ne: FrequencyBeamGroup(
+    E=1., L=1., b=0.1, volume=0.01, min_frequency=0.25, num_elements=ne,
+    share_factorization=False)
+methods['modal, shared'] = lambda ne: FrequencyBeamGroup(
+    E=1., L=1., b=0.1, volume=0.01, min_frequency=0.25, num_elements=ne)
+
+timing_data = np.zeros((len(nes), len(methods)))
+factorization_data = np.zeros((len(nes), len(methods)), dtype=int)
+for i_ne, ne in enumerate(nes):
+    for i_method, key in enumerate(methods):
+        timing_data[i_ne, i_method], prob = time_iteration(ne, methods[key](ne), num_repeats)
+
+        caches = set([prob.model.FEM.K_cache])
+        if 'modal_comp' in prob.model._subsystems_allprocs:
+            caches.add(prob.model.modal_comp.K_cache)
+        factorization_data[i_ne, i_method] = sum(cache.factorizations for cache in caches)
+
+# the eigenvalue partials are O(n) from the mode shapes, so what the frequency constraint adds
+# is the Lanczos solves with the factorization; sharing it saves one factorization per design
+print('run_model + compute_totals: mean seconds per design (factorizations in total)')
+print('{:>10s}'.format('elements') + ''.join('{:>28s}'.format(key) for key in methods)
+      + '{:>12s}'.format('overhead'))
+for i_ne, ne in enumerate(nes):
+    print('{:10d}'.format(ne)
+          + ''.join('{:>28s}'.format('{:.3e} ({})'.format(t, n)) for t, n
+                    in zip(timing_data[i_ne], factorization_data[i_ne]))
+          + '{:12.2f}'.format(timing_data[i_ne, 2] / timing_data[i_ne, 0]))
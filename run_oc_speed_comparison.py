@@ -0,0 +1,88 @@
+from __future__ import print_function, division
+
+import os
+from contextlib import redirect_stdout
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from lab_2_solution import BeamGroup
+from oc_driver import OptimalityCriteriaDriver
+
+
+def get_slsqp_driver():
+    driver = om.ScipyOptimizeDriver()
+    driver.options['optimizer'] = 'SLSQP'
+    driver.options['tol'] = 1e-9
+    return driver
+
+
+def time_optimization(get_driver, num_elements):
+    """
+    Wall time of one run_driver from a uniform, feasible design; also return the optimal
+    compliance and whether the driver reported success.
+    """
+    prob = om.Problem(model=BeamGroup(E=1., L=1., b=0.1, volume=0.01,
+                                      num_elements=num_elements), reports=False)
+    prob.driver = get_driver()
+    prob.setup()
+    prob['inputs_comp.h'] = 0.1
+
+    pre_time = time()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        result = prob.run_driver()
+    duration = time() - pre_time
+
+    return duration, prob['compliance_comp.compliance'][0], result.success
+
+
+# beyond ~5,000 elements the condition number of K, which grows like num_elements ** 4,
+# leaves the compliance without correct digits, so larger meshes would time meaningless runs
+nes = [50, 500, 5000]
+
+# SLSQP's dense updates make one iteration at 5,000 elements take minutes
+slsqp_max_elements = 500
+
+drivers = OrderedDict()
+drivers['SLSQP'] = get_slsqp_driver
+drivers['OC'] = OptimalityCriteriaDriver
+
+# the continuous optimum has h ~ sqrt(L - x), which for the tip load, E = 1, L = 1,
+# b = 0.1 and volume = 0.01 gives a compliance of 12 / (b * 0.15 ** 3) * 2 / 3
+exact_compliance = 12. / (0.1 * 0.15 ** 3) * 2. / 3.
+
+timing_data = np.full((len(nes), len(drivers)), np.nan)
+objective_data = np.full((len(nes), len(drivers)), np.nan)
+success_data = np.zeros((len(nes), len(drivers)), dtype=bool)
+for i_ne, ne in enumerate(nes):
+    for i_driver, key in enumerate(drivers):
+        if key == 'SLSQP' and ne > slsqp_max_elements:
+            continue
+        (timing_data[i_ne, i_driver], objective_data[i_ne, i_driver],
+         success_data[i_ne, i_driver]) = time_optimization(drivers[key], ne)
+
+    # SLSQP only converges on the coarsest mesh
+    if ne == nes[0]:
+        c_slsqp, c_oc = objective_data[i_ne]
+        assert abs(c_oc - c_slsqp) < 1e-6 * c_slsqp
+
+# at 5,000 elements the round-off in the gradients keeps OC from settling, though it hovers
+# at the continuous optimum; the relative error against it mixes that with the discretization
+# error of the coarser meshes
+print('run_driver: seconds (optimal compliance, rel error vs continuous optimum), '
+      '* when the driver failed')
+print('continuous optimum {:.6e}'.format(exact_compliance))
+print('{:>10s}'.format('elements') + ''.join('{:>36s}'.format(key) for key in drivers)
+      + '{:>10s}'.format('speedup'))
+for i_ne, ne in enumerate(nes):
+    row = ''
+    for t, c, success in zip(timing_data[i_ne], objective_data[i_ne], success_data[i_ne]):
+        if np.isnan(t):
+            row += '{:>36s}'.format('not run')
+        else:
+            row += '{:>36s}'.format('{:.3e} ({:.6e}, {:.1e}){}'.format(
+                t, c, abs(c - exact_compliance) / exact_compliance, '' if success else '*'))
+    print('{:10d}'.format(ne) + row
+          + '{:10.1f}'.format(timing_data[i_ne, 0] / timing_data[i_ne, 1]))
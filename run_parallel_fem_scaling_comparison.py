@@ -0,0 +1,124 @@
+from __future__ import print_function, division
+
+import multiprocessing
+from time import time
+import numpy as np
+
+import openmdao.api as om
+
+from beam_comps import ClampedBandedFactor, DomainDecomposedSolver, get_local_stiffness_coeffs
+from lab_2_solution import BeamGroup
+from parallel_beam import ParallelBeamGroup
+
+
+# number of solves against one factorization, e.g. solve_nonlinear plus fwd/rev solve_linear
+num_solves = 3
+num_repeats = 3
+
+
+def time_solver(factor, solve, K_local, rhs):
+    """
+    Mean wall time of one factorization plus num_solves solves, and the last solution.
+    """
+    durations = np.zeros(num_repeats)
+    for i_repeat in range(num_repeats):
+        pre_time = time()
+        factor(K_local)
+        for i_solve in range(num_solves):
+            u = solve(rhs)
+        durations[i_repeat] = time() - pre_time
+
+    return np.mean(durations), u
+
+
+def get_beam_totals(num_elements, num_workers=None):
+    """
+    Compliance of the lab 2 BeamGroup, or of a ParallelBeamGroup with num_workers workers,
+    and its gradient wrt h.
+    """
+    if num_workers is None:
+        model = BeamGroup(E=1., L=1., b=0.1, volume=0.01, num_elements=num_elements)
+    else:
+        model = ParallelBeamGroup(E=1., L=1., b=0.1, volume=0.01, num_elements=num_elements,
+                                  num_workers=num_workers)
+    prob = om.Problem(model=model, reports=False)
+    prob.setup()
+    prob['inputs_comp.h'] = np.linspace(1.5, 0.5, num_elements) * 0.1
+
+    prob.run_model()
+    J = prob.compute_totals(['compliance_comp.compliance'], ['inputs_comp.h'])
+    compliance = prob['compliance_comp.compliance'][0]
+    prob.cleanup()
+
+    return compliance, J['compliance_comp.compliance', 'inputs_comp.h'][0]
+
+
+if __name__ == '__main__':
+
+    # the clamped beam's condition number grows like num_elements ** 4; the serial solvers
+    # are off by 1e-4 at 2,000 elements and by more than half at 10^4, so the scaling is only
+    # measured where the serial solution can check the parallel one. At these sizes a serial
+    # solve takes about a millisecond, less than the workers' pipe round trips, so the
+    # decomposition is slower than the banded solver here; past them it is more accurate, as
+    # the condensation of each subdomain avoids the cancellation, but not faster
+    nes = [300, 1000]
+    workers = [1, 2, 4, 8, 16]
+
+    print('{} cores, factor + {} solves'.format(multiprocessing.cpu_count(), num_solves))
+    # wall time only scales with the cores there are; the critical path adds up the CPU time
+    # of the slowest worker of every step, i.e. the workers' share of the wall time with one
+    # core per worker
+    print('{:>10s}{:>9s}{:>12s}{:>10s}{:>12s}{:>12s}{:>10s}{:>12s}'.format(
+        'elements', 'workers', 'wall sec', 'speedup', 'efficiency', 'crit. sec', 'speedup',
+        'tip error'))
+
+    for ne in nes:
+        I = 1. / 12. * 0.1 * np.linspace(0.5, 1.5, ne) ** 3
+        K_local = get_local_stiffness_coeffs(1., 1. / ne) * I[:, np.newaxis, np.newaxis]
+
+        rhs = np.zeros(2 * ne + 4)
+        rhs[2 * ne] = -1.
+
+        # the Hermite elements are exact at the nodes, so the tip deflection is the integral
+        # of (1 - x) ** 2 / EI over the elements; this shows what each solver loses to round-off
+        x = np.linspace(0., 1., ne + 1)
+        w_tip = -np.sum(((1. - x[:-1]) ** 3 - (1. - x[1:]) ** 3) / 3. / I)
+
+        state = {}
+
+        def banded_factor(K_local):
+            state['lu'] = ClampedBandedFactor(K_local)
+
+        serial_time, u_serial = time_solver(banded_factor, lambda rhs: state['lu'].solve(rhs),
+                                            K_local, rhs)
+        print('{:10d}{:>9s}{:12.3e}{:>46s}{:12.1e}'.format(ne, 'banded', serial_time, '',
+                                                           abs(u_serial[2 * ne] / w_tip - 1.)))
+
+        for num_workers in workers:
+            solver = DomainDecomposedSolver(ne, num_workers)
+            wall_time, u = time_solver(solver.factor, solver.solve, K_local, rhs)
+            critical_time = solver.critical_time / num_repeats
+            solver.close()
+
+            # within the round-off of the serial solve itself
+            assert abs(u - u_serial).max() <= 1e-3 * abs(u_serial).max()
+
+            if num_workers == 1:
+                wall_1, critical_1 = wall_time, critical_time
+
+            print('{:10d}{:9d}{:12.3e}{:10.2f}{:12.2f}{:12.3e}{:10.2f}{:12.1e}'.format(
+                ne, num_workers, wall_time, wall_1 / wall_time,
+                wall_1 / wall_time / num_workers, critical_time, critical_1 / critical_time,
+                abs(u[2 * ne] / w_tip - 1.)))
+
+    # ParallelBeamGroup only swaps the FEM of the BeamGroup for a ParallelFEM
+    ne = 1000
+    compliance, gradient = get_beam_totals(ne)
+    print()
+    print('BeamGroup, {} elements: rel diff to FEM of'.format(ne))
+    print('{:>9s}{:>14s}{:>14s}'.format('workers', 'compliance', 'gradient'))
+    for num_workers in workers:
+        parallel_compliance, parallel_gradient = get_beam_totals(ne, num_workers)
+        print('{:9d}{:14.1e}{:14.1e}'.format(
+            num_workers, abs(parallel_compliance / compliance - 1.),
+            abs(parallel_gradient - gradient).max() / abs(gradient).max()))
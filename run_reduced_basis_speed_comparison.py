@@ -0,0 +1,157 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from beam_comps import MomentOfInertiaComp, LocalStiffnessMatrixComp, FEM, ComplianceComp
+from lab_2_solution import BeamGroup
+from mesh_continuation import interpolate_h
+
+
+class TimedFEM(FEM):
+    """
+    FEM that adds up the wall time of its solves and linearizations.
+    """
+
+    def setup(self):
+        super(TimedFEM, self).setup()
+        self.solve_time = 0.
+
+    def solve_nonlinear(self, inputs, outputs):
+        pre_time = time()
+        super(TimedFEM, self).solve_nonlinear(inputs, outputs)
+        self.solve_time += time() - pre_time
+
+    def linearize(self, inputs, outputs, jacobian):
+        pre_time = time()
+        super(TimedFEM, self).linearize(inputs, outputs, jacobian)
+        self.solve_time += time() - pre_time
+
+    def solve_linear(self, d_outputs, d_residuals, mode):
+        pre_time = time()
+        super(TimedFEM, self).solve_linear(d_outputs, d_residuals, mode)
+        self.solve_time += time() - pre_time
+
+
+def get_design_history(num_elements):
+    """
+    Element heights of every model evaluation of an SLSQP run of BeamGroup from h = 0.1.
+    """
+    prob = om.Problem(model=BeamGroup(E=1., L=1., b=0.1, volume=0.01,
+                                      num_elements=num_elements), reports=False)
+    prob.driver = om.ScipyOptimizeDriver(optimizer='SLSQP', tol=1e-9, maxiter=1000, disp=False)
+    prob.driver.add_recorder(om.SqliteRecorder('history.sql'))
+    prob.setup()
+    prob['inputs_comp.h'] = 0.1
+    prob.run_driver()
+    prob.cleanup()
+
+    cases = om.CaseReader(prob.get_outputs_dir() / 'history.sql').get_cases('driver')
+    return [case.get_design_vars()['inputs_comp.h'] for case in cases]
+
+
+def get_exact_totals(h, num_elements):
+    """
+    Closed-form compliance and its gradient wrt h of the tip-loaded cantilever with E = 1,
+    L = 1 and b = 0.1; the Hermite elements reproduce the tip deflection exactly, so the FEM
+    only differs from these by round-off.
+    """
+    x = np.linspace(0., 1., num_elements + 1)
+    I = 0.1 * h ** 3 / 12.
+    # each element's share of the tip deflection
+    terms = ((1. - x[:-1]) ** 3 - (1. - x[1:]) ** 3) / 3. / I
+    return terms.sum(), -3. * terms / h
+
+
+def time_iterations(num_elements, history, **fem_options):
+    """
+    Wall time of run_model plus compute_totals of compliance wrt h for every design in
+    history, interpolated onto num_elements, with the compliance and gradient of each and the
+    FEM component.
+    """
+    num_nodes = num_elements + 1
+    force_vector = np.zeros(2 * num_nodes)
+    force_vector[-2] = -1.
+
+    prob = om.Problem(reports=False)
+    model = prob.model
+    model.add_subsystem('I_comp', MomentOfInertiaComp(num_elements=num_elements, b=0.1),
+                        promotes=['*'])
+    model.add_subsystem('local_stiffness_matrix_comp',
+                        LocalStiffnessMatrixComp(num_elements=num_elements, E=1., L=1.),
+                        promotes=['*'])
+    model.add_subsystem('FEM', TimedFEM(num_elements=num_elements, force_vector=force_vector,
+                                        **fem_options), promotes=['*'])
+    model.add_subsystem('compliance_comp', ComplianceComp(num_elements=num_elements,
+                                                          force_vector=force_vector),
+                        promotes_outputs=['*'])
+    model.connect('u', 'compliance_comp.displacements', src_indices=np.arange(2 * num_nodes))
+
+    model.add_design_var('h')
+    model.add_objective('compliance')
+    prob.setup()
+
+    durations = np.zeros(len(history))
+    compliance = np.zeros(len(history))
+    gradients = np.zeros((len(history), num_elements))
+    for i_design, h in enumerate(history):
+        prob['h'] = interpolate_h(h, num_elements)
+
+        pre_time = time()
+        prob.run_model()
+        J = prob.compute_totals()
+        durations[i_design] = time() - pre_time
+
+        compliance[i_design] = prob['compliance'][0]
+        gradients[i_design] = J['compliance', 'h'][0]
+
+    return durations, compliance, gradients, model.FEM
+
+
+# the late part of a coarse optimization, where successive designs (and displacements) are
+# close, replayed on the fine meshes
+history = get_design_history(50)[-30:]
+
+# K's condition number grows like num_elements ** 4; the full solve keeps about six digits
+# up to a few thousand elements, but has none left by 10^5, where neither solve can be judged
+nes = [1000, 3000]
+
+methods = OrderedDict()
+methods['full solve'] = {}
+methods['reduced basis'] = {'reduced_basis_size': 10}
+
+timing_data = np.zeros((len(nes), len(methods)))
+fem_timing_data = np.zeros((len(nes), len(methods)))
+for i_ne, ne in enumerate(nes):
+    exact = [get_exact_totals(interpolate_h(h, ne), ne) for h in history]
+    exact_compliance = np.array([compliance for compliance, gradient in exact])
+    exact_gradients = np.array([gradient for compliance, gradient in exact])
+
+    results = []
+    for i_method, key in enumerate(methods):
+        durations, compliance, gradients, fem = time_iterations(ne, history, **methods[key])
+        timing_data[i_ne, i_method] = np.mean(durations)
+        fem_timing_data[i_ne, i_method] = fem.solve_time / len(history)
+        results.append((compliance, gradients))
+
+    print('{} elements: {}, {} full factorizations for {} iterations'.format(
+        ne, fem.bases[0], fem.K_cache.factorizations, len(history)))
+    for key, (compliance, gradients) in zip(methods, results):
+        print('    {}: max rel error vs exact of compliance {:.1e}, of gradients {:.1e}'.format(
+            key, abs(compliance / exact_compliance - 1.).max(),
+            (abs(gradients - exact_gradients).max(axis=1)
+             / abs(exact_gradients).max(axis=1)).max()))
+
+# the rest of an iteration (transfers, the other components, the jacobian products) is the
+# same for both, so the speedup of a whole iteration is bounded by the FEM's share of it
+for title, data in [('run_model + compute_totals', timing_data),
+                    ('FEM solves and linearization', fem_timing_data)]:
+    print('{}: mean seconds per optimizer iteration'.format(title))
+    print('{:>10s}'.format('elements') + ''.join('{:>16s}'.format(key) for key in methods)
+          + '{:>10s}'.format('speedup'))
+    for i_ne, ne in enumerate(nes):
+        print('{:10d}'.format(ne) + ''.join('{:16.3e}'.format(t) for t in data[i_ne])
+              + '{:10.1f}'.format(data[i_ne, 0] / data[i_ne, 1]))
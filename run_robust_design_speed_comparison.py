@@ -0,0 +1,100 @@
+from __future__ import print_function, division
+
+from time import time
+import numpy as np
+from collections import OrderedDict
+
+import openmdao.api as om
+
+from lab_2_solution import BeamGroup
+from robust_beam import RobustBeamGroup
+
+
+def time_separate_problems(E, b, h, num_repeats):
+    """
+    Mean wall time of one evaluation of the compliance mean and variance and their gradients
+    with one BeamGroup Problem per sample.
+    """
+    probs = []
+    for E_sample, b_sample in zip(E, b):
+        prob = om.Problem(model=BeamGroup(E=E_sample, L=1., b=b_sample, volume=0.01,
+                                          num_elements=len(h)), reports=False)
+        prob.setup()
+        prob['inputs_comp.h'] = h
+        probs.append(prob)
+
+    pre_time = time()
+    for i_repeat in range(num_repeats):
+        compliance = np.zeros(len(probs))
+        gradients = np.zeros((len(probs), len(h)))
+        for i_sample, prob in enumerate(probs):
+            prob.run_model()
+            J = prob.compute_totals(['compliance_comp.compliance'], ['inputs_comp.h'])
+            compliance[i_sample] = prob['compliance_comp.compliance'][0]
+            gradients[i_sample] = J['compliance_comp.compliance', 'inputs_comp.h']
+
+        mean = np.mean(compliance)
+        variance = np.var(compliance)
+        d_mean = np.mean(gradients, axis=0)
+        d_variance = 2. * np.mean((compliance - mean)[:, np.newaxis] * gradients, axis=0)
+
+    return (time() - pre_time) / num_repeats, np.concatenate([[mean, variance], d_mean,
+                                                              d_variance])
+
+
+def time_robust_group(E, b, h, num_repeats, num_threads):
+    """
+    Same as time_separate_problems, with all samples in one RobustBeamGroup.
+    """
+    prob = om.Problem(model=RobustBeamGroup(E=E, L=1., b=b, volume=0.01, num_elements=len(h),
+                                            num_samples=len(E), num_threads=num_threads),
+                      reports=False)
+    prob.setup()
+    prob['inputs_comp.h'] = h
+
+    pre_time = time()
+    for i_repeat in range(num_repeats):
+        prob.run_model()
+        J = prob.compute_totals(['stats_comp.mean', 'stats_comp.variance'], ['inputs_comp.h'])
+
+    return (time() - pre_time) / num_repeats, np.concatenate([
+        prob['stats_comp.mean'], prob['stats_comp.variance'],
+        J['stats_comp.mean', 'inputs_comp.h'][0], J['stats_comp.variance', 'inputs_comp.h'][0]])
+
+
+num_elements = 50
+sample_counts = [10, 100, 300]
+num_repeats = 3
+
+methods = OrderedDict()
+methods['separate Problems'] = time_separate_problems
+methods['batched'] = lambda E, b, h, num_repeats: time_robust_group(E, b, h, num_repeats, 1)
+methods['batched, 4 threads'] = lambda E, b, h, num_repeats: time_robust_group(E, b, h,
+                                                                               num_repeats, 4)
+
+rng = np.random.default_rng(0)
+h = np.linspace(0.5, 1.5, num_elements)
+
+timing_data = np.zeros((len(sample_counts), len(methods)))
+for i_count, num_samples in enumerate(sample_counts):
+    E = rng.normal(1., 0.1, num_samples)
+    b = rng.normal(0.1, 0.01, num_samples)
+
+    results = []
+    for i_method, key in enumerate(methods):
+        timing_data[i_count, i_method], result = methods[key](E, b, h, num_repeats)
+        results.append(result)
+
+    # the batched coefficients multiply E in after the unit-modulus block, so the two agree to
+    # the round-off amplified by the conditioning of K
+    for result in results[1:]:
+        assert abs(result - results[0]).max() < 1e-6 * abs(results[0]).max()
+
+print('mean and variance of compliance with gradients, {} elements: seconds'.format(
+    num_elements))
+print('{:>10s}'.format('samples') + ''.join('{:>20s}'.format(key) for key in methods)
+      + '{:>10s}'.format('speedup'))
+for i_count, num_samples in enumerate(sample_counts):
+    print('{:10d}'.format(num_samples) + ''.join('{:20.3e}'.format(t)
+                                                 for t in timing_data[i_count])
+          + '{:10.1f}'.format(timing_data[i_count, 0] / timing_data[i_count, 1:].min()))
@@ -0,0 +1,39 @@
+from __future__ import print_function, division
+
+import os
+from contextlib import redirect_stdout
+from time import time
+
+import openmdao.api as om
+
+from lab_2_solution import BeamGroup
+
+
+def run_optimization(num_elements):
+    """
+    Wall time of one SLSQP run_driver of the lab 2 beam, and the FEM's StiffnessCache.
+    """
+    prob = om.Problem(model=BeamGroup(E=1., L=1., b=0.1, volume=0.01,
+                                      num_elements=num_elements), reports=False)
+    prob.driver = om.ScipyOptimizeDriver(optimizer='SLSQP', tol=1e-9)
+    prob.setup()
+    prob['inputs_comp.h'] = 0.1
+
+    pre_time = time()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        prob.run_driver()
+    duration = time() - pre_time
+
+    return duration, prob.model.FEM.K_cache
+
+
+nes = [5, 50, 500]
+
+# solve_nonlinear, apply_nonlinear and linearize at one design share an assembly and a
+# factorization, so every design should cost one miss and one factorization
+print('{:>10s}{:>10s}{:>10s}{:>10s}{:>16s}'.format('elements', 'seconds', 'hits', 'misses',
+                                                  'factorizations'))
+for ne in nes:
+    duration, K_cache = run_optimization(ne)
+    print('{:10d}{:10.3f}{:10d}{:10d}{:16d}'.format(ne, duration, K_cache.hits, K_cache.misses,
+                                                    K_cache.factorizations))